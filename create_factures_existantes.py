@@ -12,7 +12,8 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hotel_management.settings')
 django.setup()
 
-from hotel.models import Reservation, Facture
+from hotel.facturation import facturer_en_masse, reservations_a_facturer
+from hotel.models import Facture
 
 def create_factures_for_existing_reservations():
     """Crée des factures pour toutes les réservations confirmées existantes"""
@@ -20,11 +21,7 @@ def create_factures_for_existing_reservations():
     print("🔍 Recherche des réservations confirmées existantes...")
     
     # Récupérer toutes les réservations confirmées sans facture
-    reservations_sans_facture = Reservation.objects.filter(
-        statut='confirmee'
-    ).exclude(
-        id__in=Facture.objects.values_list('reservation_id', flat=True)
-    )
+    reservations_sans_facture = reservations_a_facturer()
     
     count = reservations_sans_facture.count()
     print(f"📊 {count} réservations confirmées trouvées sans facture")
@@ -33,22 +30,17 @@ def create_factures_for_existing_reservations():
         print("✅ Toutes les réservations confirmées ont déjà une facture !")
         return
     
-    # Créer les factures
-    factures_creees = 0
-    for reservation in reservations_sans_facture:
-        try:
-            facture = Facture.objects.create(
-                reservation=reservation,
-                client=reservation.client,
-                montant_ht=reservation.prix_total / 1.20,  # TVA 20%
-                cree_par=reservation.cree_par
-            )
-            factures_creees += 1
-            print(f"✅ Facture {facture.numero_facture} créée pour réservation #{reservation.id}")
-        except Exception as e:
-            print(f"❌ Erreur pour réservation #{reservation.id}: {e}")
-    
-    print(f"\n🎉 {factures_creees} factures créées avec succès !")
+    # Créer les factures par lots (bulk_create, un bloc de numéros par lot)
+    def progression(bilan):
+        print(f"⏳ {bilan['creees']}/{bilan['total']} factures créées (jusqu'à la réservation #{bilan['dernier_id']})")
+
+    try:
+        bilan = facturer_en_masse(reservations_sans_facture, progression=progression)
+    except Exception as e:
+        print(f"❌ Erreur pendant la création d'un lot : {e} (les lots précédents sont enregistrés)")
+        return
+
+    print(f"\n🎉 {bilan['creees']} factures créées avec succès !")
     
     # Afficher le résumé
     total_factures = Facture.objects.count()
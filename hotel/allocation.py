@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Optimisation de l'affectation des réservations aux chambres
+Les réservations sont attribuées à une chambre précise dès leur création, ce qui
+laisse des trous de 1 ou 2 nuits invendables. Ce module recalcule l'affectation
+des séjours futurs d'un groupe de chambres interchangeables (même type, même prix)
+par un placement glouton "best-fit" sur les intervalles : chaque séjour, pris par
+date d'arrivée, va dans la chambre où il colle le mieux au séjour précédent.
+"""
+
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .availability import STATUTS_BLOQUANTS
+
+
+# Séjour à placer : mobile = peut changer de chambre
+Sejour = namedtuple('Sejour', 'id chambre_id debut fin personnes mobile')
+
+# Un trou libre plus court que ce nombre de nuits est considéré comme invendable
+TROU_MIN_VENDABLE = 3
+
+# Horizon par défaut de l'optimisation complète (jours)
+HORIZON_DEFAUT = 90
+
+# Identifiant du séjour fictif représentant une nouvelle demande
+DEMANDE = 'demande'
+
+
+def _placer(chambres, sejours):
+    """
+    Place les séjours dans les chambres (les séjours fixes d'abord)
+
+    Args:
+        chambres: liste de dicts {'id', 'capacite'}
+        sejours: liste de Sejour
+
+    Returns:
+        dict: {sejour.id: chambre_id}, ou None si un séjour ne peut pas être placé
+    """
+    capacites = {chambre['id']: chambre['capacite'] for chambre in chambres}
+    debuts = {chambre_id: [] for chambre_id in capacites}
+    fins = {chambre_id: [] for chambre_id in capacites}
+    affectation = {}
+
+    def inserer(chambre_id, sejour):
+        i = bisect_right(debuts[chambre_id], sejour.debut)
+        debuts[chambre_id].insert(i, sejour.debut)
+        fins[chambre_id].insert(i, sejour.fin)
+        affectation[sejour.id] = chambre_id
+
+    for sejour in sejours:
+        if not sejour.mobile:
+            inserer(sejour.chambre_id, sejour)
+
+    mobiles = sorted(
+        (sejour for sejour in sejours if sejour.mobile),
+        key=lambda sejour: (sejour.debut, sejour.debut - sejour.fin)
+    )
+    for sejour in mobiles:
+        meilleur = None
+        for chambre_id, capacite in capacites.items():
+            if capacite < sejour.personnes:
+                continue
+            i = bisect_right(debuts[chambre_id], sejour.debut)
+            if i > 0 and fins[chambre_id][i - 1] > sejour.debut:
+                continue
+            if i < len(debuts[chambre_id]) and debuts[chambre_id][i] < sejour.fin:
+                continue
+            # Le plus petit écart avec le séjour précédent, puis la chambre actuelle,
+            # puis la capacité la plus juste
+            ecart = (sejour.debut - fins[chambre_id][i - 1]).days if i > 0 else None
+            score = (
+                ecart is None,
+                ecart or 0,
+                chambre_id != sejour.chambre_id,
+                capacite,
+            )
+            if meilleur is None or score < meilleur[0]:
+                meilleur = (score, chambre_id)
+        if meilleur is None:
+            return None
+        inserer(meilleur[1], sejour)
+
+    return affectation
+
+
+def mesurer_fragmentation(chambres, sejours, affectation, date_debut, date_fin):
+    """
+    Mesure les trous libres entre séjours sur la période
+
+    Returns:
+        dict: trous invendables (< TROU_MIN_VENDABLE nuits), nuits perdues, plus longue fenêtre libre
+    """
+    par_chambre = {chambre['id']: [] for chambre in chambres}
+    for sejour in sejours:
+        if sejour.id != DEMANDE:
+            par_chambre[affectation[sejour.id]].append((sejour.debut, sejour.fin))
+
+    trous = 0
+    nuits_perdues = 0
+    plus_longue = 0
+    for intervalles in par_chambre.values():
+        intervalles.sort()
+        curseur = date_debut
+        for index, (debut, fin) in enumerate(intervalles + [(date_fin, date_fin)]):
+            libre = (min(debut, date_fin) - curseur).days
+            if libre > 0:
+                plus_longue = max(plus_longue, libre)
+                # Un trou coincé entre deux séjours et trop court ne se vendra pas
+                if index > 0 and debut < date_fin and libre < TROU_MIN_VENDABLE:
+                    trous += 1
+                    nuits_perdues += libre
+            curseur = max(curseur, fin)
+
+    return {
+        'trous_invendables': trous,
+        'nuits_perdues': nuits_perdues,
+        'plus_longue_fenetre': plus_longue,
+    }
+
+
+def _groupes_chambres(type_chambre=None):
+    """Chambres interchangeables regroupées par (type, prix par nuit)"""
+    from .models import Chambre
+
+    chambres = Chambre.objects.exclude(statut='maintenance')
+    if type_chambre:
+        chambres = chambres.filter(type_chambre=type_chambre)
+
+    groupes = {}
+    for chambre in chambres.order_by('numero').values('id', 'numero', 'capacite', 'type_chambre', 'prix_par_nuit'):
+        groupes.setdefault((chambre['type_chambre'], chambre['prix_par_nuit']), []).append(chambre)
+    return groupes
+
+
+def _charger_sejours(chambre_ids, date_debut, date_fin):
+    """Séjours bloquants des chambres sur la période ; seuls les séjours futurs sont mobiles"""
+    from .models import Reservation
+
+    aujourd_hui = timezone.now().date()
+    lignes = Reservation.objects.filter(
+        chambre_id__in=chambre_ids,
+        statut__in=STATUTS_BLOQUANTS,
+        date_entree__lt=date_fin,
+        date_sortie__gt=date_debut
+    ).values_list('id', 'chambre_id', 'date_entree', 'date_sortie', 'nombre_personnes', 'statut')
+
+    return [
+        Sejour(
+            reservation_id, chambre_id, date_entree, date_sortie, nombre_personnes,
+            statut != 'en_cours' and date_entree > aujourd_hui
+        )
+        for reservation_id, chambre_id, date_entree, date_sortie, nombre_personnes, statut in lignes
+    ]
+
+
+def _plan(chambres, sejours, date_debut, date_fin):
+    """Calcule un plan de réaffectation pour un groupe de chambres"""
+    affectation = _placer(chambres, sejours)
+    if affectation is None:
+        return None
+
+    actuelle = {sejour.id: sejour.chambre_id for sejour in sejours if sejour.id != DEMANDE}
+    numeros = {chambre['id']: chambre['numero'] for chambre in chambres}
+    deplacements = [
+        {
+            'reservation_id': sejour.id,
+            'de': numeros[sejour.chambre_id],
+            'vers': numeros[affectation[sejour.id]],
+            'date_entree': sejour.debut,
+            'date_sortie': sejour.fin,
+        }
+        for sejour in sorted(sejours, key=lambda sejour: (sejour.debut, str(sejour.id)))
+        if sejour.id != DEMANDE and affectation[sejour.id] != sejour.chambre_id
+    ]
+    return {
+        'affectation': affectation,
+        'deplacements': deplacements,
+        'chambre_demande': affectation.get(DEMANDE),
+        'avant': mesurer_fragmentation(chambres, sejours, actuelle, date_debut, date_fin),
+        'apres': mesurer_fragmentation(chambres, sejours, affectation, date_debut, date_fin),
+    }
+
+
+def _appliquer(deplacements, affectation):
+    """Change la chambre des réservations déplacées (nuitées et index suivent via save())"""
+    from .models import Reservation
+
+    ids = [deplacement['reservation_id'] for deplacement in deplacements]
+    for reservation in Reservation.objects.filter(pk__in=ids).select_related('chambre'):
+        reservation.chambre_id = affectation[reservation.pk]
+        reservation.save()
+
+
+def optimiser_affectations(type_chambre=None, date_debut=None, jours=HORIZON_DEFAUT, appliquer=False):
+    """
+    Réaffecte les séjours futurs pour réduire les trous invendables
+
+    Args:
+        type_chambre: Optionnel, limiter à un type de chambre
+        date_debut: Premier jour considéré (défaut : aujourd'hui)
+        jours: Horizon en jours
+        appliquer: Si False (simulation), rien n'est modifié
+
+    Returns:
+        list: un plan par groupe de chambres (type, prix) avec déplacements et mesures avant/après
+    """
+    from .booking import verrouiller_chambres
+
+    date_debut = date_debut or timezone.now().date()
+    date_fin = date_debut + timedelta(days=jours)
+
+    def calculer(chambres, chambre_ids):
+        plan = _plan(chambres, _charger_sejours(chambre_ids, date_debut, date_fin), date_debut, date_fin)
+        if plan is None:
+            return None
+        # Le placement glouton n'est retenu que s'il réduit réellement la fragmentation
+        avant, apres = plan['avant'], plan['apres']
+        if (apres['nuits_perdues'], -apres['plus_longue_fenetre']) >= (avant['nuits_perdues'], -avant['plus_longue_fenetre']):
+            plan['deplacements'] = []
+            plan['apres'] = avant
+        return plan
+
+    plans = []
+    for (type_groupe, prix), chambres in _groupes_chambres(type_chambre).items():
+        chambre_ids = [chambre['id'] for chambre in chambres]
+        if appliquer:
+            # Recalcul sous verrou : les réservations ne peuvent pas changer entre-temps
+            with verrouiller_chambres(chambre_ids):
+                plan = calculer(chambres, chambre_ids)
+                if plan and plan['deplacements']:
+                    _appliquer(plan['deplacements'], plan['affectation'])
+        else:
+            plan = calculer(chambres, chambre_ids)
+
+        if plan is not None:
+            plan.update({'type_chambre': type_groupe, 'prix_par_nuit': prix, 'chambres': len(chambres)})
+            plans.append(plan)
+    return plans
+
+
+def proposer_reaffectation(type_chambre, prix_par_nuit, date_entree, date_sortie, personnes=1, appliquer=False):
+    """
+    Cherche à libérer une chambre pour une demande en déplaçant des séjours futurs
+
+    Seuls les séjours qui chevauchent la demande sont déplacés ; les autres restent
+    en place, ce qui garde le calcul rapide (appelable à chaque refus de disponibilité).
+
+    Returns:
+        dict: plan (chambre_demande, deplacements) ou None si impossible
+    """
+    from .booking import verrouiller_chambres
+
+    chambres = _groupes_chambres(type_chambre).get((type_chambre, prix_par_nuit), [])
+    chambre_ids = [chambre['id'] for chambre in chambres]
+    if not chambre_ids:
+        return None
+
+    def calculer():
+        demande = Sejour(DEMANDE, None, date_entree, date_sortie, personnes, True)
+        chevauchants = _charger_sejours(chambre_ids, date_entree, date_sortie)
+        mobiles = [sejour for sejour in chevauchants if sejour.mobile]
+        # Les séjours voisins des séjours déplacés restent fixes
+        debut = min([date_entree] + [sejour.debut for sejour in mobiles])
+        fin = max([date_sortie] + [sejour.fin for sejour in mobiles])
+        ids_mobiles = {sejour.id for sejour in mobiles}
+        sejours = [
+            sejour if sejour.id in ids_mobiles else sejour._replace(mobile=False)
+            for sejour in _charger_sejours(chambre_ids, debut, fin)
+        ]
+        return _plan(chambres, sejours + [demande], debut, fin)
+
+    if not appliquer:
+        return calculer()
+
+    with verrouiller_chambres(chambre_ids):
+        plan = calculer()
+        if plan is not None:
+            _appliquer(plan['deplacements'], plan['affectation'])
+        return plan
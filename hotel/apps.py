@@ -6,4 +6,9 @@ class HotelConfig(AppConfig):
     
     def ready(self):
         """Importer les signaux pour l'automatisation comptable"""
+        from django.core import checks
+
         import hotel.signals
+        from hotel.availability import verifier_cache_partage
+
+        checks.register(verifier_cache_partage, checks.Tags.caches)
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+Index de disponibilité des chambres en mémoire
+Chaque chambre possède un bitmap des nuits réservées (bit i = nuit origine + i),
+ce qui transforme les recherches de disponibilité en simples opérations binaires
+au lieu de requêtes de chevauchement sur la table Reservation.
+
+L'index sert aux recherches (listes de chambres libres, suggestions) : il est
+tenu à jour par les signaux de Reservation et resynchronisé entre processus via
+un numéro de version stocké en base (ligne de DocumentSequence), incrémenté
+par un UPDATE atomique dans la transaction qui modifie la réservation : deux
+processus ne peuvent pas obtenir la même version. Les écritures en masse
+(queryset.update, bulk_create) n'émettent pas de signaux : appeler
+synchroniser_reservation() pour chaque réservation ou invalider_index()
+ensuite. Les vérifications qui précèdent une écriture
+(check_chambre_disponibilite, reserver_chambre) interrogent toujours la base.
+
+La date de dernière modification (en-têtes ETag / Last-Modified) est gardée
+dans le cache Django, qui doit donc être partagé (check hotel.E001).
+"""
+
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+# Statuts qui occupent une chambre
+STATUTS_CONFIRMES = ('confirmee', 'en_cours')
+STATUTS_BLOQUANTS = ('en_attente', 'confirmee', 'en_cours')
+
+# Nombre de jours conservés avant aujourd'hui dans les bitmaps
+HORIZON_PASSE = 366
+
+# Séquence (DocumentSequence) comptant les modifications de réservations.
+# Elle permet à chaque processus de détecter qu'un autre a modifié la base.
+SEQUENCE_VERSION = 'disponibilite'
+
+# Date de la dernière modification des réservations ou des chambres (en-têtes HTTP
+# ETag / Last-Modified des API de disponibilité)
+CLE_DERNIERE_MODIFICATION = 'hotel:disponibilite:derniere_modification'
+
+
+def _version_courante():
+    """Retourne la version partagée des réservations (0 si inconnue)"""
+    from .models import DocumentSequence
+
+    version = DocumentSequence.objects.filter(prefixe=SEQUENCE_VERSION).values_list(
+        'dernier_numero', flat=True
+    ).first()
+    return version or 0
+
+
+def _incrementer_version():
+    """
+    Incrémente la version partagée et retourne la nouvelle valeur
+    À appeler dans la transaction qui modifie les réservations : la ligne reste
+    verrouillée jusqu'au commit, et un rollback annule l'incrément.
+    """
+    from .sequences import allouer
+
+    return allouer(SEQUENCE_VERSION)[-1]
+
+
+# Backends dont le contenu n'est pas vu par les autres processus
+CACHES_NON_PARTAGES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def verifier_cache_partage(app_configs, **kwargs):
+    """
+    Check Django : la date de dernière modification doit être partagée par tous les processus
+    Avec un cache par processus, un serveur web renverrait un ETag périmé (304)
+    après une réservation enregistrée par un autre serveur ou une commande de gestion.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend in CACHES_NON_PARTAGES:
+        return [checks.Error(
+            f"Le cache par défaut ({backend.rsplit('.', 1)[-1]}) n'est pas partagé entre processus.",
+            hint="Configurer CACHES['default'] avec FileBasedCache, Redis ou Memcached.",
+            obj='CACHES',
+            id='hotel.E001',
+        )]
+    return []
+
+
+class IndexDisponibilite:
+    """
+    Index des nuits occupées par chambre
+    Construit paresseusement depuis la base au premier usage, puis mis à jour
+    de façon incrémentale par les signaux de Reservation.
+    """
+
+    def __init__(self):
+        self._verrou = threading.RLock()
+        self._origine = None
+        self._version = None
+        # chambre_id -> {reservation_id: (date_entree, date_sortie, statut)}
+        self._sejours = {}
+        # reservation_id -> chambre_id
+        self._chambre_de = {}
+        # chambre_id -> bitmap des nuits confirmées / en attente
+        self._confirmes = {}
+        self._en_attente = {}
+
+    # ----------------------------------------
+    # Construction et mise à jour
+    # ----------------------------------------
+    def reconstruire(self):
+        """Recharge entièrement l'index depuis la base de données"""
+        from .models import Reservation
+
+        with self._verrou:
+            version = _version_courante()
+            self._origine = timezone.now().date() - timedelta(days=HORIZON_PASSE)
+            self._sejours = {}
+            self._chambre_de = {}
+
+            lignes = Reservation.objects.filter(
+                statut__in=STATUTS_BLOQUANTS,
+                date_sortie__gt=self._origine
+            ).values_list('id', 'chambre_id', 'date_entree', 'date_sortie', 'statut')
+
+            for reservation_id, chambre_id, date_entree, date_sortie, statut in lignes:
+                self._sejours.setdefault(chambre_id, {})[reservation_id] = (date_entree, date_sortie, statut)
+                self._chambre_de[reservation_id] = chambre_id
+
+            self._confirmes = {}
+            self._en_attente = {}
+            for chambre_id in self._sejours:
+                self._recalculer_chambre(chambre_id)
+            self._version = version
+
+    def mettre_a_jour(self, reservation, nouvelle_version, supprimee=False):
+        """
+        Applique la création, la modification ou la suppression d'une réservation
+        Si un autre processus a modifié la base entre-temps, l'index sera reconstruit.
+
+        Args:
+            reservation: Réservation modifiée
+            nouvelle_version: Version obtenue par _incrementer_version() dans la
+                              transaction de la modification
+            supprimee: La réservation a été supprimée
+        """
+        with self._verrou:
+            if self._origine is None or self._version is None:
+                return
+            if nouvelle_version != self._version + 1:
+                self._version = None
+                return
+
+            chambres_touchees = set()
+            ancienne_chambre = self._chambre_de.pop(reservation.pk, None)
+            if ancienne_chambre is not None:
+                self._sejours.get(ancienne_chambre, {}).pop(reservation.pk, None)
+                chambres_touchees.add(ancienne_chambre)
+
+            if not supprimee and reservation.statut in STATUTS_BLOQUANTS:
+                self._sejours.setdefault(reservation.chambre_id, {})[reservation.pk] = (
+                    reservation.date_entree, reservation.date_sortie, reservation.statut
+                )
+                self._chambre_de[reservation.pk] = reservation.chambre_id
+                chambres_touchees.add(reservation.chambre_id)
+
+            for chambre_id in chambres_touchees:
+                self._recalculer_chambre(chambre_id)
+            self._version = nouvelle_version
+
+    def _recalculer_chambre(self, chambre_id):
+        """Recalcule les bitmaps d'une chambre à partir de ses séjours"""
+        confirmes = 0
+        en_attente = 0
+        for date_entree, date_sortie, statut in self._sejours.get(chambre_id, {}).values():
+            bits = self._masque(date_entree, date_sortie)
+            if statut in STATUTS_CONFIRMES:
+                confirmes |= bits
+            else:
+                en_attente |= bits
+
+        for bitmaps, bits in ((self._confirmes, confirmes), (self._en_attente, en_attente)):
+            if bits:
+                bitmaps[chambre_id] = bits
+            else:
+                bitmaps.pop(chambre_id, None)
+
+    def _masque(self, date_debut, date_fin):
+        """Bitmap des nuits [date_debut, date_fin[ relativement à l'origine"""
+        debut = max((date_debut - self._origine).days, 0)
+        fin = (date_fin - self._origine).days
+        if fin <= debut:
+            return 0
+        return ((1 << (fin - debut)) - 1) << debut
+
+    def _assurer_a_jour(self):
+        if self._origine is None or self._version != _version_courante():
+            self.reconstruire()
+
+    # ----------------------------------------
+    # Requêtes
+    # ----------------------------------------
+    def chambres_occupees(self, date_debut, date_fin, inclure_attente=True):
+        """
+        Retourne l'ensemble des IDs de chambres ayant au moins une nuit
+        réservée dans la période [date_debut, date_fin[
+        """
+        with self._verrou:
+            self._assurer_a_jour()
+            masque = self._masque(date_debut, date_fin)
+            if not masque:
+                return set()
+
+            occupees = {chambre_id for chambre_id, bits in self._confirmes.items() if bits & masque}
+            if inclure_attente:
+                occupees.update(chambre_id for chambre_id, bits in self._en_attente.items() if bits & masque)
+            return occupees
+
+    def est_libre(self, chambre_id, date_debut, date_fin, inclure_attente=True):
+        """Vérifie si une chambre n'a aucune nuit réservée dans la période"""
+        with self._verrou:
+            self._assurer_a_jour()
+            masque = self._masque(date_debut, date_fin)
+            bits = self._confirmes.get(chambre_id, 0)
+            if inclure_attente:
+                bits |= self._en_attente.get(chambre_id, 0)
+            return not (bits & masque)
+
+    def nuits_occupees(self, chambre_id, date_debut, date_fin, inclure_attente=True):
+        """Retourne la liste des nuits occupées d'une chambre dans la période"""
+        with self._verrou:
+            self._assurer_a_jour()
+            bits = self._confirmes.get(chambre_id, 0)
+            if inclure_attente:
+                bits |= self._en_attente.get(chambre_id, 0)
+
+            nuits = []
+            jour = max(date_debut, self._origine)
+            while jour < date_fin:
+                if bits >> (jour - self._origine).days & 1:
+                    nuits.append(jour)
+                jour += timedelta(days=1)
+            return nuits
+
+
+# Instance unique partagée par le processus
+index_disponibilite = IndexDisponibilite()
+
+
+def synchroniser_reservation(reservation, supprimee=False):
+    """
+    Incrémente la version dans la transaction courante et met à jour l'index
+    une fois cette transaction validée
+    """
+    version = _incrementer_version()
+
+    def appliquer():
+        index_disponibilite.mettre_a_jour(reservation, version, supprimee=supprimee)
+        marquer_modification()
+
+    transaction.on_commit(appliquer)
+
+
+def invalider_index():
+    """
+    Force la reconstruction de l'index dans tous les processus
+    À appeler après une écriture en masse sur les réservations (queryset.update),
+    dans la même transaction.
+    """
+    _incrementer_version()
+    transaction.on_commit(marquer_modification)
+
+
+def marquer_modification():
+    """Enregistre qu'une réservation ou une chambre vient d'être modifiée"""
+    cache.set(CLE_DERNIERE_MODIFICATION, timezone.now(), None)
+
+
+def derniere_modification():
+    """
+    Date de la dernière modification des réservations ou des chambres
+    Lue dans le cache ; recalculée depuis la base si elle n'y est pas encore.
+    """
+    from django.db.models import Max
+    from .models import Chambre, Reservation
+
+    date = cache.get(CLE_DERNIERE_MODIFICATION)
+    if date is None:
+        dates = [
+            Reservation.objects.aggregate(date=Max('derniere_modification'))['date'],
+            Chambre.objects.aggregate(date=Max('derniere_modification'))['date'],
+        ]
+        date = max([d for d in dates if d is not None], default=timezone.now())
+        cache.add(CLE_DERNIERE_MODIFICATION, date, None)
+    return date
+
+
+# ============================================
+# MATRICE CHAMBRES × JOURS
+# ============================================
+
+# Codes des cellules de la matrice
+CODE_LIBRE = 'L'
+CODE_ATTENTE = 'A'
+CODE_CONFIRME = 'C'
+
+
+def encoder_rle(cellules):
+    """
+    Encode une ligne de cellules en plages "<code><longueur>"
+    Exemple : ['L', 'L', 'C', 'C', 'C', 'L'] -> 'L2C3L1'
+    """
+    morceaux = []
+    precedent = None
+    longueur = 0
+    for code in cellules:
+        if code == precedent:
+            longueur += 1
+            continue
+        if precedent is not None:
+            morceaux.append(f'{precedent}{longueur}')
+        precedent = code
+        longueur = 1
+    if precedent is not None:
+        morceaux.append(f'{precedent}{longueur}')
+    return ''.join(morceaux)
+
+
+def construire_matrice_disponibilite(date_debut, jours, type_chambre=None, capacite=None, statut=None):
+    """
+    Construit la matrice de disponibilité de N chambres sur D jours
+    
+    Une seule requête sur les chambres et une seule requête de plage sur les réservations.
+    Chaque ligne est encodée en plages (RLE) : L = libre, A = en attente, C = confirmée/en cours.
+    
+    Args:
+        date_debut: Premier jour de la matrice
+        jours: Nombre de jours (colonnes)
+        type_chambre: Optionnel, filtrer par type
+        capacite: Optionnel, capacité minimale
+        statut: Optionnel, statut de la chambre ('libre', 'occupee', 'maintenance')
+    
+    Returns:
+        dict: en-tête de la période, chambres et libres par jour
+    """
+    from .models import Chambre, Reservation
+
+    date_fin = date_debut + timedelta(days=jours)
+
+    chambres = Chambre.objects.all()
+    if type_chambre:
+        chambres = chambres.filter(type_chambre=type_chambre)
+    if capacite:
+        chambres = chambres.filter(capacite__gte=capacite)
+    if statut:
+        chambres = chambres.filter(statut=statut)
+    chambres = list(chambres.order_by('numero').values(
+        'id', 'numero', 'type_chambre', 'capacite', 'statut', 'prix_par_nuit'
+    ))
+
+    lignes = {chambre['id']: [CODE_LIBRE] * jours for chambre in chambres}
+
+    reservations = Reservation.objects.filter(
+        chambre_id__in=lignes.keys(),
+        statut__in=STATUTS_BLOQUANTS,
+        date_entree__lt=date_fin,
+        date_sortie__gt=date_debut
+    ).values_list('chambre_id', 'date_entree', 'date_sortie', 'statut')
+
+    for chambre_id, date_entree, date_sortie, statut_reservation in reservations:
+        cellules = lignes[chambre_id]
+        code = CODE_CONFIRME if statut_reservation in STATUTS_CONFIRMES else CODE_ATTENTE
+        debut = max((date_entree - date_debut).days, 0)
+        fin = min((date_sortie - date_debut).days, jours)
+        for i in range(debut, fin):
+            # Une nuit confirmée prime sur une demande en attente
+            if cellules[i] != CODE_CONFIRME:
+                cellules[i] = code
+
+    libres_par_jour = [0] * jours
+    resultat = []
+    for chambre in chambres:
+        cellules = lignes[chambre['id']]
+        for i, code in enumerate(cellules):
+            if code == CODE_LIBRE:
+                libres_par_jour[i] += 1
+        resultat.append({
+            'id': chambre['id'],
+            'numero': chambre['numero'],
+            'type': chambre['type_chambre'],
+            'capacite': chambre['capacite'],
+            'statut': chambre['statut'],
+            'prix': float(chambre['prix_par_nuit']),
+            'jours': encoder_rle(cellules),
+        })
+
+    return {
+        'debut': date_debut.isoformat(),
+        'jours': jours,
+        'codes': {
+            CODE_LIBRE: 'libre',
+            CODE_ATTENTE: 'en_attente',
+            CODE_CONFIRME: 'confirmee',
+        },
+        'chambres': resultat,
+        'libres_par_jour': libres_par_jour,
+    }
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+Service d'attribution des réservations
+Toutes les créations de réservations passent par reserver_chambre(), qui prend
+un verrou par chambre à l'intérieur d'une transaction : deux demandes sur la
+même chambre sont sérialisées, tandis que les demandes sur des chambres
+différentes continuent en parallèle.
+"""
+
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+
+from .availability import STATUTS_BLOQUANTS
+from .compteurs import ajuster, valeurs_instance, variations
+
+
+# Nouvelles tentatives lorsque SQLite refuse une écriture concurrente
+# ("database is locked" lors du passage d'un verrou partagé à un verrou d'écriture)
+TENTATIVES_SQLITE = 5
+PAUSE_TENTATIVE = 0.02
+
+
+class ChambreIndisponible(Exception):
+    """La chambre demandée n'est pas réservable pour la période"""
+    pass
+
+
+# Verrous en mémoire par chambre, utilisés lorsque la base ne supporte pas
+# SELECT ... FOR UPDATE (SQLite). Ils évitent que les threads d'un même
+# processus se disputent le verrou d'écriture de la base pour la même chambre.
+_verrous_chambres = {}
+_verrou_registre = threading.Lock()
+
+
+def _verrou_chambre(chambre_id):
+    """Retourne le verrou en mémoire associé à une chambre"""
+    with _verrou_registre:
+        verrou = _verrous_chambres.get(chambre_id)
+        if verrou is None:
+            verrou = _verrous_chambres[chambre_id] = threading.Lock()
+        return verrou
+
+
+@contextmanager
+def verrouiller_chambres(chambre_ids, mesures=None):
+    """
+    Ouvre une transaction et verrouille plusieurs chambres jusqu'à sa validation
+    Les verrous sont toujours pris dans l'ordre des IDs pour éviter les interblocages.
+
+    Args:
+        chambre_ids: IDs des chambres à verrouiller
+        mesures: Optionnel, dict complété avec le temps d'attente du verrou ('attente_verrou', en secondes)
+
+    Yields:
+        list: les chambres relues sous verrou, triées par ID
+    """
+    from .models import Chambre
+
+    chambre_ids = sorted(set(chambre_ids))
+    debut = time.perf_counter()
+    if connection.features.has_select_for_update:
+        with transaction.atomic():
+            chambres = list(Chambre.objects.select_for_update().filter(pk__in=chambre_ids).order_by('pk'))
+            if mesures is not None:
+                mesures['attente_verrou'] = time.perf_counter() - debut
+            yield chambres
+        return
+
+    # Les verrous sont relâchés après la validation de la transaction, pour que
+    # la demande suivante voie bien les réservations qui viennent d'être créées
+    with ExitStack() as verrous:
+        for chambre_id in chambre_ids:
+            verrous.enter_context(_verrou_chambre(chambre_id))
+        with transaction.atomic():
+            # Écriture neutre en début de transaction : SQLite prend alors son
+            # verrou d'écriture tout de suite (équivalent de SELECT ... FOR UPDATE,
+            # y compris entre processus) au lieu d'échouer au moment de l'INSERT
+            Chambre.objects.filter(pk__in=chambre_ids).update(statut=F('statut'))
+            if mesures is not None:
+                mesures['attente_verrou'] = time.perf_counter() - debut
+            yield list(Chambre.objects.filter(pk__in=chambre_ids).order_by('pk'))
+
+
+@contextmanager
+def verrouiller_chambre(chambre_id, mesures=None):
+    """
+    Ouvre une transaction et verrouille la chambre jusqu'à sa validation
+
+    Yields:
+        Chambre: la chambre relue sous verrou
+    """
+    from .models import Chambre
+
+    with verrouiller_chambres([chambre_id], mesures) as chambres:
+        if not chambres:
+            raise Chambre.DoesNotExist(f'Chambre {chambre_id} introuvable')
+        yield chambres[0]
+
+
+def reserver_chambre(client, chambre_id, date_entree, date_sortie, nombre_personnes,
+                     statut='en_attente', remarques='', cree_par=None, mesures=None):
+    """
+    Crée une réservation après avoir vérifié la disponibilité sous verrou
+
+    Args:
+        client: Instance de Client
+        chambre_id: ID de la chambre demandée
+        date_entree: Date d'arrivée
+        date_sortie: Date de départ (nuit du départ non comprise)
+        nombre_personnes: Nombre de personnes
+        statut: Statut initial de la réservation
+        remarques: Remarques éventuelles
+        cree_par: Utilisateur à l'origine de la réservation
+        mesures: Optionnel, dict complété avec le temps d'attente du verrou
+
+    Returns:
+        Reservation: la réservation créée
+
+    Raises:
+        ChambreIndisponible: si la chambre est en maintenance ou déjà réservée
+        ValueError: si les dates ne sont pas cohérentes
+    """
+    if date_sortie <= date_entree:
+        raise ValueError("La date de sortie doit être après la date d'entrée")
+
+    return _reessayer_si_verrouillee(lambda: _creer_reservation_verrouillee(
+        client, chambre_id, date_entree, date_sortie, nombre_personnes,
+        statut, remarques, cree_par, mesures
+    ))
+
+
+def _reessayer_si_verrouillee(operation):
+    """
+    Exécute une écriture transactionnelle, relancée si SQLite la refuse
+    ("database is locked") : la transaction a été annulée, rien n'a été écrit.
+    """
+    for tentative in range(TENTATIVES_SQLITE):
+        try:
+            return operation()
+        except OperationalError as e:
+            if connection.vendor != 'sqlite' or 'locked' not in str(e) or tentative == TENTATIVES_SQLITE - 1:
+                raise
+            time.sleep(PAUSE_TENTATIVE * (tentative + 1))
+
+
+def _creer_reservation_verrouillee(client, chambre_id, date_entree, date_sortie, nombre_personnes,
+                                   statut, remarques, cree_par, mesures):
+    """Vérifie la disponibilité et crée la réservation sous verrou de la chambre"""
+    from .models import Reservation
+
+    with verrouiller_chambre(chambre_id, mesures) as chambre:
+        if chambre.statut == 'maintenance':
+            raise ChambreIndisponible(f'La chambre {chambre.numero} est en maintenance.')
+
+        conflit = Reservation.objects.filter(
+            chambre_id=chambre_id,
+            statut__in=STATUTS_BLOQUANTS,
+            date_entree__lt=date_sortie,
+            date_sortie__gt=date_entree
+        ).exists()
+        if conflit:
+            raise ChambreIndisponible(
+                f'La chambre {chambre.numero} n\'est pas disponible pour ces dates.'
+            )
+
+        reservation = Reservation(
+            client=client,
+            chambre=chambre,
+            date_entree=date_entree,
+            date_sortie=date_sortie,
+            nombre_personnes=nombre_personnes,
+            statut=statut,
+            remarques=remarques,
+            cree_par=cree_par
+        )
+        # Le nombre de nuits et le prix total sont calculés dans le save()
+        reservation.save()
+
+        if statut in ('confirmee', 'en_cours') and chambre.statut != 'occupee':
+            chambre.statut = 'occupee'
+            chambre.save(update_fields=['statut', 'derniere_modification'])
+
+    return reservation
+
+
+def reserver_groupe(client, type_chambre, nombre_chambres, date_entree, date_sortie,
+                    personnes_par_chambre=1, statut='en_attente', remarques='', cree_par=None):
+    """
+    Réserve plusieurs chambres d'un même type pour un même séjour, en tout ou rien
+
+    Une seule recherche de disponibilité sur les chambres candidates (verrouillées),
+    puis création groupée des réservations, des nuitées et, pour un groupe confirmé,
+    des factures. Une seule notification est envoyée pour tout le groupe.
+
+    Args:
+        client: Instance de Client (le tour-opérateur ou le responsable du groupe)
+        type_chambre: Type de chambre demandé
+        nombre_chambres: Nombre de chambres à réserver
+        date_entree: Date d'arrivée
+        date_sortie: Date de départ
+        personnes_par_chambre: Capacité minimale de chaque chambre
+        statut: 'en_attente' ou 'confirmee'
+        remarques: Remarques ajoutées à chaque réservation
+        cree_par: Utilisateur à l'origine de la réservation
+
+    Returns:
+        list: les réservations créées (avec leur facture éventuelle dans .facture)
+
+    Raises:
+        ChambreIndisponible: s'il n'y a pas assez de chambres libres (rien n'est créé)
+        ValueError: si les paramètres ne sont pas cohérents
+    """
+    if date_sortie <= date_entree:
+        raise ValueError("La date de sortie doit être après la date d'entrée")
+    if nombre_chambres < 1:
+        raise ValueError('Le nombre de chambres doit être positif')
+    if statut not in ('en_attente', 'confirmee'):
+        raise ValueError('Statut de réservation de groupe invalide')
+
+    return _reessayer_si_verrouillee(lambda: _creer_groupe_verrouille(
+        client, type_chambre, nombre_chambres, date_entree, date_sortie,
+        personnes_par_chambre, statut, remarques, cree_par
+    ))
+
+
+def _creer_groupe_verrouille(client, type_chambre, nombre_chambres, date_entree, date_sortie,
+                             personnes_par_chambre, statut, remarques, cree_par):
+    """Attribue les chambres et crée les réservations du groupe sous verrou des chambres candidates"""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from .availability import synchroniser_reservation
+    from .models import Chambre, Facture, Notification, Reservation, RoomNight
+
+    candidates = Chambre.objects.filter(
+        type_chambre=type_chambre,
+        capacite__gte=personnes_par_chambre
+    ).exclude(statut='maintenance').values_list('id', flat=True)
+
+    with verrouiller_chambres(candidates) as chambres:
+        occupees = set(Reservation.objects.filter(
+            chambre_id__in=[chambre.id for chambre in chambres],
+            statut__in=STATUTS_BLOQUANTS,
+            date_entree__lt=date_sortie,
+            date_sortie__gt=date_entree
+        ).values_list('chambre_id', flat=True))
+
+        # Chambres les plus adaptées d'abord : capacité la plus juste, puis prix
+        libres = sorted(
+            (chambre for chambre in chambres
+             if chambre.id not in occupees and chambre.statut != 'maintenance'),
+            key=lambda chambre: (chambre.capacite, chambre.prix_par_nuit, chambre.numero)
+        )
+        if len(libres) < nombre_chambres:
+            raise ChambreIndisponible(
+                f'Seulement {len(libres)} chambre(s) disponible(s) sur les {nombre_chambres} demandées.'
+            )
+        attribuees = libres[:nombre_chambres]
+
+        # bulk_create n'appelle pas Reservation.save() : calculs faits ici
+        nombre_nuits = (date_sortie - date_entree).days
+        reservations = Reservation.objects.bulk_create([
+            Reservation(
+                client=client,
+                chambre=chambre,
+                date_entree=date_entree,
+                date_sortie=date_sortie,
+                nombre_nuits=nombre_nuits,
+                prix_total=nombre_nuits * chambre.prix_par_nuit,
+                nombre_personnes=personnes_par_chambre,
+                statut=statut,
+                remarques=remarques,
+                cree_par=cree_par
+            )
+            for chambre in attribuees
+        ])
+        if any(reservation.pk is None for reservation in reservations):
+            # Bases ne renvoyant pas les IDs lors d'un bulk_create
+            par_chambre = dict(Reservation.objects.filter(
+                client=client,
+                chambre__in=attribuees,
+                date_entree=date_entree,
+                date_sortie=date_sortie
+            ).values_list('chambre_id', 'id'))
+            for reservation in reservations:
+                reservation.pk = par_chambre[reservation.chambre_id]
+
+        RoomNight.objects.bulk_create([
+            nuit for reservation in reservations for nuit in RoomNight.nuits_de(reservation)
+        ])
+
+        # Compteurs des dashboards (bulk_create et update n'émettent pas de signaux)
+        deltas = Counter()
+        for reservation in reservations:
+            deltas.update(variations({}, valeurs_instance(reservation)))
+
+        numeros_factures = []
+        if statut == 'confirmee':
+            # Même traitement que le signal de confirmation, en une seule passe
+            maintenant = timezone.now()
+            factures = []
+            for reservation, numero in zip(reservations, Facture.prochains_numeros(len(reservations))):
+                facture = Facture(
+                    numero_facture=numero,
+                    reservation=reservation,
+                    client=client,
+                    date_echeance=maintenant.date() + timedelta(days=30),
+                    date_paiement=maintenant,
+                    montant_ht=Facture.montant_ht_depuis_ttc(reservation.prix_total),
+                    statut='payee',
+                    moyen_paiement='carte',
+                    cree_par=cree_par
+                )
+                facture.calculer_montants()
+                factures.append(facture)
+            Facture.objects.bulk_create(factures)
+            numeros_factures = [facture.numero_facture for facture in factures]
+            Chambre.objects.filter(pk__in=[chambre.id for chambre in attribuees]).update(
+                statut='occupee', derniere_modification=maintenant
+            )
+            for chambre in attribuees:
+                avant = valeurs_instance(chambre)
+                chambre.statut = 'occupee'
+                deltas.update(variations(avant, valeurs_instance(chambre)))
+
+        numeros = ', '.join(chambre.numero for chambre in attribuees)
+        message = (
+            f"Réservation de groupe ({statut.replace('_', ' ')}) pour {client.nom_complet} : "
+            f"{len(reservations)} chambre(s) {numeros} du {date_entree} au {date_sortie}."
+        )
+        if numeros_factures:
+            message += f" Factures {numeros_factures[0]} à {numeros_factures[-1]} générées et payées automatiquement."
+        notification = Notification.objects.create(
+            type_notification='reservation_nouvelle',
+            titre=f"Nouvelle réservation de groupe ({len(reservations)} chambres)",
+            message=message,
+            priorite='moyenne',
+            reservation=reservations[0]
+        )
+        notification.destinataires.set(User.objects.filter(is_superuser=True))
+
+        ajuster(deltas)
+
+        # Les signaux post_save ne sont pas émis par bulk_create
+        for reservation in reservations:
+            synchroniser_reservation(reservation)
+
+    return reservations
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Cache « stale-while-revalidate » des tableaux de bord coûteux
+Le dernier contexte calculé est servi immédiatement. Passé la durée de
+fraîcheur, il est recalculé dans un thread en arrière-plan (un seul à la fois
+par clé) pendant que les visiteurs continuent de recevoir l'ancienne version ;
+il n'est recalculé pendant la requête que s'il est absent ou plus vieux que la
+durée maximale. Une base occupée (paie, gros export) ne bloque donc plus
+l'affichage pour tout le monde.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+# Durées par défaut (secondes) : fraîcheur puis âge maximal d'un contexte servi
+DUREE_FRAIS_DEFAUT = 60
+DUREE_MAX_DEFAUT = 15 * 60
+
+CLE_CACHE = 'hotel:dashboard:swr:{nom}:{variante}'
+
+
+def _durees():
+    duree_frais = getattr(settings, 'DASHBOARD_CACHE_SOFT_TTL', DUREE_FRAIS_DEFAUT)
+    duree_max = getattr(settings, 'DASHBOARD_CACHE_HARD_TTL', DUREE_MAX_DEFAUT)
+    return duree_frais, max(duree_max, duree_frais)
+
+
+def _calculer_et_stocker(cle, calculer):
+    """Calcule le contexte et le met en cache avec sa date de calcul"""
+    entree = {'contexte': calculer(), 'calcule_le': timezone.now()}
+    cache.set(cle, entree, _durees()[1])
+    return entree
+
+
+def _recalculer_en_arriere_plan(cle, cle_verrou, calculer):
+    try:
+        _calculer_et_stocker(cle, calculer)
+    except Exception:
+        logger.exception('Recalcul en arrière-plan du dashboard %s impossible', cle)
+    finally:
+        cache.delete(cle_verrou)
+        # Connexion propre à ce thread : à fermer explicitement
+        connection.close()
+
+
+def contexte_dashboard(nom, variante, calculer, forcer=False):
+    """
+    Contexte d'un tableau de bord, servi depuis le cache
+
+    Args:
+        nom: Nom du tableau de bord (ex. 'rapports')
+        variante: Éléments qui changent le contenu (rôle, période, dates...),
+                  assemblés dans la clé de cache
+        calculer: fonction sans argument retournant le contexte (sérialisable
+                  par le cache : pas de queryset ni d'objet lié à la requête)
+        forcer: Recalcule immédiatement (bouton « Actualiser »)
+
+    Returns:
+        tuple: (contexte, date de calcul)
+    """
+    cle = CLE_CACHE.format(nom=nom, variante=':'.join(str(partie) for partie in variante))
+    duree_frais, duree_max = _durees()
+
+    entree = None if forcer else cache.get(cle)
+    if entree is not None:
+        age = (timezone.now() - entree['calcule_le']).total_seconds()
+        if age < duree_max:
+            # Un seul recalcul à la fois par clé (verrou partagé via le cache)
+            cle_verrou = f'{cle}:recalcul'
+            if age >= duree_frais and cache.add(cle_verrou, True, duree_max):
+                threading.Thread(
+                    target=_recalculer_en_arriere_plan,
+                    args=(cle, cle_verrou, calculer),
+                    daemon=True,
+                ).start()
+            return entree['contexte'], entree['calcule_le']
+
+    entree = _calculer_et_stocker(cle, calculer)
+    return entree['contexte'], entree['calcule_le']
+
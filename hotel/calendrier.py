@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Grille du calendrier des réservations (chambres × jours d'un mois)
+La grille est calculée côté serveur avec une requête sur les chambres et une
+seule requête de plage sur les réservations du mois. Chaque ligne de chambre
+est découpée en segments (jours vides ou séjour) : le template n'a plus qu'à
+afficher une cellule par segment, et l'API renvoie la même structure en JSON
+pour charger les mois voisins à la demande.
+"""
+
+from datetime import date, timedelta
+
+from django.db.models import Q
+
+
+# Nombre maximum de résultats de l'autocomplétion des clients
+AUTOCOMPLETE_LIMITE = 10
+
+# Classe CSS du bloc selon le statut de la réservation
+CLASSES_STATUT = {
+    'en_attente': 'bg-warning',
+    'confirmee': 'bg-success',
+    'en_cours': 'bg-primary',
+    'terminee': 'bg-secondary',
+    'annulee': 'bg-danger',
+}
+
+
+def bornes_mois(jour):
+    """Retourne (premier jour du mois, premier jour du mois suivant)"""
+    debut = jour.replace(day=1)
+    fin = (debut + timedelta(days=32)).replace(day=1)
+    return debut, fin
+
+
+def parser_mois(valeur, defaut):
+    """
+    Lit un mois au format AAAA-MM ou une date AAAA-MM-JJ
+
+    Returns:
+        date: premier jour du mois (defaut si la valeur est absente ou invalide)
+    """
+    if not valeur:
+        return defaut.replace(day=1)
+    try:
+        morceaux = [int(morceau) for morceau in valeur.split('-')[:2]]
+        return date(morceaux[0], morceaux[1], 1)
+    except (ValueError, IndexError):
+        return defaut.replace(day=1)
+
+
+def reservations_visibles(user):
+    """Réservations visibles par l'utilisateur : toutes pour le personnel, les siennes pour un client"""
+    from .models import Reservation
+
+    if user.is_superuser or user.is_staff:
+        return Reservation.objects.all()
+    return Reservation.objects.filter(client__user_profile__user=user)
+
+
+def filtrer_reservations(reservations, chambre=None, client=None, statut=None, search=None):
+    """Applique les filtres GET du calendrier à un queryset de réservations"""
+    if chambre:
+        reservations = reservations.filter(chambre__numero__icontains=chambre)
+    # Chaque mot doit correspondre au nom ou au prénom ("Dupont Jean" issu de l'autocomplétion)
+    for mot in (client or '').split():
+        reservations = reservations.filter(Q(client__nom__icontains=mot) | Q(client__prenom__icontains=mot))
+    if statut:
+        reservations = reservations.filter(statut=statut)
+    else:
+        # Les réservations annulées ne bloquent rien : masquées sauf demande explicite
+        reservations = reservations.exclude(statut='annulee')
+    if search:
+        reservations = reservations.filter(
+            Q(client__nom__icontains=search) | Q(client__prenom__icontains=search) | Q(chambre__numero__icontains=search)
+        )
+    return reservations
+
+
+def construire_grille_calendrier(reservations, mois, chambre=None):
+    """
+    Construit la grille chambres × jours d'un mois
+
+    Args:
+        reservations: queryset de réservations déjà filtré (droits et filtres)
+        mois: n'importe quel jour du mois affiché
+        chambre: Optionnel, filtre sur le numéro de chambre
+
+    Returns:
+        dict: mois, jours et lignes (une par chambre, découpée en segments ;
+              un segment de séjour porte le détail de sa réservation)
+    """
+    from .models import Chambre
+
+    debut, fin = bornes_mois(mois)
+    nombre_jours = (fin - debut).days
+
+    chambres = Chambre.objects.order_by('numero')
+    if chambre:
+        chambres = chambres.filter(numero__icontains=chambre)
+    chambres = list(chambres.values_list('id', 'numero'))
+
+    # Une seule requête de plage : les séjours qui ont au moins une nuit dans le mois
+    lignes_reservations = reservations.filter(
+        chambre_id__in=[chambre_id for chambre_id, _ in chambres],
+        date_entree__lt=fin,
+        date_sortie__gt=debut
+    ).order_by('chambre_id', 'date_entree', 'id').values_list(
+        'id', 'chambre_id', 'date_entree', 'date_sortie', 'statut',
+        'client__nom', 'client__prenom', 'chambre__numero'
+    )
+
+    par_chambre = {}
+    for reservation_id, chambre_id, date_entree, date_sortie, statut, nom, prenom, numero in lignes_reservations:
+        detail = {
+            'id': reservation_id,
+            'client': f'{nom} {prenom}'.strip(),
+            'chambre': numero,
+            'date_entree': date_entree.isoformat(),
+            'date_sortie': date_sortie.isoformat(),
+            'statut': statut,
+            'classe': CLASSES_STATUT.get(statut, 'bg-danger'),
+        }
+        par_chambre.setdefault(chambre_id, []).append(
+            (detail, (max(date_entree, debut) - debut).days, (min(date_sortie, fin) - debut).days)
+        )
+
+    lignes = []
+    for chambre_id, numero in chambres:
+        segments = []
+        curseur = 0
+        for detail, premier, dernier in par_chambre.get(chambre_id, []):
+            # Séjours non bloquants qui se chevauchent (terminée / annulée) : le premier l'emporte
+            premier = max(premier, curseur)
+            if premier >= dernier:
+                continue
+            if premier > curseur:
+                segments.append({'jours': premier - curseur})
+            segments.append({'jours': dernier - premier, 'reservation': detail})
+            curseur = dernier
+        if curseur < nombre_jours:
+            segments.append({'jours': nombre_jours - curseur})
+        lignes.append({'id': chambre_id, 'numero': numero, 'segments': segments})
+
+    return {
+        'mois': debut.strftime('%Y-%m'),
+        'precedent': (debut - timedelta(days=1)).strftime('%Y-%m'),
+        'suivant': fin.strftime('%Y-%m'),
+        'jours': [(debut + timedelta(days=decalage)).isoformat() for decalage in range(nombre_jours)],
+        'lignes': lignes,
+    }
+
+
+def rechercher_clients(terme, limite=AUTOCOMPLETE_LIMITE):
+    """
+    Autocomplétion des clients sur le nom, le prénom ou l'email
+
+    Returns:
+        list: dicts {'id', 'label', 'email'} (au plus `limite`)
+    """
+    from .models import Client
+
+    terme = (terme or '').strip()
+    if len(terme) < 2:
+        return []
+
+    clients = Client.objects.filter(
+        Q(nom__istartswith=terme) | Q(prenom__istartswith=terme) | Q(email__istartswith=terme)
+    ).order_by('nom', 'prenom').values('id', 'nom', 'prenom', 'email')[:limite]
+    return [
+        {'id': client['id'], 'label': f"{client['nom']} {client['prenom']}".strip(), 'email': client['email']}
+        for client in clients
+    ]
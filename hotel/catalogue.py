@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Catalogue des chambres pour les API publiques
+La partie statique de chaque chambre (type, prix, équipements, images) est
+sérialisée une seule fois puis mise en cache par chambre. Les réponses de
+disponibilité n'ont plus qu'à assembler les fragments des chambres libres.
+Le cache est invalidé par les signaux de Chambre et ChambreImage.
+"""
+
+from django.core.cache import cache
+
+
+# Clé de cache d'un fragment de chambre
+CLE_FRAGMENT = 'hotel:catalogue:chambre:{}'
+
+# Durée de vie de sécurité des fragments (l'invalidation se fait par signal)
+DUREE_FRAGMENT = 24 * 60 * 60
+
+
+def _cle(chambre_id):
+    return CLE_FRAGMENT.format(chambre_id)
+
+
+def serialiser_chambre(chambre):
+    """
+    Construit le fragment JSON statique d'une chambre
+    Les images doivent avoir été préchargées (prefetch_related('images'))
+    pour éviter une requête par chambre.
+    """
+    return {
+        'id': chambre.id,
+        'numero': chambre.numero,
+        'type_chambre': chambre.get_type_chambre_display(),
+        'prix_par_nuit': float(chambre.prix_par_nuit),
+        'capacite': chambre.capacite,
+        'description': chambre.description or '',
+        'equipements': chambre.get_equipements(),
+        'images': [image.image.name for image in chambre.images.all()],
+    }
+
+
+def fragments_chambres(chambre_ids):
+    """
+    Retourne les fragments des chambres demandées, dans l'ordre des IDs
+    Les fragments absents du cache sont construits en une seule requête
+    (plus une pour les images), puis mis en cache.
+
+    Args:
+        chambre_ids: Liste ordonnée d'IDs de chambres
+
+    Returns:
+        list: fragments (dict) des chambres existantes
+    """
+    from .models import Chambre
+
+    chambre_ids = list(chambre_ids)
+    en_cache = cache.get_many([_cle(chambre_id) for chambre_id in chambre_ids])
+    fragments = {
+        chambre_id: en_cache[_cle(chambre_id)]
+        for chambre_id in chambre_ids
+        if _cle(chambre_id) in en_cache
+    }
+
+    manquantes = [chambre_id for chambre_id in chambre_ids if chambre_id not in fragments]
+    if manquantes:
+        nouveaux = {}
+        for chambre in Chambre.objects.filter(id__in=manquantes).prefetch_related('images'):
+            fragments[chambre.id] = nouveaux[_cle(chambre.id)] = serialiser_chambre(chambre)
+        cache.set_many(nouveaux, DUREE_FRAGMENT)
+
+    return [fragments[chambre_id] for chambre_id in chambre_ids if chambre_id in fragments]
+
+
+def invalider_chambre(chambre_id):
+    """Supprime le fragment en cache d'une chambre"""
+    cache.delete(_cle(chambre_id))
@@ -8,6 +8,8 @@ import re
 from django.utils import timezone
 from datetime import datetime, date, timedelta
 from .models import Chambre, Client, Reservation, UserProfile
+from .compteurs import lire_compteurs, total
+from .snapshots import revenu_du_mois
 
 
 class HotelChatbotAI:
@@ -97,6 +99,7 @@ class HotelChatbotAI:
             ],
             'chambres_disponibles': [
                 r'\b(chambre|room).*(disponible|libre|vacant)',
+                r'\b(disponible|libre)s?\b.*\d+\s*nuits?',
                 r'\b(voir|consulter|afficher).*(chambre|room)',
                 r'\bcombien.*(chambre|room)',
                 r'\bliste.*(chambre|room)',
@@ -190,6 +193,11 @@ class HotelChatbotAI:
             type_demande = 'suite'
             chambres_libres = chambres_libres.filter(type_chambre='suite')
         
+        # Recherche de dates flexibles (ex : "une suite libre pour 4 nuits")
+        nuits = re.search(r'(\d+)\s*nuits?', message)
+        if nuits:
+            return self._handle_fenetres_libres(type_demande, int(nuits.group(1)))
+        
         if chambres_libres.exists():
             count = chambres_libres.count()
             type_str = f" de type {type_demande}" if type_demande else ""
@@ -228,6 +236,37 @@ class HotelChatbotAI:
             }
         }
     
+    def _handle_fenetres_libres(self, type_demande, nuits):
+        """Propose les premières dates libres pour un séjour de N nuits dans les 60 prochains jours"""
+        from .utils import rechercher_fenetres_libres
+        
+        aujourd_hui = timezone.now().date()
+        fenetres = rechercher_fenetres_libres(
+            nuits, aujourd_hui, aujourd_hui + timedelta(days=60), type_chambre=type_demande, limite=5
+        )
+        type_str = f" de type {type_demande}" if type_demande else ""
+        
+        if fenetres:
+            response = f"📅 Premières disponibilités{type_str} pour {nuits} nuit(s) :\n\n"
+            for fenetre in fenetres:
+                chambre = fenetre['chambre']
+                response += (
+                    f"🛏️ Chambre {chambre.numero} : du {fenetre['date_entree'].strftime('%d/%m/%Y')} "
+                    f"au {fenetre['date_sortie'].strftime('%d/%m/%Y')} - {chambre.prix_par_nuit * nuits}€\n"
+                )
+        else:
+            response = f"😔 Désolé, aucune chambre{type_str} n'est libre {nuits} nuit(s) d'affilée dans les 60 prochains jours."
+        
+        return {
+            'success': True,
+            'message': response,
+            'data': {
+                'count': len(fenetres),
+                'type': type_demande,
+                'nuits': nuits
+            }
+        }
+    
     def _handle_prix_chambres(self, message):
         """Gestion des questions sur les prix"""
         # Détection du type de chambre
@@ -302,7 +341,7 @@ class HotelChatbotAI:
     def _handle_client_info(self, message):
         """Gestion des questions sur les clients"""
         if self.role in ['admin', 'employe']:
-            total_clients = Client.objects.count()
+            total_clients = total(lire_compteurs('client')['client'])
             response = f"👥 Nous avons actuellement {total_clients} client(s) enregistré(s).\n\n"
             response += "💡 Vous pouvez consulter la liste complète dans 'Clients'."
         else:
@@ -316,19 +355,13 @@ class HotelChatbotAI:
     def _handle_statistiques(self, message):
         """Gestion des questions sur les statistiques"""
         if self.role == 'admin':
-            from django.db.models import Sum
-            
-            total_clients = Client.objects.count()
-            total_chambres = Chambre.objects.count()
-            total_reservations = Reservation.objects.count()
-            chambres_libres = Chambre.objects.filter(statut='libre').count()
+            compteurs = lire_compteurs('client', 'chambre.statut', 'reservation.statut')
+            total_clients = total(compteurs['client'])
+            total_chambres = total(compteurs['chambre.statut'])
+            total_reservations = total(compteurs['reservation.statut'])
+            chambres_libres = total(compteurs['chambre.statut'], 'libre')
             
-            today = date.today()
-            revenus_mois = Reservation.objects.filter(
-                date_entree__year=today.year,
-                date_entree__month=today.month,
-                statut__in=['confirmee', 'en_cours', 'terminee']
-            ).aggregate(total=Sum('prix_total'))['total'] or 0
+            revenus_mois = revenu_du_mois()
             
             response = (
                 f"📊 Statistiques globales :\n\n"
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Compteurs des tableaux de bord (table CounterSnapshot)
+Les chiffres d'en-tête (clients, chambres et réservations par statut,
+notifications non lues...) sont tenus à jour par les signaux post_save /
+post_delete avec des incréments F() atomiques : les dashboards lisent quelques
+lignes au lieu de compter les tables à chaque affichage.
+
+Les variations sont appliquées après la validation de la transaction qui les
+produit, dans une transaction courte : les lignes de compteurs partagées (ex.
+réservations par statut) ne restent pas verrouillées pendant une réservation,
+ce qui sérialiserait les réservations de chambres différentes.
+
+Les écritures en masse (bulk_create, queryset.update) n'émettent pas de signaux :
+le code concerné appelle ajuster() lui-même ou reconcilier(), et la commande
+reconcile_counters recalcule périodiquement tous les compteurs.
+"""
+
+from collections import Counter, namedtuple
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+
+# Valeur d'un compteur sans ventilation (total de la dimension)
+TOTAL = '*'
+
+# Ligne témoin écrite par reconcilier() : la dimension a été calculée, même si
+# elle n'a aucune valeur (ex. aucune réservation encore)
+CALCULEE = '#'
+
+# modele : nom du modèle de l'app hotel
+# champ : champ de ventilation (None : un seul compteur TOTAL)
+# filtre : conditions d'égalité pour être compté (ex. {'lue': False})
+Dimension = namedtuple('Dimension', 'nom modele champ filtre')
+
+DIMENSIONS = {
+    dimension.nom: dimension
+    for dimension in (
+        Dimension('client', 'Client', None, {}),
+        Dimension('chambre.statut', 'Chambre', 'statut', {}),
+        Dimension('reservation.statut', 'Reservation', 'statut', {}),
+        Dimension('reservation.client', 'Reservation', 'client_id', {}),
+        Dimension('notification', 'Notification', None, {}),
+        Dimension('notification.non_lue', 'Notification', None, {'lue': False}),
+        Dimension('notification.non_traitee', 'Notification', None, {'traitee': False}),
+        Dimension('notification.critique_non_lue', 'Notification', None, {'lue': False, 'priorite': 'critique'}),
+    )
+}
+
+MODELES_SUIVIS = sorted({dimension.modele for dimension in DIMENSIONS.values()})
+
+
+def dimensions_du_modele(modele):
+    """Dimensions calculées sur un modèle (nom de modèle ou classe)"""
+    nom = modele if isinstance(modele, str) else modele.__name__
+    return [dimension for dimension in DIMENSIONS.values() if dimension.modele == nom]
+
+
+def _champs(dimensions):
+    """Champs à lire pour calculer les valeurs de ces dimensions"""
+    champs = set()
+    for dimension in dimensions:
+        if dimension.champ:
+            champs.add(dimension.champ)
+        champs.update(dimension.filtre)
+    return champs
+
+
+def _valeurs(dimensions, lire):
+    """{dimension: valeur comptée, ou None si l'objet n'est pas compté}"""
+    valeurs = {}
+    for dimension in dimensions:
+        if any(lire(champ) != attendu for champ, attendu in dimension.filtre.items()):
+            valeurs[dimension.nom] = None
+        else:
+            valeurs[dimension.nom] = str(lire(dimension.champ)) if dimension.champ else TOTAL
+    return valeurs
+
+
+def valeurs_instance(instance):
+    """Valeurs de toutes les dimensions du modèle pour une instance en mémoire"""
+    return _valeurs(dimensions_du_modele(type(instance)), lambda champ: getattr(instance, champ))
+
+
+def variations(avant, apres):
+    """
+    Variations de compteurs entre deux états d'un même objet
+
+    Args:
+        avant, apres: {dimension: valeur} ({} pour un objet inexistant)
+
+    Returns:
+        Counter: {(dimension, valeur): delta}
+    """
+    deltas = Counter()
+    for nom in set(avant) | set(apres):
+        ancienne, nouvelle = avant.get(nom), apres.get(nom)
+        if ancienne == nouvelle:
+            continue
+        if ancienne is not None:
+            deltas[(nom, ancienne)] -= 1
+        if nouvelle is not None:
+            deltas[(nom, nouvelle)] += 1
+    return deltas
+
+
+def ajuster(deltas):
+    """
+    Applique des variations avec des UPDATE ... SET compteur = compteur + delta
+
+    Dans une transaction, les variations sont appliquées après sa validation
+    (et abandonnées si elle est annulée). Une dimension jamais calculée n'est
+    pas créée ici : elle le sera en entier par reconcilier() à la première lecture.
+    """
+    deltas = {cle: delta for cle, delta in deltas.items() if delta}
+    if deltas:
+        transaction.on_commit(lambda: _appliquer(deltas))
+
+
+def _appliquer(deltas):
+    """Applique les variations dans une transaction courte, dans un ordre fixe"""
+    from .models import CounterSnapshot
+
+    maintenant = timezone.now()
+    with transaction.atomic():
+        for (dimension, valeur), delta in sorted(deltas.items()):
+            lignes = CounterSnapshot.objects.filter(dimension=dimension, valeur=valeur)
+            if lignes.update(compteur=F('compteur') + delta, date_maj=maintenant):
+                continue
+            if CounterSnapshot.objects.filter(dimension=dimension, valeur=CALCULEE).exists():
+                # Nouvelle valeur d'une dimension déjà calculée (ex. premier séjour d'un client)
+                CounterSnapshot.objects.get_or_create(dimension=dimension, valeur=valeur)
+                lignes.update(compteur=F('compteur') + delta, date_maj=maintenant)
+
+
+# ============================================
+# SIGNAUX
+# ============================================
+
+def memoriser_avant(instance, update_fields=None):
+    """pre_save : mémorise sur l'instance les valeurs actuellement enregistrées"""
+    dimensions = dimensions_du_modele(type(instance))
+    champs = _champs(dimensions)
+    if update_fields is not None and not champs & {
+        type(instance)._meta.get_field(nom).attname for nom in update_fields
+    }:
+        # Aucun champ compté n'est modifié
+        instance._compteurs_avant = None
+        return
+    enregistre = None
+    if instance.pk is not None:
+        enregistre = type(instance).objects.filter(pk=instance.pk).values(*champs).first()
+    instance._compteurs_avant = _valeurs(dimensions, enregistre.get) if enregistre else {}
+
+
+def enregistrer_sauvegarde(instance):
+    """post_save : répercute la création ou la modification d'un objet"""
+    avant = getattr(instance, '_compteurs_avant', {})
+    if avant is None:
+        return
+    ajuster(variations(avant, valeurs_instance(instance)))
+    instance._compteurs_avant = None
+
+
+def enregistrer_suppression(instance):
+    """post_delete : retire un objet supprimé de ses compteurs"""
+    ajuster(variations(valeurs_instance(instance), {}))
+
+
+# ============================================
+# LECTURE ET RÉCONCILIATION
+# ============================================
+
+def calculer(nom):
+    """Recalcule une dimension depuis sa table source : {valeur: nombre}"""
+    dimension = DIMENSIONS[nom]
+    modele = apps.get_model('hotel', dimension.modele)
+    objets = modele.objects.filter(**dimension.filtre)
+    if not dimension.champ:
+        return {TOTAL: objets.count()}
+
+    # Toutes les valeurs possibles sont écrites, même à zéro
+    choix = modele._meta.get_field(dimension.champ).choices or []
+    resultat = {str(code): 0 for code, _ in choix}
+    for valeur, nombre in objets.values(dimension.champ).annotate(nombre=Count('pk')).values_list(dimension.champ, 'nombre'):
+        resultat[str(valeur)] = nombre
+    return resultat
+
+
+def reconcilier(noms=None, corriger=True):
+    """
+    Compare les compteurs enregistrés aux tables sources et les corrige
+
+    Args:
+        noms: Dimensions à recalculer (défaut : toutes)
+        corriger: Si False, se contente de signaler les écarts
+
+    Returns:
+        list: écarts (dimension, valeur, enregistré, réel) des dimensions déjà calculées
+    """
+    from .models import CounterSnapshot
+
+    ecarts = []
+    for nom in noms or DIMENSIONS:
+        with transaction.atomic():
+            lignes = CounterSnapshot.objects.select_for_update().filter(dimension=nom)
+            enregistres = dict(lignes.values_list('valeur', 'compteur'))
+            temoin = enregistres.pop(CALCULEE, None) is not None
+            # Lignes écrites avant l'ajout de la ligne témoin : dimension déjà calculée
+            calculee = temoin or bool(enregistres)
+            reels = calculer(nom)
+            ecarts_dimension = [
+                (nom, valeur, enregistres.get(valeur, 0), reels.get(valeur, 0))
+                for valeur in sorted(set(enregistres) | set(reels))
+                if calculee and enregistres.get(valeur, 0) != reels.get(valeur, 0)
+            ]
+            ecarts.extend(ecarts_dimension)
+            # Dimension jamais calculée : initialisation, pas un écart
+            if corriger and (not temoin or ecarts_dimension):
+                lignes.delete()
+                CounterSnapshot.objects.bulk_create([
+                    CounterSnapshot(dimension=nom, valeur=valeur, compteur=nombre)
+                    for valeur, nombre in [(CALCULEE, 0), *reels.items()]
+                ])
+    return ecarts
+
+
+def lire_compteurs(*noms):
+    """
+    Lit plusieurs dimensions en une requête
+
+    Les dimensions jamais calculées sont initialisées par reconcilier().
+
+    Returns:
+        dict: {dimension: {valeur: nombre}}
+    """
+    from .models import CounterSnapshot
+
+    def lire():
+        compteurs = {nom: {} for nom in noms}
+        for dimension, valeur, compteur in CounterSnapshot.objects.filter(dimension__in=noms).values_list(
+            'dimension', 'valeur', 'compteur'
+        ):
+            compteurs[dimension][valeur] = compteur
+        return compteurs
+
+    compteurs = lire()
+    manquantes = [nom for nom, valeurs in compteurs.items() if CALCULEE not in valeurs]
+    if manquantes:
+        reconcilier(manquantes)
+        compteurs = lire()
+    for valeurs in compteurs.values():
+        valeurs.pop(CALCULEE, None)
+    return compteurs
+
+
+def lire_compteur(nom, valeur):
+    """
+    Lit un seul compteur d'une dimension ventilée (ex. réservations d'un client)
+    sans charger les autres valeurs de la dimension
+
+    Returns:
+        int: le compteur (0 si la valeur n'a jamais été comptée)
+    """
+    from .models import CounterSnapshot
+
+    def lire():
+        return dict(CounterSnapshot.objects.filter(
+            dimension=nom, valeur__in=[str(valeur), CALCULEE]
+        ).values_list('valeur', 'compteur'))
+
+    lignes = lire()
+    if CALCULEE not in lignes:
+        reconcilier([nom])
+        lignes = lire()
+    return lignes.get(str(valeur), 0)
+
+
+def total(valeurs, *cles):
+    """Somme des compteurs d'une dimension (toutes les valeurs si aucune clé)"""
+    if not cles:
+        return sum(valeurs.values())
+    return sum(valeurs.get(cle, 0) for cle in cles)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Registre des statistiques du dashboard employé
+Chaque statistique déclare l'agrégat dont elle a besoin sur un modèle. Le
+dashboard rassemble les statistiques demandées par le poste, fusionne tous les
+agrégats d'un même modèle dans une seule requête (les agrégats identiques ne
+sont calculés qu'une fois) puis met le résultat en cache par poste : tous les
+réceptionnistes voient les mêmes chiffres.
+"""
+
+from collections import namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .snapshots import revenu_du_mois
+
+
+# Durée de vie par défaut du cache des statistiques d'un poste (secondes)
+DUREE_CACHE_DEFAUT = 60
+
+CLE_CACHE = 'hotel:dashboard:stats:{poste}:{jour}'
+
+# modele : nom du modèle de l'app hotel (None pour une valeur constante)
+# agregats : fonction(today) -> {clé: expression d'agrégat}
+# calcul : fonction(valeurs) -> valeur affichée (défaut : l'unique agrégat, 0 si NULL)
+Statistique = namedtuple('Statistique', 'nom modele agregats calcul')
+
+_registre = {}
+
+
+def enregistrer_stat(nom, modele=None, agregats=None, calcul=None):
+    """
+    Déclare une statistique du dashboard
+
+    Args:
+        nom: Nom utilisé dans UserProfile.get_dashboard_stats_config()
+        modele: Nom du modèle interrogé (ex. 'Reservation')
+        agregats: fonction(today) -> dict {clé: Count/Sum...}
+        calcul: Optionnel, fonction(dict des valeurs) -> valeur finale
+    """
+    _registre[nom] = Statistique(nom, modele, agregats, calcul)
+
+
+def _premier(valeurs):
+    return next(iter(valeurs.values()), 0) or 0
+
+
+def calculer_stats(noms, today=None):
+    """
+    Calcule les statistiques demandées en regroupant les agrégats par modèle
+
+    Une requête par modèle concerné, quel que soit le nombre de statistiques.
+    Les statistiques inconnues valent 0.
+
+    Returns:
+        dict: {nom: valeur}
+    """
+    today = today or timezone.now().date()
+
+    # Fusion des agrégats : une expression identique n'apparaît qu'une fois par modèle
+    par_modele = {}
+    besoins = {}
+    for nom in noms:
+        stat = _registre.get(nom)
+        if stat is None or stat.modele is None:
+            continue
+        expressions = par_modele.setdefault(stat.modele, [])
+        besoins[nom] = {}
+        for cle, expression in stat.agregats(today).items():
+            if expression not in expressions:
+                expressions.append(expression)
+            besoins[nom][cle] = (stat.modele, expressions.index(expression))
+
+    resultats = {}
+    for modele, expressions in par_modele.items():
+        valeurs = apps.get_model('hotel', modele).objects.aggregate(
+            **{f'a{index}': expression for index, expression in enumerate(expressions)}
+        )
+        resultats[modele] = [valeurs[f'a{index}'] for index in range(len(expressions))]
+
+    stats = {}
+    for nom in noms:
+        stat = _registre.get(nom)
+        if nom not in besoins:
+            stats[nom] = stat.calcul({}) if stat and stat.calcul else 0
+            continue
+        valeurs = {cle: resultats[modele][index] for cle, (modele, index) in besoins[nom].items()}
+        stats[nom] = (stat.calcul or _premier)(valeurs)
+    return stats
+
+
+def stats_poste(poste, stats_config):
+    """
+    Statistiques du dashboard d'un poste, en cache pour une courte durée
+
+    Args:
+        poste: Poste de l'employé (clé du cache partagé)
+        stats_config: Liste de dicts {'name', ...} (UserProfile.get_dashboard_stats_config())
+    """
+    today = timezone.now().date()
+    cle = CLE_CACHE.format(poste=poste, jour=today.isoformat())
+    stats = cache.get(cle)
+    if stats is None:
+        stats = calculer_stats([stat['name'] for stat in stats_config], today)
+        cache.set(cle, stats, getattr(settings, 'DASHBOARD_STATS_TTL', DUREE_CACHE_DEFAUT))
+    return stats
+
+
+# ============================================
+# STATISTIQUES DISPONIBLES
+# ============================================
+
+def _arrivees(today):
+    return {'nombre': Count('id', filter=Q(date_entree=today))}
+
+
+# Réservations du jour et arrivées : même agrégat, calculé une seule fois
+enregistrer_stat('reservations_today', 'Reservation', _arrivees)
+enregistrer_stat('arrivals_today', 'Reservation', _arrivees)
+enregistrer_stat('departures_today', 'Reservation', lambda today: {
+    'nombre': Count('id', filter=Q(date_sortie=today)),
+})
+enregistrer_stat('pending_checkins', 'Reservation', lambda today: {
+    'nombre': Count('id', filter=Q(date_entree=today, statut='confirmee')),
+})
+enregistrer_stat('active_reservations', 'Reservation', lambda today: {
+    'nombre': Count('id', filter=Q(statut__in=['confirmee', 'en_cours'])),
+})
+# Revenus reconnus nuit par nuit (RoomNight) : une somme indexée sur les nuits du mois
+enregistrer_stat('revenue_month', calcul=lambda valeurs: revenu_du_mois())
+
+enregistrer_stat('rooms_available', 'Chambre', lambda today: {
+    'nombre': Count('id', filter=Q(statut='libre')),
+})
+enregistrer_stat('rooms_to_clean', 'Chambre', lambda today: {
+    'nombre': Count('id', filter=Q(statut='nettoyage_requis')),
+})
+enregistrer_stat('rooms_cleaned_today', 'Chambre', lambda today: {
+    'nombre': Count('id', filter=Q(statut='libre', derniere_modification__date=today)),
+})
+enregistrer_stat(
+    'occupancy_rate', 'Chambre',
+    lambda today: {
+        'total': Count('id'),
+        'occupees': Count('id', filter=Q(statut='occupee')),
+    },
+    lambda valeurs: round(valeurs['occupees'] / valeurs['total'] * 100, 1) if valeurs['total'] else 0
+)
+
+enregistrer_stat('new_clients_today', 'Client', lambda today: {
+    'nombre': Count('id', filter=Q(date_inscription__date=today)),
+})
+enregistrer_stat('staff_count', 'UserProfile', lambda today: {
+    'nombre': Count('id', filter=Q(statut_employe='actif')),
+})
+
+# À implémenter (services, messages, maintenance, restaurant) : valeur constante
+for _nom in ('services_requested', 'guest_messages', 'maintenance_requests', 'orders_today'):
+    enregistrer_stat(_nom, calcul=lambda valeurs: 0)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Export comptable en flux (CSV)
+Les factures, fiches de paie et charges sont lues par lots avec
+values_list().iterator() : les noms des clients et des employés viennent de la
+même requête (pas de chargement par ligne), aucune instance de modèle n'est
+construite et le fichier est envoyé au fur et à mesure par une
+StreamingHttpResponse. La mémoire reste constante quelle que soit la taille de
+l'historique.
+"""
+
+import csv
+import io
+
+from django.utils import timezone
+
+
+# Types de documents exportables, dans l'ordre du fichier
+TYPES_EXPORT = ('facture', 'salaire', 'charge')
+
+ENTETE = ['Type', 'Numéro', 'Date', 'Libellé', 'Montant TTC', 'Statut']
+
+# Lignes lues par requête (curseur côté serveur quand la base le permet)
+TAILLE_LOT = 2000
+
+
+def _factures(date_debut, date_fin, statut, taille_lot):
+    from .models import Facture
+
+    statuts = dict(Facture.STATUT_CHOICES)
+    factures = Facture.objects.order_by('-date_emission')
+    if date_debut:
+        factures = factures.filter(date_emission__date__gte=date_debut)
+    if date_fin:
+        factures = factures.filter(date_emission__date__lte=date_fin)
+    if statut:
+        factures = factures.filter(statut=statut)
+    lignes = factures.values_list(
+        'numero_facture', 'date_emission', 'client__prenom', 'client__nom', 'montant_ttc', 'statut'
+    ).iterator(chunk_size=taille_lot)
+    for numero, date_emission, prenom, nom, montant_ttc, code in lignes:
+        yield [
+            'Facture',
+            numero,
+            timezone.localtime(date_emission).strftime('%d/%m/%Y'),
+            f'Client: {prenom} {nom}',
+            montant_ttc,
+            statuts.get(code, code),
+        ]
+
+
+def _fiches_paie(date_debut, date_fin, statut, taille_lot):
+    from .models import FichePaie
+
+    statuts = dict(FichePaie.STATUT_CHOICES)
+    fiches = FichePaie.objects.order_by('-mois')
+    if date_debut:
+        fiches = fiches.filter(mois__gte=date_debut)
+    if date_fin:
+        fiches = fiches.filter(mois__lte=date_fin)
+    if statut:
+        fiches = fiches.filter(statut=statut)
+    lignes = fiches.values_list(
+        'numero_fiche', 'mois', 'employe__first_name', 'employe__last_name', 'employe__username',
+        'salaire_net', 'statut'
+    ).iterator(chunk_size=taille_lot)
+    for numero, mois, prenom, nom, username, salaire_net, code in lignes:
+        # Même rendu que User.get_full_name() or username
+        nom_complet = f'{prenom} {nom}'.strip() or username
+        yield [
+            'Salaire',
+            numero,
+            mois.strftime('%d/%m/%Y'),
+            f'Employé: {nom_complet}',
+            salaire_net,
+            statuts.get(code, code),
+        ]
+
+
+def _charges(date_debut, date_fin, statut, taille_lot):
+    from .models import ChargeComptable
+
+    statuts = dict(ChargeComptable.STATUT_CHOICES)
+    charges = ChargeComptable.objects.order_by('-date_facture')
+    if date_debut:
+        charges = charges.filter(date_facture__gte=date_debut)
+    if date_fin:
+        charges = charges.filter(date_facture__lte=date_fin)
+    if statut:
+        charges = charges.filter(statut=statut)
+    lignes = charges.values_list(
+        'reference_facture', 'date_facture', 'libelle', 'montant_ttc', 'statut'
+    ).iterator(chunk_size=taille_lot)
+    for reference, date_facture, libelle, montant_ttc, code in lignes:
+        yield [
+            'Charge',
+            reference or '-',
+            date_facture.strftime('%d/%m/%Y'),
+            libelle,
+            montant_ttc,
+            statuts.get(code, code),
+        ]
+
+
+# Générateur de lignes et modèle (pour les statuts valides) de chaque type
+SOURCES = {
+    'facture': (_factures, 'Facture'),
+    'salaire': (_fiches_paie, 'FichePaie'),
+    'charge': (_charges, 'ChargeComptable'),
+}
+
+
+def statuts_valides(type_export):
+    """Codes de statut possibles pour un type de document"""
+    from django.apps import apps
+    return {code for code, _ in apps.get_model('hotel', SOURCES[type_export][1]).STATUT_CHOICES}
+
+
+def lignes_comptables(types=TYPES_EXPORT, date_debut=None, date_fin=None, statut='', taille_lot=TAILLE_LOT):
+    """
+    Lignes de l'export comptable (sans l'en-tête), produites au fil de la lecture
+
+    Args:
+        types: Types de documents à exporter (parmi TYPES_EXPORT)
+        date_debut: Optionnel, première date incluse
+        date_fin: Optionnel, dernière date incluse
+        statut: Optionnel, code de statut ; les types qui n'ont pas ce statut
+                sont ignorés (ex. 'paye' n'existe que pour les fiches de paie)
+        taille_lot: Nombre de lignes lues par requête
+
+    Yields:
+        list: Type, Numéro, Date, Libellé, Montant TTC, Statut
+    """
+    for type_export in TYPES_EXPORT:
+        if type_export not in types:
+            continue
+        if statut and statut not in statuts_valides(type_export):
+            continue
+        generateur, _ = SOURCES[type_export]
+        yield from generateur(date_debut, date_fin, statut, taille_lot)
+
+
+def flux_csv(lignes, taille_lot=TAILLE_LOT):
+    """
+    Convertit des lignes en morceaux de CSV pour une StreamingHttpResponse
+
+    Les lignes sont regroupées par lots de taille_lot : un morceau par lot
+    plutôt qu'un par ligne, pour limiter le coût par ligne de la réponse.
+    """
+    tampon = io.StringIO()
+    writer = csv.writer(tampon)
+    writer.writerow(ENTETE)
+    nombre = 0
+    for ligne in lignes:
+        writer.writerow(ligne)
+        nombre += 1
+        if nombre % taille_lot == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+    yield tampon.getvalue()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Facturation en masse des réservations sans facture
+Les réservations sont parcourues par lots, dans l'ordre de leur identifiant.
+Pour chaque lot, les montants HT / TVA / TTC sont calculés en Decimal, un bloc
+de numéros est réservé d'un coup dans la séquence du jour, et les factures sont
+insérées avec un seul bulk_create, dans une transaction par lot : un lot est
+entièrement créé ou pas du tout, et une reprise repart après le dernier lot validé.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+
+# Réservations lues et factures créées par transaction
+TAILLE_LOT = 500
+
+STATUTS_A_FACTURER = ('confirmee',)
+
+
+def reservations_a_facturer(depuis=None, statuts=STATUTS_A_FACTURER):
+    """
+    Réservations sans facture, dans l'ordre de leur identifiant
+
+    Args:
+        depuis: Optionnel, date de création minimale des réservations
+        statuts: Statuts des réservations à facturer
+    """
+    from .models import Reservation
+
+    reservations = Reservation.objects.filter(statut__in=statuts, facture__isnull=True)
+    if depuis:
+        reservations = reservations.filter(date_creation__date__gte=depuis)
+    return reservations.order_by('pk')
+
+
+def preparer_factures(lignes, numeros, date_emission=None):
+    """
+    Factures non enregistrées, montants calculés (TVA 20 % incluse dans le prix)
+
+    Args:
+        lignes: tuples (id de réservation, id du client, id du créateur, prix TTC)
+        numeros: numéros de facture, un par ligne
+        date_emission: Optionnel, date de référence de l'échéance (défaut : aujourd'hui)
+    """
+    from .models import Facture
+
+    echeance = (date_emission or timezone.localdate()) + timedelta(days=30)
+    factures = []
+    for (reservation_id, client_id, cree_par_id, prix_total), numero in zip(lignes, numeros):
+        facture = Facture(
+            numero_facture=numero,
+            reservation_id=reservation_id,
+            client_id=client_id,
+            cree_par_id=cree_par_id,
+            montant_ht=Facture.montant_ht_depuis_ttc(prix_total or Decimal('0')),
+            date_echeance=echeance,
+        )
+        facture.calculer_montants()
+        factures.append(facture)
+    return factures
+
+
+def facturer_en_masse(reservations, taille_lot=TAILLE_LOT, apres_id=0, progression=None):
+    """
+    Crée les factures manquantes d'un ensemble de réservations
+
+    Args:
+        reservations: QuerySet de réservations sans facture (reservations_a_facturer)
+        taille_lot: Nombre de factures par transaction
+        apres_id: Reprise : ignorer les réservations d'identifiant inférieur ou égal
+        progression: Optionnel, appelée avec le bilan après chaque lot validé
+
+    Returns:
+        dict: total, creees, montant_ttc, dernier_id
+    """
+    from .models import Facture
+
+    restantes = reservations.filter(pk__gt=apres_id)
+    bilan = {
+        'total': restantes.count(),
+        'creees': 0,
+        'montant_ttc': Decimal('0.00'),
+        'dernier_id': apres_id,
+    }
+    while True:
+        lignes = list(
+            reservations.filter(pk__gt=bilan['dernier_id'])
+            .values_list('pk', 'client_id', 'cree_par_id', 'prix_total')[:taille_lot]
+        )
+        if not lignes:
+            break
+        with transaction.atomic():
+            factures = preparer_factures(lignes, Facture.prochains_numeros(len(lignes)))
+            Facture.objects.bulk_create(factures)
+        bilan['creees'] += len(factures)
+        bilan['montant_ttc'] += sum(facture.montant_ttc for facture in factures)
+        bilan['dernier_id'] = lignes[-1][0]
+        if progression:
+            progression(bilan)
+    return bilan
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Cache HTTP des API de disponibilité
+Les réponses GET portent un ETag et un Last-Modified dérivés de la dernière
+modification des réservations ou des chambres : un client qui renvoie
+If-None-Match / If-Modified-Since reçoit un 304 sans que la recherche de
+disponibilité soit exécutée.
+"""
+
+import hashlib
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .availability import derniere_modification
+
+
+def _derniere_modification(request, *args, **kwargs):
+    if request.method != 'GET':
+        return None
+    # Les réponses dépendent aussi de la date du jour (périodes par défaut)
+    debut_du_jour = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    return max(derniere_modification(), debut_du_jour)
+
+
+def _etag(request, *args, **kwargs):
+    if request.method != 'GET':
+        return None
+    empreinte = hashlib.md5(
+        f'{derniere_modification().isoformat()}|{timezone.localdate()}|{request.get_full_path()}'.encode()
+    )
+    return empreinte.hexdigest()
+
+
+# Usage : @disponibilite_conditionnelle sur une vue GET de disponibilité
+disponibilite_conditionnelle = condition(etag_func=_etag, last_modified_func=_derniere_modification)
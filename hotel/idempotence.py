@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Clés d'idempotence pour les API de réservation
+Un client qui renvoie une requête (ex. après un timeout) avec le même en-tête
+Idempotency-Key reçoit la réponse déjà enregistrée : la réservation n'est pas
+créée une seconde fois et les signaux (facture, notification) ne sont pas rejoués.
+"""
+
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .utils import get_adresse_ip
+
+
+# Durée de conservation par défaut (secondes) si IDEMPOTENCY_KEY_TTL n'est pas défini
+DUREE_PAR_DEFAUT = 24 * 60 * 60
+
+# Délai (secondes) au-delà duquel une requête toujours "en cours" est considérée
+# abandonnée (processus arrêté en plein traitement) si IDEMPOTENCY_PROCESSING_TIMEOUT
+# n'est pas défini : une nouvelle requête avec la même clé peut alors la reprendre
+DELAI_TRAITEMENT_PAR_DEFAUT = 60
+
+LONGUEUR_CLE_MAX = 255
+
+
+def duree_conservation():
+    """Durée de conservation des clés d'idempotence"""
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', DUREE_PAR_DEFAUT))
+
+
+def delai_traitement():
+    """Durée maximale de traitement d'une requête avant qu'une autre puisse reprendre sa clé"""
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_PROCESSING_TIMEOUT', DELAI_TRAITEMENT_PAR_DEFAUT))
+
+
+def _portee(request):
+    """Les clés sont propres à un utilisateur (ou à une adresse IP si anonyme)"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{get_adresse_ip(request)}'
+
+
+def _empreinte(request):
+    """Empreinte de la requête : une clé ne peut pas être réutilisée pour une autre requête"""
+    contenu = hashlib.sha256()
+    contenu.update(request.method.encode())
+    contenu.update(request.get_full_path().encode())
+    contenu.update(request.body)
+    return contenu.hexdigest()
+
+
+def _rejouer(enregistrement):
+    """Reconstruit la réponse enregistrée"""
+    response = HttpResponse(
+        enregistrement.contenu,
+        status=enregistrement.statut_http,
+        content_type=enregistrement.type_contenu or 'application/json'
+    )
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _reprendre(existant, maintenant):
+    """
+    Reprend une clé restée "en cours" au-delà du délai de traitement
+    date_creation sert de jeton : seule la première requête qui la met à jour
+    obtient la clé, et la requête abandonnée ne peut plus écrire sa réponse.
+
+    Returns:
+        bool: True si la clé a été reprise par cette requête
+    """
+    from .models import IdempotencyKey
+
+    reprise = IdempotencyKey.objects.filter(
+        pk=existant.pk,
+        statut_http__isnull=True,
+        date_creation=existant.date_creation,
+    ).update(date_creation=maintenant, date_expiration=maintenant + duree_conservation())
+    existant.date_creation = maintenant
+    return reprise == 1
+
+
+def idempotent(view_func):
+    """
+    Décorateur rendant une API de création rejouable sans effet de bord
+    Usage : @idempotent (le client envoie l'en-tête Idempotency-Key)
+    
+    - sans en-tête, la vue est appelée normalement ;
+    - première requête : la réponse est enregistrée (sauf erreur serveur 5xx) ;
+    - même clé et même requête : la réponse enregistrée est renvoyée ;
+    - même clé et requête différente : 422 ;
+    - même clé pendant que la première requête est en cours : 409 ;
+    - même clé et même requête, la première étant en cours depuis plus de
+      IDEMPOTENCY_PROCESSING_TIMEOUT secondes (processus arrêté) : la requête
+      reprend la clé et est traitée.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        from .models import IdempotencyKey
+
+        cle = request.headers.get('Idempotency-Key', '').strip()
+        if not cle:
+            return view_func(request, *args, **kwargs)
+        if len(cle) > LONGUEUR_CLE_MAX:
+            return JsonResponse({'error': 'Clé d\'idempotence trop longue'}, status=400)
+
+        portee = _portee(request)
+        empreinte = _empreinte(request)
+        maintenant = timezone.now()
+
+        # Une clé expirée peut être réutilisée
+        IdempotencyKey.objects.filter(portee=portee, cle=cle, date_expiration__lte=maintenant).delete()
+
+        try:
+            with transaction.atomic():
+                enregistrement = IdempotencyKey.objects.create(
+                    portee=portee,
+                    cle=cle,
+                    empreinte=empreinte,
+                    date_expiration=maintenant + duree_conservation()
+                )
+        except IntegrityError:
+            existant = IdempotencyKey.objects.filter(portee=portee, cle=cle).first()
+            if existant is None:
+                return JsonResponse({'error': 'Une requête avec cette clé est déjà en cours de traitement'}, status=409)
+            if existant.empreinte != empreinte:
+                return JsonResponse({'error': 'Clé d\'idempotence déjà utilisée pour une autre requête'}, status=422)
+            if existant.est_terminee():
+                return _rejouer(existant)
+            abandonnee = existant.date_creation <= maintenant - delai_traitement()
+            if not abandonnee or not _reprendre(existant, maintenant):
+                return JsonResponse({'error': 'Une requête avec cette clé est déjà en cours de traitement'}, status=409)
+            enregistrement = existant
+
+        # Écritures limitées à la clé telle que prise par cette requête (non reprise depuis)
+        cle_prise = IdempotencyKey.objects.filter(
+            pk=enregistrement.pk, statut_http__isnull=True, date_creation=enregistrement.date_creation
+        )
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            cle_prise.delete()
+            raise
+
+        # Les erreurs serveur ne sont pas mémorisées : le client peut réessayer
+        if response.streaming or response.status_code >= 500:
+            cle_prise.delete()
+            return response
+
+        cle_prise.update(
+            statut_http=response.status_code,
+            type_contenu=response.get('Content-Type', ''),
+            contenu=response.content.decode(response.charset or 'utf-8'),
+        )
+        return response
+
+    return wrapper
+
+
+def purger_cles_expirees():
+    """
+    Supprime les clés d'idempotence expirées
+    
+    Returns:
+        int: nombre de clés supprimées
+    """
+    from .models import IdempotencyKey
+
+    supprimees, _ = IdempotencyKey.objects.filter(date_expiration__lte=timezone.now()).delete()
+    return supprimees
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de calcul des KPIs du rapport de performance
+Tous les indicateurs commerciaux, financiers et opérationnels sont calculés par
+agrégation conditionnelle (Count/Sum avec filter=Q(...)) : une seule requête
+par table source au lieu d'un count()/aggregate() par indicateur.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .occupation import calculer_occupation
+
+
+# Nombre maximum de requêtes pour calculer tous les KPIs (une par table source,
+# plus la lecture des séjours de la période par le moteur d'occupation)
+BUDGET_REQUETES = 9
+
+PERIODES = ('day', 'month', 'year')
+
+
+def bornes_periode(period, today):
+    """Retourne (début, fin) inclusifs de la période 'day', 'month' ou 'year'"""
+    if period == 'month':
+        return today.replace(day=1), today
+    if period == 'year':
+        return today.replace(month=1, day=1), today
+    return today, today
+
+
+def _compter_par_statut(statuts, champ='statut'):
+    """Un Count conditionnel par statut, nommé d'après le statut"""
+    return {statut: Count('id', filter=Q(**{champ: statut})) for statut in statuts}
+
+
+def calculer_kpis(period='month', today=None, inclure_finances=True):
+    """
+    Calcule les KPIs du rapport de performance
+
+    Args:
+        period: 'day', 'month' ou 'year' (période du taux d'occupation et du RevPAR)
+        today: Optionnel, date de référence (défaut : aujourd'hui)
+        inclure_finances: Si False, les requêtes financières ne sont pas exécutées
+
+    Returns:
+        dict: period_start, period_end, performance_commerciale,
+              performance_financiere (None si non demandée), performance_operationnelle
+    """
+    from .models import Chambre, ChargeComptable, Client, Facture, FichePaie, Maintenance, Reservation
+
+    today = today or timezone.now().date()
+    if period not in PERIODES:
+        period = 'month'
+    period_start, period_end = bornes_periode(period, today)
+    zero = Decimal('0')
+
+    # ============== PERFORMANCE COMMERCIALE ==============
+
+    reservations = Reservation.objects.aggregate(
+        total=Count('id'),
+        **_compter_par_statut(('confirmee', 'en_cours', 'terminee', 'annulee')),
+    )
+
+    # Nuits de la période uniquement, prix réparti par nuit (voir hotel/occupation.py)
+    chambres_total = Chambre.objects.aggregate(total=Count('id'))['total']
+    occupation = calculer_occupation(
+        period_start, period_end + timedelta(days=1), nombre_chambres=chambres_total
+    )['totaux']
+    revenu_periode = occupation['chiffre_affaires']
+
+    performance_commerciale = {
+        'total_reservations': reservations,
+        'taux_occupation': occupation['taux_occupation'],
+        'revpar': occupation['revpar'],
+        'adr': occupation['adr'],
+        'revenue_period': revenu_periode,
+        'chambres_total': chambres_total,
+        'nuits_vendues': occupation['nuits_vendues'],
+        'nuits_disponibles': occupation['nuits_disponibles'],
+    }
+
+    # ============== PERFORMANCE FINANCIÈRE ==============
+
+    du_mois = Q(date_facture__year=today.year, date_facture__month=today.month)
+    charges = ChargeComptable.objects.aggregate(
+        maintenance=Sum('montant_ttc', filter=du_mois & Q(type_charge='maintenance')),
+        autres=Sum('montant_ttc', filter=du_mois & Q(type_charge__in=['inventaire', 'autre'])),
+    )
+    maintenance_mois = charges['maintenance'] or zero
+
+    performance_financiere = None
+    if inclure_finances:
+        paiements = Facture.objects.filter(
+            statut='payee',
+            date_paiement__date__gte=period_start,
+            date_paiement__date__lte=period_end
+        ).aggregate(total=Sum('montant_ttc'))['total'] or zero
+
+        salaires = FichePaie.objects.filter(
+            mois__year=today.year,
+            mois__month=today.month,
+            statut='paye'
+        ).aggregate(total=Sum('salaire_net'))['total'] or zero
+
+        autres_charges = charges['autres'] or zero
+        charges_totales = salaires + maintenance_mois + autres_charges
+        performance_financiere = {
+            'revenus_reels': round(paiements, 2),
+            'revenus_estimes': round(revenu_periode, 2),
+            'charges_totales': round(charges_totales, 2),
+            'salaires': round(salaires, 2),
+            'maintenance': round(maintenance_mois, 2),
+            'autres_charges': round(autres_charges, 2),
+            'benefice_estime': round(revenu_periode - charges_totales, 2),
+        }
+
+    # ============== PERFORMANCE OPÉRATIONNELLE ==============
+
+    clients = Client.objects.aggregate(
+        total=Count('id'),
+        nouveaux=Count('id', filter=Q(
+            date_inscription__year=today.year,
+            date_inscription__month=today.month
+        )),
+    )
+    maintenances = Maintenance.objects.aggregate(
+        total=Count('id'),
+        **_compter_par_statut(('en_attente', 'en_cours', 'terminee')),
+    )
+    maintenances['cout_mois'] = maintenance_mois
+
+    performance_operationnelle = {
+        'total_clients': clients['total'],
+        'nouveaux_clients_mois': clients['nouveaux'],
+        'maintenance': maintenances,
+        'total_employes': User.objects.filter(is_staff=True, is_active=True).count(),
+    }
+
+    return {
+        'period': period,
+        'period_start': period_start,
+        'period_end': period_end,
+        'performance_commerciale': performance_commerciale,
+        'performance_financiere': performance_financiere,
+        'performance_operationnelle': performance_operationnelle,
+    }
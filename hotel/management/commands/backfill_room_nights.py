@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Commande pour (re)construire la table des nuitées (RoomNight)
+à partir des réservations existantes, ou vérifier qu'elle leur correspond
+(--verifier) : c'est la table de reconnaissance du chiffre d'affaires nuit par nuit
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+
+from hotel.models import Reservation, RoomNight
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les nuitées (RoomNight) de toutes les réservations non annulées'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=2000,
+            help='Nombre de nuitées écrites par bulk_create (défaut : 2000)',
+        )
+        parser.add_argument(
+            '--verifier',
+            action='store_true',
+            help='Compare les nuitées enregistrées aux réservations sans rien écrire',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compte seulement les nuitées à écrire sans modifier la base',
+        )
+
+    def handle(self, *args, **options):
+        taille_lot = options['taille_lot']
+        if taille_lot < 1:
+            raise CommandError('--taille-lot doit être positif')
+
+        if options['verifier']:
+            self._verifier()
+            return
+
+        reservations = Reservation.objects.exclude(statut='annulee').only(
+            'id', 'chambre_id', 'date_entree', 'date_sortie', 'statut', 'prix_total'
+        ).order_by('id')
+
+        self.stdout.write(f'🔍 {reservations.count()} réservation(s) non annulée(s) à traiter...')
+
+        if options['dry_run']:
+            total = sum(
+                len(RoomNight.nuits_de(reservation))
+                for reservation in reservations.iterator(chunk_size=taille_lot)
+            )
+            self.stdout.write(f'🔍 Mode DRY-RUN : {total} nuitée(s) seraient écrites')
+            return
+
+        total = 0
+        lot = []
+        with transaction.atomic():
+            supprimees, _ = RoomNight.objects.all().delete()
+            if supprimees:
+                self.stdout.write(f'🗑️  {supprimees} nuitée(s) existante(s) supprimée(s)')
+
+            for reservation in reservations.iterator(chunk_size=taille_lot):
+                lot.extend(RoomNight.nuits_de(reservation))
+                if len(lot) >= taille_lot:
+                    RoomNight.objects.bulk_create(lot, batch_size=taille_lot)
+                    total += len(lot)
+                    lot = []
+                    self.stdout.write(f'  ✍️  {total} nuitées écrites...')
+
+            if lot:
+                RoomNight.objects.bulk_create(lot, batch_size=taille_lot)
+                total += len(lot)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} nuitée(s) reconstruite(s)'))
+
+    def _verifier(self):
+        """Nombre de nuits, montant et statut des nuitées de chaque réservation"""
+        attendues = {}
+        for reservation_id, date_entree, date_sortie, prix_total, statut in Reservation.objects.exclude(
+            statut='annulee'
+        ).values_list('id', 'date_entree', 'date_sortie', 'prix_total', 'statut'):
+            nuits = (date_sortie - date_entree).days
+            if nuits > 0:
+                attendues[reservation_id] = (nuits, prix_total, statut, statut)
+
+        enregistrees = {
+            ligne['reservation_id']: (ligne['nuits'], ligne['total'], ligne['statut_min'], ligne['statut_max'])
+            for ligne in RoomNight.objects.values('reservation_id').annotate(
+                nuits=Count('id'), total=Sum('prix_nuit'), statut_min=Min('statut'), statut_max=Max('statut')
+            )
+        }
+
+        ecarts = sorted(
+            reservation_id for reservation_id in set(attendues) | set(enregistrees)
+            if attendues.get(reservation_id) != enregistrees.get(reservation_id)
+        )
+        for reservation_id in ecarts[:20]:
+            self.stdout.write(self.style.ERROR(
+                f'  ❌ Réservation #{reservation_id} : attendu {attendues.get(reservation_id)}, '
+                f'enregistré {enregistrees.get(reservation_id)} (nuits, montant, statuts)'
+            ))
+        if ecarts:
+            raise CommandError(
+                f'{len(ecarts)} réservation(s) avec des nuitées incohérentes '
+                f'(relancer la commande sans --verifier pour reconstruire)'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Nuitées cohérentes avec les {len(attendues)} réservation(s) non annulée(s)'
+        ))
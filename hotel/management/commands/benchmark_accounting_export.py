@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Commande de mesure de l'export comptable en flux
+Insère des charges fictives (500 000 par défaut) dans une transaction annulée à
+la fin, puis consomme l'export CSV comme le ferait la réponse HTTP : durée,
+débit, volume produit et pic de mémoire Python pendant l'export.
+"""
+
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from hotel.exports import TAILLE_LOT, flux_csv, lignes_comptables
+from hotel.models import ChargeComptable
+
+
+class AnnulerBenchmark(Exception):
+    """Sert à annuler la transaction une fois la mesure terminée"""
+
+
+class Command(BaseCommand):
+    help = 'Mesure la durée et la mémoire de l\'export comptable CSV sur un gros volume'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lignes',
+            type=int,
+            default=500000,
+            help='Nombre de charges fictives à exporter (défaut : 500000)',
+        )
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=TAILLE_LOT,
+            help=f'Lignes lues par requête (défaut : {TAILLE_LOT})',
+        )
+
+    def handle(self, *args, **options):
+        nombre = options['lignes']
+        taille_lot = options['taille_lot']
+        if nombre < 1 or taille_lot < 1:
+            raise CommandError('Paramètres invalides')
+
+        try:
+            with transaction.atomic():
+                self._inserer(nombre)
+                self._mesurer(taille_lot)
+                raise AnnulerBenchmark()
+        except AnnulerBenchmark:
+            self.stdout.write('🧹 Charges fictives supprimées (transaction annulée)')
+
+    def _inserer(self, nombre):
+        self.stdout.write(f'📝 Insertion de {nombre} charges fictives...')
+        debut = time.perf_counter()
+        aujourd_hui = timezone.now().date()
+        montant_ht = Decimal('100.00')
+        ChargeComptable.objects.bulk_create(
+            (
+                ChargeComptable(
+                    libelle=f'Charge de test {index}',
+                    type_charge='autre',
+                    montant_ht=montant_ht,
+                    montant_tva=Decimal('20.00'),
+                    montant_ttc=Decimal('120.00'),
+                    date_facture=aujourd_hui - timedelta(days=index % 3650),
+                    date_echeance=aujourd_hui,
+                    reference_facture=f'BENCH-{index}',
+                )
+                for index in range(nombre)
+            ),
+            batch_size=5000,
+        )
+        self.stdout.write(f'   {time.perf_counter() - debut:.1f}s')
+
+    def _mesurer(self, taille_lot):
+        # Première passe sans traçage mémoire : durée réelle
+        self.stdout.write('📤 Export en flux...')
+        with CaptureQueriesContext(connection) as requetes:
+            debut = time.perf_counter()
+            lignes, octets = self._consommer(taille_lot)
+            duree = time.perf_counter() - debut
+
+        # Seconde passe sous tracemalloc : pic de mémoire Python pendant l'export
+        tracemalloc.start()
+        self._consommer(taille_lot)
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(f'\n📊 {lignes} lignes exportées en {duree:.2f}s')
+        self.stdout.write(f'  ⚡ Débit : {lignes / duree:,.0f} lignes/s'.replace(',', ' '))
+        self.stdout.write(f'  📦 Volume : {octets / 1024 / 1024:.1f} Mo')
+        self.stdout.write(f'  🔎 Requêtes SQL : {len(requetes)}')
+        self.stdout.write(f'  🧠 Pic de mémoire Python : {pic / 1024 / 1024:.1f} Mo')
+
+    def _consommer(self, taille_lot):
+        """Lit tout le flux sans le garder, comme la réponse HTTP"""
+        lignes = -1  # en-tête
+        octets = 0
+        for morceau in flux_csv(lignes_comptables(taille_lot=taille_lot), taille_lot=taille_lot):
+            lignes += morceau.count('\n')
+            octets += len(morceau.encode('utf-8'))
+        return lignes, octets
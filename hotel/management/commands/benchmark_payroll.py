@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Commande de mesure de la génération des fiches de paie
+Crée des employés fictifs (5 000 par défaut) dans une transaction annulée à
+la fin, puis compare la génération en une passe (generer_fiches_paie) avec
+l'ancienne boucle exists() + create() par employé, mesurée sur un échantillon
+puis extrapolée. Vérifie aussi que les deux donnent les mêmes montants.
+"""
+
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from hotel.models import FichePaie, UserProfile
+from hotel.paie import ElementsPaie, calculer_paie, date_reference, generer_fiches_paie, premier_du_mois
+
+
+PREFIXE_UTILISATEURS = 'bench.paie.'
+
+
+class AnnulerBenchmark(Exception):
+    """Sert à annuler la transaction une fois la mesure terminée"""
+
+
+class Command(BaseCommand):
+    help = 'Mesure la génération des fiches de paie pour un grand nombre d\'employés'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--employes',
+            type=int,
+            default=5000,
+            help='Nombre d\'employés fictifs (défaut : 5000)',
+        )
+        parser.add_argument(
+            '--echantillon',
+            type=int,
+            default=500,
+            help='Employés traités par l\'ancienne boucle, pour comparaison (défaut : 500)',
+        )
+
+    def handle(self, *args, **options):
+        nombre = options['employes']
+        echantillon = min(options['echantillon'], nombre)
+        if nombre < 1 or echantillon < 0:
+            raise CommandError('Paramètres invalides')
+
+        try:
+            with transaction.atomic():
+                employes = self._creer_employes(nombre)
+                self._mesurer(employes, echantillon)
+                raise AnnulerBenchmark()
+        except AnnulerBenchmark:
+            self.stdout.write('🧹 Employés et fiches fictifs supprimés (transaction annulée)')
+
+    def _creer_employes(self, nombre):
+        self.stdout.write(f'📝 Création de {nombre} employés fictifs...')
+        generateur = random.Random(42)
+        aujourd_hui = timezone.now().date()
+        User.objects.bulk_create(
+            [
+                User(username=f'{PREFIXE_UTILISATEURS}{index}', is_staff=True, is_active=True)
+                for index in range(nombre)
+            ],
+            batch_size=1000,
+        )
+        employes = User.objects.filter(username__startswith=PREFIXE_UTILISATEURS)
+        # bulk_create : pas de signal, donc pas de fiche créée avec le profil
+        UserProfile.objects.bulk_create(
+            [
+                UserProfile(
+                    user_id=employe_id,
+                    salaire=Decimal(generateur.randrange(150000, 600000)) / 100,
+                    date_embauche=aujourd_hui - timedelta(days=generateur.randrange(0, 20 * 365)),
+                    statut_employe='actif',
+                )
+                for employe_id in employes.values_list('pk', flat=True)
+            ],
+            batch_size=1000,
+        )
+        return employes
+
+    def _mesurer(self, employes, echantillon):
+        mois = premier_du_mois(timezone.now().date())
+        mois_precedent = premier_du_mois(mois - timedelta(days=1))
+        nombre = employes.count()
+
+        # Ancienne méthode, sur un échantillon, pour un mois à part
+        debut = time.perf_counter()
+        with CaptureQueriesContext(connection) as requetes_boucle:
+            for employe in employes.select_related('profile').order_by('pk')[:echantillon]:
+                if not FichePaie.objects.filter(employe=employe, mois=mois_precedent).exists():
+                    FichePaie.objects.create(
+                        employe=employe,
+                        mois=mois_precedent,
+                        **calculer_paie(employe.profile.salaire, employe.profile.date_embauche,
+                                        date_reference(mois_precedent))._asdict()
+                    )
+        duree_boucle = time.perf_counter() - debut
+
+        # Génération en une passe pour le mois courant
+        debut = time.perf_counter()
+        with CaptureQueriesContext(connection) as requetes_lot:
+            bilan = generer_fiches_paie([mois], employes=employes)[mois]
+        duree_lot = time.perf_counter() - debut
+
+        # Rattrapage du mois précédent : seuls les employés hors échantillon manquent
+        debut = time.perf_counter()
+        rattrapage = generer_fiches_paie([mois_precedent], employes=employes)[mois_precedent]
+        duree_rattrapage = time.perf_counter() - debut
+
+        # Les fiches du lot doivent correspondre au calcul unitaire
+        ecarts = 0
+        fiches = FichePaie.objects.filter(mois=mois, employe__in=employes).values_list(
+            'employe__profile__salaire', 'employe__profile__date_embauche', *ElementsPaie._fields
+        )
+        for salaire, date_embauche, *montants in fiches:
+            if ElementsPaie(*montants) != calculer_paie(salaire, date_embauche):
+                ecarts += 1
+
+        self.stdout.write(f'\n📊 {nombre} employés')
+        if echantillon:
+            estimation = duree_boucle / echantillon * nombre
+            self.stdout.write(
+                f'  🐢 Boucle exists() + create() : {echantillon} fiches en {duree_boucle:.2f}s, '
+                f'{len(requetes_boucle)} requêtes (≈ {estimation:.1f}s pour {nombre})'
+            )
+        self.stdout.write(
+            f'  ⚡ Génération en une passe : {bilan["creees"]} fiches en {duree_lot:.2f}s, '
+            f'{len(requetes_lot)} requêtes'
+        )
+        self.stdout.write(
+            f'  🔁 Rattrapage du mois précédent : {rattrapage["creees"]} fiches créées, '
+            f'{rattrapage["existantes"]} déjà présentes, en {duree_rattrapage:.2f}s'
+        )
+        if echantillon and duree_lot:
+            self.stdout.write(f'  🚀 Gain estimé : x{estimation / duree_lot:.0f}')
+        if ecarts or bilan['creees'] != nombre:
+            raise CommandError(f'{ecarts} fiche(s) différente(s) du calcul unitaire')
+        self.stdout.write(self.style.SUCCESS('✅ Montants identiques au calcul unitaire'))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Commande pour vérifier la cohérence de l'index de disponibilité
+Compare, jour par jour, les chambres occupées selon l'index en mémoire
+et selon une requête directe sur les réservations
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from hotel.availability import IndexDisponibilite, STATUTS_BLOQUANTS, STATUTS_CONFIRMES
+from hotel.models import Reservation
+
+
+class Command(BaseCommand):
+    help = 'Vérifie que l\'index de disponibilité en mémoire correspond aux réservations en base'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depuis',
+            type=str,
+            help='Premier jour vérifié (AAAA-MM-JJ, défaut : aujourd\'hui)',
+        )
+        parser.add_argument(
+            '--jours',
+            type=int,
+            default=180,
+            help='Nombre de jours vérifiés (défaut : 180)',
+        )
+
+    def handle(self, *args, **options):
+        depuis = parse_date(options['depuis']) if options['depuis'] else timezone.now().date()
+        if depuis is None:
+            raise CommandError('Date --depuis invalide (format attendu : AAAA-MM-JJ)')
+        jours = options['jours']
+
+        self.stdout.write('🔍 Construction de l\'index depuis la base...')
+        index = IndexDisponibilite()
+        index.reconstruire()
+
+        self.stdout.write(f'📅 Vérification de {jours} jours à partir du {depuis.strftime("%d/%m/%Y")}')
+        ecarts = 0
+        for i in range(jours):
+            jour = depuis + timedelta(days=i)
+            lendemain = jour + timedelta(days=1)
+
+            lignes = Reservation.objects.filter(
+                statut__in=STATUTS_BLOQUANTS,
+                date_entree__lte=jour,
+                date_sortie__gt=jour
+            ).values_list('chambre_id', 'statut')
+            orm_confirmees = {chambre_id for chambre_id, statut in lignes if statut in STATUTS_CONFIRMES}
+            orm_toutes = {chambre_id for chambre_id, _ in lignes}
+
+            index_confirmees = index.chambres_occupees(jour, lendemain, inclure_attente=False)
+            index_toutes = index.chambres_occupees(jour, lendemain)
+
+            for libelle, orm, idx in (
+                ('confirmées', orm_confirmees, index_confirmees),
+                ('toutes', orm_toutes, index_toutes),
+            ):
+                if orm != idx:
+                    ecarts += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'  ❌ {jour.strftime("%d/%m/%Y")} ({libelle}) : '
+                        f'absentes de l\'index {sorted(orm - idx)}, en trop dans l\'index {sorted(idx - orm)}'
+                    ))
+
+        if ecarts:
+            raise CommandError(f'{ecarts} écart(s) détecté(s) entre l\'index et la base')
+        self.stdout.write(self.style.SUCCESS('✅ L\'index de disponibilité est cohérent avec la base'))
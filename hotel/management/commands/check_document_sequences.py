@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Commande de contrôle de la numérotation des documents
+Vérifie que les séquences ne sont pas en retard sur les documents déjà
+enregistrés (documents importés ou numérotés hors séquence), ce qui ferait
+attribuer un numéro déjà utilisé. Lecture seule.
+L'absence de doublon sous concurrence est couverte par les tests (hotel/tests.py).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.models import DocumentSequence
+from hotel.sequences import verifier_sequences
+
+
+class Command(BaseCommand):
+    help = 'Vérifie que les séquences de numérotation sont cohérentes avec les documents existants'
+
+    def handle(self, *args, **options):
+        retards = verifier_sequences()
+        for prefixe, dernier, existant in retards:
+            self.stdout.write(self.style.WARNING(
+                f'  {prefixe} : séquence à {dernier}, numéro {existant} déjà utilisé'
+            ))
+        if retards:
+            raise CommandError(f'{len(retards)} séquence(s) en retard sur les documents existants')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {DocumentSequence.objects.count()} séquence(s) cohérente(s) avec les documents'
+        ))
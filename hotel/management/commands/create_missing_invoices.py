@@ -2,10 +2,23 @@
 """
 Management command pour créer les factures manquantes
 des réservations existantes
+
+Les factures sont créées par lots (bulk_create, une transaction et un bloc de
+numéros par lot). Après chaque lot, un point de reprise est enregistré : une
+exécution interrompue reprend après le dernier lot validé.
 """
 
-from django.core.management.base import BaseCommand
-from django.db.models import Count
+import json
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from hotel.facturation import TAILLE_LOT, facturer_en_masse, preparer_factures, reservations_a_facturer
 from hotel.models import Reservation, Facture
 
 
@@ -18,61 +31,138 @@ class Command(BaseCommand):
             action='store_true',
             help='Affiche seulement ce qui sera fait sans créer de factures',
         )
+        parser.add_argument(
+            '--depuis',
+            type=str,
+            help='Seulement les réservations créées à partir de cette date (AAAA-MM-JJ)',
+        )
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=TAILLE_LOT,
+            help=f'Factures créées par transaction (défaut : {TAILLE_LOT})',
+        )
+        parser.add_argument(
+            '--reprise',
+            type=str,
+            default=str(settings.BASE_DIR / 'cache' / 'create_missing_invoices.json'),
+            help='Fichier du point de reprise (défaut : cache/create_missing_invoices.json)',
+        )
+        parser.add_argument(
+            '--recommencer',
+            action='store_true',
+            help='Ignorer le point de reprise et repartir du début',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
-        
+        depuis = None
+        if options['depuis']:
+            depuis = parse_date(options['depuis'])
+            if depuis is None:
+                raise CommandError('Date --depuis invalide (format attendu : AAAA-MM-JJ)')
+        if options['taille_lot'] < 1:
+            raise CommandError('--taille-lot doit être positif')
+
         self.stdout.write('🔍 Recherche des réservations confirmées sans facture...')
-        
+
         # Récupérer les réservations confirmées sans facture
-        reservations_sans_facture = Reservation.objects.filter(
-            statut='confirmee'
-        ).exclude(
-            id__in=Facture.objects.values_list('reservation_id', flat=True)
-        )
-        
+        reservations_sans_facture = reservations_a_facturer(depuis=depuis)
+
         count = reservations_sans_facture.count()
-        
+
         if count == 0:
             self.stdout.write(self.style.SUCCESS('✅ Toutes les réservations confirmées ont déjà une facture !'))
+            self._supprimer_reprise(options['reprise'])
             return
-        
+
         self.stdout.write(f'📊 {count} réservations confirmées trouvées sans facture')
-        
+
         if dry_run:
-            self.stdout.write('\n📋 Réservations qui auront une facture (DRY RUN):')
-            for res in reservations_sans_facture:
-                self.stdout.write(f'  • Réservation #{res.id} - {res.client.nom_complet} - {res.prix_total}€')
+            self._simuler(reservations_sans_facture)
             return
-        
+
+        # Point de reprise d'une exécution interrompue (mêmes critères uniquement)
+        criteres = {'depuis': depuis.isoformat() if depuis else None}
+        apres_id = 0
+        reprise = None if options['recommencer'] else self._lire_reprise(options['reprise'])
+        if reprise and reprise.get('criteres') == criteres:
+            apres_id = reprise['dernier_id']
+            self.stdout.write(f'⏩ Reprise après la réservation #{apres_id} ({reprise["creees"]} factures déjà créées)')
+
+        def progression(bilan):
+            self._ecrire_reprise(options['reprise'], {
+                'criteres': criteres,
+                'dernier_id': bilan['dernier_id'],
+                'creees': bilan['creees'] + (reprise['creees'] if apres_id else 0),
+                'date': timezone.now().isoformat(),
+            })
+            self.stdout.write(
+                f'  ⏳ {bilan["creees"]}/{bilan["total"]} factures '
+                f'({bilan["creees"] / bilan["total"] * 100:.1f}%) - '
+                f'jusqu\'à la réservation #{bilan["dernier_id"]}'
+            )
+
         # Créer les factures
-        factures_creees = 0
-        from decimal import Decimal
-        for reservation in reservations_sans_facture:
-            try:
-                montant_ht = (reservation.prix_total / Decimal('1.20')) if reservation.prix_total is not None else Decimal('0')
-                facture = Facture.objects.create(
-                    reservation=reservation,
-                    client=reservation.client,
-                    montant_ht=montant_ht,  # TVA 20%
-                    cree_par=reservation.cree_par
-                )
-                factures_creees += 1
-                self.stdout.write(
-                    self.style.SUCCESS(f'✅ Facture {facture.numero_facture} créée pour réservation #{reservation.id}')
-                )
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'❌ Erreur pour réservation #{reservation.id}: {e}')
-                )
-        
-        self.stdout.write(f'\n🎉 {factures_creees} factures créées avec succès !')
-        
+        try:
+            bilan = facturer_en_masse(
+                reservations_sans_facture,
+                taille_lot=options['taille_lot'],
+                apres_id=apres_id,
+                progression=progression,
+            )
+        except Exception as e:
+            raise CommandError(
+                f'Lot interrompu ({e}). Les lots précédents sont validés : '
+                f'relancer la commande pour reprendre.'
+            )
+        self._supprimer_reprise(options['reprise'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n🎉 {bilan["creees"]} factures créées avec succès ({bilan["montant_ttc"]} € TTC) !'
+        ))
+
         # Résumé final
         total_factures = Facture.objects.count()
         total_reservations = Reservation.objects.filter(statut='confirmee').count()
-        
+
         self.stdout.write('\n📈 Résumé:')
         self.stdout.write(f'  • Total des factures : {total_factures}')
         self.stdout.write(f'  • Total des réservations confirmées : {total_reservations}')
-        self.stdout.write(f'  • Taux de facturation : {(total_factures/total_reservations*100):.1f}%')
+        if total_reservations:
+            self.stdout.write(f'  • Taux de facturation : {(total_factures/total_reservations*100):.1f}%')
+
+    def _simuler(self, reservations):
+        """Aperçu des factures (numéros non réservés, rien n'est enregistré)"""
+        self.stdout.write('\n📋 Réservations qui auront une facture (DRY RUN):')
+        lignes = reservations.values_list(
+            'pk', 'client_id', 'cree_par_id', 'prix_total', 'client__prenom', 'client__nom'
+        )
+        montants = {'montant_ht': Decimal('0.00'), 'montant_tva': Decimal('0.00'), 'montant_ttc': Decimal('0.00')}
+        for ligne in lignes.iterator(chunk_size=TAILLE_LOT):
+            facture = preparer_factures([ligne[:4]], [''])[0]
+            for champ in montants:
+                montants[champ] += getattr(facture, champ)
+            self.stdout.write(f'  • Réservation #{ligne[0]} - {ligne[4]} {ligne[5]} - {facture.montant_ttc}€')
+        prix = reservations.aggregate(total=Sum('prix_total'))['total'] or Decimal('0.00')
+        self.stdout.write(
+            f'\n💶 Total : {montants["montant_ht"]} € HT + {montants["montant_tva"]} € TVA '
+            f'= {montants["montant_ttc"]} € TTC (prix des séjours : {prix} €)'
+        )
+
+    def _lire_reprise(self, chemin):
+        try:
+            with open(chemin, encoding='utf-8') as fichier:
+                return json.load(fichier)
+        except (OSError, ValueError):
+            return None
+
+    def _ecrire_reprise(self, chemin, contenu):
+        Path(chemin).parent.mkdir(parents=True, exist_ok=True)
+        temporaire = f'{chemin}.tmp'
+        with open(temporaire, 'w', encoding='utf-8') as fichier:
+            json.dump(contenu, fichier)
+        Path(temporaire).replace(chemin)
+
+    def _supprimer_reprise(self, chemin):
+        Path(chemin).unlink(missing_ok=True)
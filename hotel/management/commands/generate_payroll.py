@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Commande de génération des fiches de paie
+Crée en une passe les fiches manquantes des employés actifs pour le mois
+courant, un mois donné ou une série de mois (rattrapage). En simulation,
+affiche les fiches qui seraient créées et les fiches existantes dont les
+montants diffèrent du calcul actuel (salaire modifié depuis, par exemple).
+Les employés embauchés après la fin d'un mois sont ignorés pour ce mois et
+signalés.
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hotel.paie import TAILLE_LOT, generer_fiches_paie, mois_entre, premier_du_mois
+
+
+def _mois(valeur, option):
+    try:
+        return datetime.strptime(valeur, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Mois {option} invalide (format attendu : AAAA-MM)')
+
+
+class Command(BaseCommand):
+    help = 'Génère les fiches de paie manquantes des employés actifs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mois',
+            type=str,
+            help='Mois de paie (AAAA-MM, défaut : mois courant)',
+        )
+        parser.add_argument(
+            '--depuis',
+            type=str,
+            help='Rattrapage : premier mois à générer (AAAA-MM), jusqu\'à --mois inclus',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche les fiches à créer et les écarts sans rien enregistrer',
+        )
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=TAILLE_LOT,
+            help=f'Fiches insérées par requête (défaut : {TAILLE_LOT})',
+        )
+
+    def handle(self, *args, **options):
+        dernier = _mois(options['mois'], '--mois') if options['mois'] else premier_du_mois(timezone.now().date())
+        premier = _mois(options['depuis'], '--depuis') if options['depuis'] else dernier
+        if premier > dernier:
+            raise CommandError('--depuis doit précéder --mois')
+        if options['taille_lot'] < 1:
+            raise CommandError('--taille-lot doit être positif')
+        simulation = options['dry_run']
+
+        mois = mois_entre(premier, dernier)
+        self.stdout.write(
+            f'💼 {"Simulation de la paie" if simulation else "Génération de la paie"} : '
+            f'{len(mois)} mois ({premier.strftime("%m/%Y")} → {dernier.strftime("%m/%Y")})'
+        )
+        bilans = generer_fiches_paie(mois, simulation=simulation, taille_lot=options['taille_lot'])
+
+        total = 0
+        ignorees = 0
+        for mois_paie, bilan in bilans.items():
+            total += bilan['creees']
+            ignorees += len(bilan['non_embauches'])
+            self.stdout.write(
+                f'\n📅 {mois_paie.strftime("%m/%Y")} : {bilan["creees"]} fiche(s) '
+                f'{"à créer" if simulation else "créée(s)"}, {bilan["existantes"]} déjà existante(s) - '
+                f'masse brute {bilan["masse_brute"]} €, nette {bilan["masse_nette"]} €'
+            )
+            if bilan['non_embauches']:
+                self.stdout.write(self.style.WARNING(
+                    f'  ⏭ {len(bilan["non_embauches"])} employé(s) pas encore embauché(s), ignoré(s) : '
+                    f'{", ".join(bilan["non_embauches"])}'
+                ))
+            if simulation:
+                for username, elements in bilan['fiches']:
+                    self.stdout.write(
+                        f'  + {username} : brut {elements.salaire_brut} €, '
+                        f'ancienneté {elements.prime_anciennete} €, net {elements.salaire_net} €'
+                    )
+                for username, enregistres, calcules in bilan['ecarts']:
+                    differences = ', '.join(
+                        f'{champ} {avant} → {apres}'
+                        for champ, avant, apres in zip(enregistres._fields, enregistres, calcules)
+                        if avant != apres
+                    )
+                    self.stdout.write(self.style.WARNING(f'  ~ {username} : {differences}'))
+
+        if ignorees:
+            self.stdout.write(self.style.WARNING(
+                f'\n⏭ {ignorees} couple(s) employé/mois ignoré(s) : mois antérieur à l\'embauche'
+            ))
+        if simulation:
+            self.stdout.write(f'\n📋 DRY RUN : {total} fiche(s) seraient créées, rien n\'a été enregistré')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\n✅ {total} fiche(s) de paie créée(s)'))
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Commande pour réaffecter les séjours futurs afin de réduire
+les trous de 1 ou 2 nuits invendables dans le planning
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from hotel.allocation import HORIZON_DEFAUT, TROU_MIN_VENDABLE, optimiser_affectations
+from hotel.models import Chambre
+
+
+class Command(BaseCommand):
+    help = 'Réaffecte les réservations futures entre chambres équivalentes pour réduire la fragmentation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            choices=[code for code, _ in Chambre.TYPE_CHOICES],
+            help='Limiter à un type de chambre',
+        )
+        parser.add_argument(
+            '--depuis',
+            type=str,
+            help='Premier jour considéré (AAAA-MM-JJ, défaut : aujourd\'hui)',
+        )
+        parser.add_argument(
+            '--jours',
+            type=int,
+            default=HORIZON_DEFAUT,
+            help=f'Horizon en jours (défaut : {HORIZON_DEFAUT})',
+        )
+        parser.add_argument(
+            '--appliquer',
+            action='store_true',
+            help='Appliquer les déplacements (par défaut : simulation)',
+        )
+
+    def handle(self, *args, **options):
+        depuis = parse_date(options['depuis']) if options['depuis'] else timezone.now().date()
+        if depuis is None:
+            raise CommandError('Date --depuis invalide (format attendu : AAAA-MM-JJ)')
+        appliquer = options['appliquer']
+
+        if not appliquer:
+            self.stdout.write(self.style.WARNING('🔍 Mode simulation : aucune réservation ne sera modifiée'))
+
+        debut = time.perf_counter()
+        plans = optimiser_affectations(
+            type_chambre=options['type'],
+            date_debut=depuis,
+            jours=options['jours'],
+            appliquer=appliquer,
+        )
+        duree = time.perf_counter() - debut
+
+        total = 0
+        for plan in plans:
+            avant, apres = plan['avant'], plan['apres']
+            self.stdout.write(
+                f'\n🛏️  {plan["type_chambre"]} à {plan["prix_par_nuit"]}€ ({plan["chambres"]} chambres) : '
+                f'{len(plan["deplacements"])} déplacement(s)'
+            )
+            self.stdout.write(
+                f'   Trous < {TROU_MIN_VENDABLE} nuits : {avant["trous_invendables"]} → {apres["trous_invendables"]} '
+                f'({avant["nuits_perdues"]} → {apres["nuits_perdues"]} nuits) | '
+                f'plus longue fenêtre libre : {avant["plus_longue_fenetre"]} → {apres["plus_longue_fenetre"]} nuits'
+            )
+            for deplacement in plan['deplacements']:
+                self.stdout.write(
+                    f'   • Réservation #{deplacement["reservation_id"]} '
+                    f'({deplacement["date_entree"].strftime("%d/%m/%Y")} → {deplacement["date_sortie"].strftime("%d/%m/%Y")}) : '
+                    f'chambre {deplacement["de"]} → {deplacement["vers"]}'
+                )
+            total += len(plan['deplacements'])
+
+        self.stdout.write(f'\n⏱️  Calcul en {duree * 1000:.0f} ms')
+        if appliquer:
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} réservation(s) réaffectée(s)'))
+        else:
+            self.stdout.write(f'📋 {total} déplacement(s) proposé(s) (relancer avec --appliquer pour les effectuer)')
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Commande pour supprimer les clés d'idempotence expirées
+À planifier régulièrement (cron), par exemple toutes les heures
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from hotel.idempotence import purger_cles_expirees
+from hotel.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Supprime les clés d\'idempotence des API dont la durée de conservation est dépassée'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche seulement le nombre de clés expirées',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            expirees = IdempotencyKey.objects.filter(date_expiration__lte=timezone.now()).count()
+            self.stdout.write(f'🔍 Mode DRY-RUN : {expirees} clé(s) expirée(s) seraient supprimées')
+            return
+
+        supprimees = purger_cles_expirees()
+        self.stdout.write(self.style.SUCCESS(f'✅ {supprimees} clé(s) d\'idempotence expirée(s) supprimée(s)'))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Commande de réconciliation des compteurs des dashboards (CounterSnapshot)
+Recalcule chaque dimension depuis sa table source, signale les écarts laissés
+par les écritures en masse (queryset.update, bulk_create) et corrige les lignes.
+À planifier régulièrement (ex. toutes les heures).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.compteurs import DIMENSIONS, reconcilier
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les compteurs des dashboards et corrige les écarts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dimension',
+            action='append',
+            dest='dimensions',
+            help='Dimension à recalculer (répétable, défaut : toutes)',
+        )
+        parser.add_argument(
+            '--verifier',
+            action='store_true',
+            help='Signale les écarts sans corriger et échoue s\'il y en a',
+        )
+
+    def handle(self, *args, **options):
+        dimensions = options['dimensions'] or list(DIMENSIONS)
+        inconnues = [nom for nom in dimensions if nom not in DIMENSIONS]
+        if inconnues:
+            raise CommandError(
+                f'Dimension(s) inconnue(s) : {", ".join(inconnues)} (disponibles : {", ".join(DIMENSIONS)})'
+            )
+
+        self.stdout.write(f'🔢 Réconciliation de {len(dimensions)} dimension(s)...')
+        ecarts = reconcilier(dimensions, corriger=not options['verifier'])
+        for dimension, valeur, enregistre, reel in ecarts:
+            self.stdout.write(self.style.WARNING(
+                f'  ⚠️ {dimension}[{valeur}] : {enregistre} enregistré(s), {reel} en base'
+            ))
+
+        if ecarts and options['verifier']:
+            raise CommandError(f'{len(ecarts)} compteur(s) incohérent(s)')
+        if ecarts:
+            self.stdout.write(self.style.SUCCESS(f'✅ {len(ecarts)} compteur(s) corrigé(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Les compteurs sont cohérents avec la base'))
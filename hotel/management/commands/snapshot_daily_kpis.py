@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Commande de calcul des instantanés quotidiens des KPIs (DailyKPISnapshot)
+À lancer chaque nuit pour la veille ; accepte aussi n'importe quelle période
+pour un rattrapage. Relancer la commande sur une période remplace ses lignes.
+"""
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hotel.snapshots import enregistrer_snapshots
+
+
+# Nombre de jours calculés et écrits par transaction lors d'un rattrapage
+JOURS_PAR_LOT = 31
+
+
+class Command(BaseCommand):
+    help = 'Calcule les instantanés quotidiens des KPIs (par défaut : la veille)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depuis',
+            help='Premier jour à calculer (AAAA-MM-JJ)',
+        )
+        parser.add_argument(
+            '--jusqu-au',
+            dest='jusqu_au',
+            help='Dernier jour à calculer, inclus (AAAA-MM-JJ, défaut : hier)',
+        )
+        parser.add_argument(
+            '--jours',
+            type=int,
+            default=1,
+            help='Nombre de jours à calculer jusqu\'au dernier jour si --depuis est absent (défaut : 1)',
+        )
+
+    def _lire_date(self, valeur, option):
+        try:
+            return datetime.strptime(valeur, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{option} : date invalide "{valeur}" (format AAAA-MM-JJ)')
+
+    def handle(self, *args, **options):
+        hier = timezone.localdate() - timedelta(days=1)
+        fin = self._lire_date(options['jusqu_au'], '--jusqu-au') if options['jusqu_au'] else hier
+        if options['depuis']:
+            debut = self._lire_date(options['depuis'], '--depuis')
+        else:
+            if options['jours'] < 1:
+                raise CommandError('--jours doit être positif')
+            debut = fin - timedelta(days=options['jours'] - 1)
+        if debut > fin:
+            raise CommandError('La date de début doit précéder la date de fin')
+
+        self.stdout.write(f'📊 Calcul des KPIs du {debut} au {fin}...')
+        total = 0
+        curseur = debut
+        while curseur <= fin:
+            fin_lot = min(curseur + timedelta(days=JOURS_PAR_LOT), fin + timedelta(days=1))
+            total += enregistrer_snapshots(curseur, fin_lot)
+            curseur = fin_lot
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} journée(s) enregistrée(s)'))
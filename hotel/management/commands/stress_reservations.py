@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Commande de test de charge du service d'attribution des réservations
+Lance des centaines de demandes concurrentes qui se chevauchent sur quelques
+chambres, puis vérifie qu'aucune chambre n'a été réservée deux fois
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from hotel.booking import reserver_chambre, ChambreIndisponible
+from hotel.models import Chambre, Client, Reservation
+
+
+# Les séjours de test sont placés loin dans le futur pour ne pas gêner le planning réel
+DECALAGE_JOURS = 3 * 365
+EMAIL_CLIENT_TEST = 'stress.reservations@hotel.local'
+
+
+class Command(BaseCommand):
+    help = 'Teste la résistance aux doubles réservations avec des demandes concurrentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--demandes',
+            type=int,
+            default=300,
+            help='Nombre total de demandes de réservation (défaut : 300)',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=16,
+            help='Nombre de threads concurrents (défaut : 16)',
+        )
+        parser.add_argument(
+            '--chambres',
+            type=int,
+            default=5,
+            help='Nombre de chambres ciblées (défaut : 5)',
+        )
+        parser.add_argument(
+            '--jours',
+            type=int,
+            default=30,
+            help='Période couverte par les demandes, en jours (défaut : 30)',
+        )
+        parser.add_argument(
+            '--garder',
+            action='store_true',
+            help='Conserver les réservations de test au lieu de les supprimer',
+        )
+
+    def handle(self, *args, **options):
+        demandes = options['demandes']
+        jours = options['jours']
+        if demandes < 1 or options['threads'] < 1 or jours < 2:
+            raise CommandError('Paramètres invalides')
+
+        chambres = list(
+            Chambre.objects.exclude(statut='maintenance')
+            .order_by('numero')
+            .values_list('id', flat=True)[:options['chambres']]
+        )
+        if not chambres:
+            raise CommandError('Aucune chambre disponible pour le test')
+
+        client, _ = Client.objects.get_or_create(
+            email=EMAIL_CLIENT_TEST,
+            defaults={
+                'nom': 'Stress',
+                'prenom': 'Test',
+                'telephone': '0000000000',
+                'numero_piece_identite': 'STRESS-TEST',
+                'adresse': 'Test de charge',
+                'ville': 'Test',
+                'pays': 'Test',
+            }
+        )
+
+        origine = timezone.now().date() + timedelta(days=DECALAGE_JOURS)
+        generateur = random.Random(42)
+        plan = []
+        for _ in range(demandes):
+            debut = generateur.randrange(jours - 1)
+            duree = generateur.randint(1, min(7, jours - debut))
+            plan.append((
+                generateur.choice(chambres),
+                origine + timedelta(days=debut),
+                origine + timedelta(days=debut + duree),
+            ))
+
+        resultats = {'succes': 0, 'conflits': 0, 'erreurs': 0}
+        attentes = []
+        erreurs = []
+        verrou = threading.Lock()
+
+        def demander(chambre_id, date_entree, date_sortie):
+            mesures = {}
+            try:
+                reserver_chambre(client, chambre_id, date_entree, date_sortie,
+                                 nombre_personnes=1, remarques='Test de charge', mesures=mesures)
+                cle = 'succes'
+            except ChambreIndisponible:
+                cle = 'conflits'
+            except Exception as e:
+                cle = 'erreurs'
+                with verrou:
+                    erreurs.append(str(e))
+            finally:
+                connection.close()
+            with verrou:
+                resultats[cle] += 1
+                if 'attente_verrou' in mesures:
+                    attentes.append(mesures['attente_verrou'])
+
+        self.stdout.write(
+            f'🚀 {demandes} demandes sur {len(chambres)} chambre(s) avec {options["threads"]} threads...'
+        )
+        debut_test = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executeur:
+            for demande in plan:
+                executeur.submit(demander, *demande)
+        duree_test = time.perf_counter() - debut_test
+
+        # Vérification : aucune nuit ne doit être réservée deux fois
+        reservations = Reservation.objects.filter(
+            client=client,
+            date_entree__gte=origine
+        ).order_by('chambre_id', 'date_entree').values_list('chambre_id', 'date_entree', 'date_sortie')
+        doubles = 0
+        precedente = None
+        for chambre_id, date_entree, date_sortie in reservations:
+            if precedente and precedente[0] == chambre_id and date_entree < precedente[1]:
+                doubles += 1
+            if not precedente or precedente[0] != chambre_id or date_sortie > precedente[1]:
+                precedente = (chambre_id, date_sortie)
+
+        attentes.sort()
+        self.stdout.write(f'\n📊 Résultats en {duree_test:.2f}s')
+        self.stdout.write(f'  ✅ Réservations créées : {resultats["succes"]}')
+        self.stdout.write(f'  🔒 Conflits refusés : {resultats["conflits"]}')
+        self.stdout.write(f'  ⚠️  Erreurs : {resultats["erreurs"]}')
+        self.stdout.write(f'  ⚡ Débit : {demandes / duree_test:.1f} demandes/s')
+        if attentes:
+            p95 = attentes[min(len(attentes) - 1, int(len(attentes) * 0.95))]
+            self.stdout.write(
+                f'  ⏱️  Attente du verrou : moyenne {sum(attentes) / len(attentes) * 1000:.1f} ms, '
+                f'p95 {p95 * 1000:.1f} ms, max {attentes[-1] * 1000:.1f} ms'
+            )
+        for message in sorted(set(erreurs))[:5]:
+            self.stdout.write(self.style.WARNING(f'     {message}'))
+
+        if not options['garder']:
+            Reservation.objects.filter(client=client).delete()
+            client.delete()
+            self.stdout.write('🧹 Réservations de test supprimées')
+
+        if doubles:
+            raise CommandError(f'{doubles} double(s) réservation(s) détectée(s) !')
+        self.stdout.write(self.style.SUCCESS('✅ Aucune double réservation'))
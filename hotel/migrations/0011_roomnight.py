@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0010_add_default_inventory_categories'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Nuit du')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('confirmee', 'Confirmée'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('annulee', 'Annulée')], max_length=20, verbose_name='Statut de la réservation')),
+                ('prix_nuit', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Prix de la nuit (€)')),
+                ('chambre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nuits', to='hotel.chambre', verbose_name='Chambre')),
+                ('reservation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nuits', to='hotel.reservation', verbose_name='Réservation')),
+            ],
+            options={
+                'verbose_name': 'Nuitée',
+                'verbose_name_plural': 'Nuitées',
+                'ordering': ['date', 'chambre'],
+                'indexes': [models.Index(fields=['date', 'statut'], name='hotel_roomn_date_7c615a_idx'), models.Index(fields=['chambre', 'date'], name='hotel_roomn_chambre_77c85e_idx')],
+                'unique_together': {('reservation', 'date')},
+            },
+        ),
+    ]
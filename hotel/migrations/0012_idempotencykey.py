@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0011_roomnight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('portee', models.CharField(max_length=100, verbose_name='Portée')),
+                ('cle', models.CharField(max_length=255, verbose_name='Clé')),
+                ('empreinte', models.CharField(max_length=64, verbose_name='Empreinte de la requête')),
+                ('statut_http', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Statut HTTP')),
+                ('type_contenu', models.CharField(blank=True, max_length=100, verbose_name='Type de contenu')),
+                ('contenu', models.TextField(blank=True, verbose_name='Contenu de la réponse')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('date_expiration', models.DateTimeField(verbose_name="Date d'expiration")),
+            ],
+            options={
+                'verbose_name': "Clé d'idempotence",
+                'verbose_name_plural': "Clés d'idempotence",
+                'indexes': [models.Index(fields=['date_expiration'], name='hotel_idemp_date_ex_2d34c3_idx')],
+                'unique_together': {('portee', 'cle')},
+            },
+        ),
+    ]
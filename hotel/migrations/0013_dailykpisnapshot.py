@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0012_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyKPISnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Jour')),
+                ('nuits_vendues', models.PositiveIntegerField(default=0, verbose_name='Nuits vendues')),
+                ('chambres_disponibles', models.PositiveIntegerField(default=0, verbose_name='Chambres disponibles')),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='CA hébergement (€)')),
+                ('adr', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Prix moyen par nuit (ADR)')),
+                ('revpar', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='RevPAR')),
+                ('encaissements', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Encaissements (€)')),
+                ('charges', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Charges comptables (€)')),
+                ('salaires', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Salaires payés (€)')),
+                ('nouveaux_clients', models.PositiveIntegerField(default=0, verbose_name='Nouveaux clients')),
+                ('date_calcul', models.DateTimeField(auto_now=True, verbose_name='Date de calcul')),
+            ],
+            options={
+                'verbose_name': 'Instantané KPI quotidien',
+                'verbose_name_plural': 'Instantanés KPI quotidiens',
+                'ordering': ['date'],
+            },
+        ),
+    ]
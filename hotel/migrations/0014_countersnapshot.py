@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-16 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0013_dailykpisnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=50, verbose_name='Dimension')),
+                ('valeur', models.CharField(max_length=50, verbose_name='Valeur')),
+                ('compteur', models.BigIntegerField(default=0, verbose_name='Compteur')),
+                ('date_maj', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Compteur',
+                'verbose_name_plural': 'Compteurs',
+                'ordering': ['dimension', 'valeur'],
+                'unique_together': {('dimension', 'valeur')},
+            },
+        ),
+    ]
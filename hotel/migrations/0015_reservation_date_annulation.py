@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-16 14:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def dater_annulations_existantes(apps, schema_editor):
+    # Réservations déjà annulées : meilleure estimation, leur dernière modification
+    Reservation = apps.get_model('hotel', 'Reservation')
+    Reservation.objects.filter(statut='annulee', date_annulation__isnull=True).update(
+        date_annulation=F('derniere_modification')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0014_countersnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='date_annulation',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Date d'annulation"),
+        ),
+        migrations.RunPython(dater_annulations_existantes, reverse_code=migrations.RunPython.noop),
+    ]
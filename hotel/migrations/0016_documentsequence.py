@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-16 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0015_reservation_date_annulation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefixe', models.CharField(max_length=30, unique=True, verbose_name='Préfixe')),
+                ('dernier_numero', models.BigIntegerField(default=0, verbose_name='Dernier numéro attribué')),
+                ('date_maj', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Séquence de numérotation',
+                'verbose_name_plural': 'Séquences de numérotation',
+                'ordering': ['prefixe'],
+            },
+        ),
+    ]
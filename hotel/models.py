@@ -4,10 +4,11 @@ Models pour la gestion d'hôtel
 Ce fichier contient tous les modèles de données de l'application
 """
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_DOWN
 
 
 # ============================================
@@ -339,6 +340,7 @@ class Reservation(models.Model):
     # Métadonnées
     date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     derniere_modification = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
+    date_annulation = models.DateTimeField(null=True, blank=True, verbose_name="Date d'annulation")
     cree_par = models.ForeignKey(
         User, 
         on_delete=models.SET_NULL, 
@@ -360,6 +362,7 @@ class Reservation(models.Model):
         Surcharge de la méthode save pour calculer automatiquement:
         - Le nombre de nuits
         - Le prix total
+        - La date d'annulation
         """
         # Calculer le nombre de nuits
         if self.date_entree and self.date_sortie:
@@ -369,7 +372,17 @@ class Reservation(models.Model):
             # Calculer le prix total
             self.prix_total = self.nombre_nuits * self.chambre.prix_par_nuit
         
-        super().save(*args, **kwargs)
+        # Date d'annulation (rapport de pace) : posée au passage à 'annulee', retirée si réactivée
+        if self.statut == 'annulee':
+            from django.utils import timezone
+            self.date_annulation = self.date_annulation or timezone.now()
+        else:
+            self.date_annulation = None
+        
+        # Les nuits matérialisées (RoomNight) sont mises à jour dans la même transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            RoomNight.synchroniser_reservation(self)
     
     def clean(self):
         """
@@ -411,6 +424,88 @@ class Reservation(models.Model):
             return 0
 
 
+# ============================================
+# MODÈLE NUITÉE (NUITS MATÉRIALISÉES DES RÉSERVATIONS)
+# ============================================
+class RoomNight(models.Model):
+    """
+    Une ligne par chambre, par nuit et par réservation
+    Table dérivée de Reservation, maintenue par Reservation.save() (la suppression
+    d'une réservation supprime ses nuits en cascade). Les réservations annulées
+    n'ont aucune nuit. Permet de répondre à "quelles chambres sont prises le jour X"
+    ou "combien de nuits vendues par jour" par des recherches d'égalité indexées.
+    """
+    chambre = models.ForeignKey(
+        Chambre,
+        on_delete=models.CASCADE,
+        related_name='nuits',
+        verbose_name="Chambre"
+    )
+    date = models.DateField(verbose_name="Nuit du")
+    reservation = models.ForeignKey(
+        Reservation,
+        on_delete=models.CASCADE,
+        related_name='nuits',
+        verbose_name="Réservation"
+    )
+    statut = models.CharField(
+        max_length=20,
+        choices=Reservation.STATUT_CHOICES,
+        verbose_name="Statut de la réservation"
+    )
+    prix_nuit = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name="Prix de la nuit (€)"
+    )
+
+    class Meta:
+        verbose_name = "Nuitée"
+        verbose_name_plural = "Nuitées"
+        ordering = ['date', 'chambre']
+        unique_together = ['reservation', 'date']
+        indexes = [
+            models.Index(fields=['date', 'statut']),
+            models.Index(fields=['chambre', 'date']),
+        ]
+
+    def __str__(self):
+        return f"Chambre {self.chambre_id} - nuit du {self.date} ({self.statut})"
+
+    @classmethod
+    def nuits_de(cls, reservation):
+        """
+        Construit (sans les enregistrer) les nuits d'une réservation
+        Le prix total est réparti au centime près : la dernière nuit reçoit l'arrondi.
+        """
+        if reservation.statut == 'annulee' or not reservation.date_entree or not reservation.date_sortie:
+            return []
+        nombre = (reservation.date_sortie - reservation.date_entree).days
+        if nombre <= 0:
+            return []
+
+        total = Decimal(reservation.prix_total or 0)
+        prix_nuit = (total / nombre).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+        reste = total - prix_nuit * nombre
+
+        return [
+            cls(
+                chambre_id=reservation.chambre_id,
+                date=reservation.date_entree + timedelta(days=i),
+                reservation_id=reservation.pk,
+                statut=reservation.statut,
+                prix_nuit=prix_nuit + reste if i == nombre - 1 else prix_nuit,
+            )
+            for i in range(nombre)
+        ]
+
+    @classmethod
+    def synchroniser_reservation(cls, reservation):
+        """Remplace les nuits enregistrées d'une réservation par son état actuel"""
+        cls.objects.filter(reservation_id=reservation.pk).delete()
+        cls.objects.bulk_create(cls.nuits_de(reservation))
+
+
 # ============================================
 # MODÈLE PROFIL UTILISATEUR (POUR LES RÔLES)
 # ============================================
@@ -850,22 +945,10 @@ class Facture(models.Model):
     def save(self, *args, **kwargs):
         # Générer un numéro de facture unique si non défini
         if not self.numero_facture:
-            from django.utils import timezone
-            date_str = timezone.now().strftime('%Y%m%d')
-            last_facture = Facture.objects.filter(numero_facture__startswith=f'F{date_str}').order_by('numero_facture').last()
-            if last_facture:
-                last_num = int(last_facture.numero_facture[-4:])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-            self.numero_facture = f'F{date_str}{new_num:04d}'
+            self.numero_facture = Facture.prochains_numeros(1)[0]
         
         # Calculer les montants TVA et TTC (en Decimal pour éviter les erreurs float/Decimal)
-        from decimal import Decimal
-        taux = Decimal(str(self.taux_tva)) if self.taux_tva is not None else Decimal('0')
-        montant_ht_dec = Decimal(self.montant_ht) if self.montant_ht is not None else Decimal('0')
-        self.montant_tva = (montant_ht_dec * (taux / Decimal('100'))).quantize(Decimal('0.01'))
-        self.montant_ttc = (montant_ht_dec + self.montant_tva).quantize(Decimal('0.01'))
+        self.calculer_montants()
         
         # Définir la date d'échéance (30 jours après émission)
         if not self.date_echeance:
@@ -876,6 +959,29 @@ class Facture(models.Model):
         
         super().save(*args, **kwargs)
     
+    @staticmethod
+    def prochains_numeros(nombre):
+        """
+        Réserve les N prochains numéros de facture du jour (F<AAAAMMJJ><NNNN>)
+        Le bloc est alloué atomiquement par la séquence du jour : un lot de
+        factures est numéroté en une seule requête, sans doublon possible.
+        """
+        from .sequences import prochains_numeros
+        return prochains_numeros('facture', nombre)
+    
+    @staticmethod
+    def montant_ht_depuis_ttc(montant_ttc, taux_tva=Decimal('20')):
+        """Calcule le montant HT correspondant à un montant TTC"""
+        taux = Decimal(str(taux_tva))
+        return (Decimal(montant_ttc) / (1 + taux / Decimal('100'))).quantize(Decimal('0.01'))
+    
+    def calculer_montants(self):
+        """Calcule la TVA et le TTC à partir du montant HT et du taux"""
+        taux = Decimal(str(self.taux_tva)) if self.taux_tva is not None else Decimal('0')
+        montant_ht_dec = Decimal(self.montant_ht) if self.montant_ht is not None else Decimal('0')
+        self.montant_tva = (montant_ht_dec * (taux / Decimal('100'))).quantize(Decimal('0.01'))
+        self.montant_ttc = (montant_ht_dec + self.montant_tva).quantize(Decimal('0.01'))
+    
     @property
     def est_en_retard(self):
         """Vérifie si la facture est en retard"""
@@ -968,14 +1074,7 @@ class FichePaie(models.Model):
     def save(self, *args, **kwargs):
         # Générer un numéro de fiche unique si non défini
         if not self.numero_fiche:
-            date_str = self.mois.strftime('%Y%m')
-            last_fiche = FichePaie.objects.filter(numero_fiche__startswith=f'FP{date_str}').order_by('numero_fiche').last()
-            if last_fiche:
-                last_num = int(last_fiche.numero_fiche[-4:])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-            self.numero_fiche = f'FP{date_str}{new_num:04d}'
+            self.numero_fiche = FichePaie.prochains_numeros(1, self.mois)[0]
         
         # Calculer les totaux et le salaire net
         self.total_primes = self.prime_anciennete + self.prime_performance + self.prime_autres
@@ -984,6 +1083,12 @@ class FichePaie(models.Model):
         
         super().save(*args, **kwargs)
     
+    @staticmethod
+    def prochains_numeros(nombre, mois):
+        """Réserve les N prochains numéros de fiche de paie du mois (FP<AAAAMM><NNNN>)"""
+        from .sequences import prochains_numeros
+        return prochains_numeros('fiche_paie', nombre, mois)
+    
     def marquer_comme_payee(self, moyen_paiement, reference_paiement=''):
         """Marquer la fiche de paie comme payée"""
         from django.utils import timezone
@@ -1569,3 +1674,136 @@ class AgentIAInteraction(models.Model):
     
     def __str__(self):
         return f"Interaction {self.id} - {self.utilisateur or 'Anonyme'} - {self.date_interaction.strftime('%d/%m/%Y %H:%M')}"
+
+
+# ============================================
+# MODÈLE CLÉS D'IDEMPOTENCE DES API
+# ============================================
+class IdempotencyKey(models.Model):
+    """
+    Réponse mémorisée d'une requête API envoyée avec un en-tête Idempotency-Key
+    Une requête rejouée avec la même clé reçoit la réponse enregistrée,
+    sans repasser par les vérifications de disponibilité ni les signaux.
+    """
+    # Portée de la clé : utilisateur connecté ou adresse IP
+    portee = models.CharField(max_length=100, verbose_name="Portée")
+    cle = models.CharField(max_length=255, verbose_name="Clé")
+    empreinte = models.CharField(max_length=64, verbose_name="Empreinte de la requête")
+    
+    # Réponse enregistrée (vide tant que la requête est en cours de traitement)
+    statut_http = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Statut HTTP")
+    type_contenu = models.CharField(max_length=100, blank=True, verbose_name="Type de contenu")
+    contenu = models.TextField(blank=True, verbose_name="Contenu de la réponse")
+    
+    # Métadonnées
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    date_expiration = models.DateTimeField(verbose_name="Date d'expiration")
+    
+    class Meta:
+        verbose_name = "Clé d'idempotence"
+        verbose_name_plural = "Clés d'idempotence"
+        unique_together = ['portee', 'cle']
+        indexes = [
+            models.Index(fields=['date_expiration']),
+        ]
+    
+    def __str__(self):
+        return f"{self.portee} - {self.cle}"
+    
+    def est_terminee(self):
+        """Vérifie si la réponse a été enregistrée"""
+        return self.statut_http is not None
+
+
+# ============================================
+# MODÈLE INSTANTANÉS QUOTIDIENS DES KPIs
+# ============================================
+class DailyKPISnapshot(models.Model):
+    """
+    Indicateurs agrégés d'une journée (table de faits des rapports)
+    Remplie par la commande snapshot_daily_kpis ; les rapports sur une période
+    additionnent ces lignes au lieu de relire réservations, factures et charges.
+    """
+    date = models.DateField(unique=True, verbose_name="Jour")
+    
+    # Hébergement (nuits vendues : réservations confirmées, en cours ou terminées)
+    nuits_vendues = models.PositiveIntegerField(default=0, verbose_name="Nuits vendues")
+    chambres_disponibles = models.PositiveIntegerField(default=0, verbose_name="Chambres disponibles")
+    chiffre_affaires = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="CA hébergement (€)")
+    adr = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Prix moyen par nuit (ADR)")
+    revpar = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="RevPAR")
+    
+    # Trésorerie et charges
+    encaissements = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Encaissements (€)")
+    charges = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Charges comptables (€)")
+    salaires = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Salaires payés (€)")
+    
+    # Clientèle
+    nouveaux_clients = models.PositiveIntegerField(default=0, verbose_name="Nouveaux clients")
+    
+    # Métadonnées
+    date_calcul = models.DateTimeField(auto_now=True, verbose_name="Date de calcul")
+    
+    class Meta:
+        verbose_name = "Instantané KPI quotidien"
+        verbose_name_plural = "Instantanés KPI quotidiens"
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"KPIs du {self.date}"
+    
+    @property
+    def taux_occupation(self):
+        """Taux d'occupation du jour en pourcentage"""
+        if not self.chambres_disponibles:
+            return 0
+        return round(self.nuits_vendues / self.chambres_disponibles * 100, 1)
+
+
+# ============================================
+# COMPTEURS DES TABLEAUX DE BORD
+# ============================================
+
+class CounterSnapshot(models.Model):
+    """
+    Compteur dénormalisé d'une dimension (ex. réservations par statut)
+    Tenu à jour par les signaux avec des incréments F() et recalculé
+    périodiquement par la commande reconcile_counters.
+    """
+    dimension = models.CharField(max_length=50, verbose_name="Dimension")
+    valeur = models.CharField(max_length=50, verbose_name="Valeur")
+    compteur = models.BigIntegerField(default=0, verbose_name="Compteur")
+    date_maj = models.DateTimeField(auto_now=True, verbose_name="Dernière mise à jour")
+    
+    class Meta:
+        verbose_name = "Compteur"
+        verbose_name_plural = "Compteurs"
+        unique_together = ['dimension', 'valeur']
+        ordering = ['dimension', 'valeur']
+    
+    def __str__(self):
+        return f"{self.dimension}[{self.valeur}] = {self.compteur}"
+
+
+# ============================================
+# SÉQUENCES DE NUMÉROTATION DES DOCUMENTS
+# ============================================
+
+class DocumentSequence(models.Model):
+    """
+    Dernier numéro attribué pour un préfixe de document (ex. F20261016, FP202610)
+    Incrémenté de façon atomique par hotel.sequences.allouer() : deux
+    enregistrements simultanés ne peuvent pas recevoir le même numéro.
+    La ligne 'disponibilite' porte la version de l'index de disponibilité.
+    """
+    prefixe = models.CharField(max_length=30, unique=True, verbose_name="Préfixe")
+    dernier_numero = models.BigIntegerField(default=0, verbose_name="Dernier numéro attribué")
+    date_maj = models.DateTimeField(auto_now=True, verbose_name="Dernière mise à jour")
+    
+    class Meta:
+        verbose_name = "Séquence de numérotation"
+        verbose_name_plural = "Séquences de numérotation"
+        ordering = ['prefixe']
+    
+    def __str__(self):
+        return f"{self.prefixe} : {self.dernier_numero}"
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur d'occupation par nuitée (taux d'occupation, ADR, RevPAR)
+Chaque séjour est découpé à la fenêtre demandée : seules ses nuits comprises
+dans la période comptent, et son prix est réparti par nuit (même règle que
+RoomNight : arrondi au centime inférieur, la dernière nuit reçoit le reste).
+
+Le calcul se fait en une requête et une passe sur les réservations, avec des
+tableaux de différences : un séjour ajoute +1 à sa première nuit et -1 au
+lendemain de sa dernière nuit, puis une somme cumulée donne les nuits vendues
+de chaque jour. Le coût est donc proportionnel au nombre de réservations plus
+le nombre de jours, et non à leur produit.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from .snapshots import STATUTS_VENDUS
+
+
+CENTIME = Decimal('0.01')
+
+# Nombre maximum de jours d'un calcul demandé par l'API
+JOURS_MAX = 366 * 5
+
+
+def _en_euros(centimes):
+    return (Decimal(centimes) / 100).quantize(CENTIME)
+
+
+def _ratio(centimes, diviseur):
+    """Montant en centimes divisé par un nombre de nuits, en euros"""
+    if not diviseur:
+        return Decimal('0.00')
+    return (Decimal(centimes) / 100 / diviseur).quantize(CENTIME)
+
+
+def _taux(nuits, disponibles):
+    return round(nuits / disponibles * 100, 1) if disponibles else 0
+
+
+def calculer_occupation(date_debut, date_fin, statuts=STATUTS_VENDUS, nombre_chambres=None):
+    """
+    Occupation jour par jour sur [date_debut, date_fin[
+
+    Args:
+        date_debut: Première nuit de la période
+        date_fin: Lendemain de la dernière nuit (borne exclue)
+        statuts: Statuts dont les nuits comptent comme vendues
+        nombre_chambres: Optionnel, inventaire (défaut : nombre de chambres en base)
+
+    Returns:
+        dict: jours, nuits_vendues, chiffre_affaires, taux_occupation, adr, revpar
+              (listes alignées, une valeur par jour), chambres et totaux de la période
+    """
+    from .models import Chambre, Reservation
+
+    nombre_jours = max((date_fin - date_debut).days, 0)
+    if nombre_chambres is None:
+        nombre_chambres = Chambre.objects.count()
+
+    # Tableaux de différences (une case de plus pour le lendemain de la période)
+    nuits = [0] * (nombre_jours + 1)
+    montants = [0] * (nombre_jours + 1)
+    restes = [0] * nombre_jours
+
+    sejours = Reservation.objects.filter(
+        statut__in=statuts,
+        date_entree__lt=date_fin,
+        date_sortie__gt=date_debut
+    ).values_list('date_entree', 'date_sortie', 'prix_total')
+    for date_entree, date_sortie, prix_total in sejours:
+        duree = (date_sortie - date_entree).days
+        if duree <= 0:
+            continue
+        # Prix par nuit en centimes : arrondi inférieur, reste sur la dernière nuit
+        centimes = int((prix_total or 0) * 100)
+        prix_nuit, reste = divmod(centimes, duree)
+
+        premier = max((date_entree - date_debut).days, 0)
+        dernier = min((date_sortie - date_debut).days, nombre_jours)
+        nuits[premier] += 1
+        nuits[dernier] -= 1
+        montants[premier] += prix_nuit
+        montants[dernier] -= prix_nuit
+        if reste and (date_sortie - date_debut).days <= nombre_jours:
+            restes[dernier - 1] += reste
+
+    serie_nuits = []
+    serie_centimes = []
+    cumul_nuits = cumul_centimes = 0
+    for jour in range(nombre_jours):
+        cumul_nuits += nuits[jour]
+        cumul_centimes += montants[jour]
+        serie_nuits.append(cumul_nuits)
+        serie_centimes.append(cumul_centimes + restes[jour])
+
+    nuits_vendues = sum(serie_nuits)
+    centimes_total = sum(serie_centimes)
+    nuits_disponibles = nombre_chambres * nombre_jours
+    return {
+        'jours': [date_debut + timedelta(days=decalage) for decalage in range(nombre_jours)],
+        'nuits_vendues': serie_nuits,
+        'chiffre_affaires': [_en_euros(centimes) for centimes in serie_centimes],
+        'taux_occupation': [_taux(vendues, nombre_chambres) for vendues in serie_nuits],
+        'adr': [_ratio(centimes, vendues) for centimes, vendues in zip(serie_centimes, serie_nuits)],
+        'revpar': [_ratio(centimes, nombre_chambres) for centimes in serie_centimes],
+        'chambres': nombre_chambres,
+        'totaux': {
+            'jours': nombre_jours,
+            'nuits_vendues': nuits_vendues,
+            'nuits_disponibles': nuits_disponibles,
+            'chiffre_affaires': _en_euros(centimes_total),
+            'taux_occupation': _taux(nuits_vendues, nuits_disponibles),
+            'adr': _ratio(centimes_total, nuits_vendues),
+            'revpar': _ratio(centimes_total, nuits_disponibles),
+        },
+    }
+
+
+def occupation_en_json(occupation):
+    """Convertit les dates et montants d'un calcul d'occupation pour JSON / Chart.js"""
+    def nombre(valeur):
+        return float(valeur) if isinstance(valeur, Decimal) else valeur
+
+    return {
+        'jours': [jour.isoformat() for jour in occupation['jours']],
+        **{
+            cle: [nombre(valeur) for valeur in occupation[cle]]
+            for cle in ('nuits_vendues', 'chiffre_affaires', 'taux_occupation', 'adr', 'revpar')
+        },
+        'chambres': occupation['chambres'],
+        'totaux': {cle: nombre(valeur) for cle, valeur in occupation['totaux'].items()},
+    }
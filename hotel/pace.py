@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Rapport de pace / pickup (nuits « on the books » par date de séjour)
+Pour chaque nuit future, combien de nuitées étaient déjà réservées 7, 14 ou
+30 jours plus tôt, et combien ont été prises depuis (pickup).
+
+Le calcul repose sur une matrice date de référence × date de séjour construite
+en une passe sur les réservations : une réservation ajoute ses nuits à la ligne
+de son jour de création et les retire à la ligne de son jour d'annulation
+(tableaux de différences sur les nuits). Deux sommes cumulées, sur les nuits
+puis sur les jours de référence, donnent les nuits en portefeuille à chaque
+date de référence. Le coût est proportionnel au nombre de réservations plus la
+taille de la matrice.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+# Écarts (en jours avant aujourd'hui) comparés par défaut
+ECARTS_DEFAUT = (7, 14, 30)
+
+# Horizon par défaut des dates de séjour (jours à partir d'aujourd'hui)
+HORIZON_DEFAUT = 90
+
+# Garde-fous de l'API : taille de la matrice
+JOURS_MAX = 366
+ECART_MAX = 365
+
+
+def calculer_pace(date_debut, date_fin, ecarts=ECARTS_DEFAUT, aujourd_hui=None):
+    """
+    Nuits en portefeuille par date de séjour sur [date_debut, date_fin[
+
+    Args:
+        date_debut: Première nuit analysée
+        date_fin: Lendemain de la dernière nuit (borne exclue)
+        ecarts: Nombres de jours avant aujourd'hui auxquels comparer
+        aujourd_hui: Optionnel, date de référence la plus récente
+
+    Returns:
+        dict: jours, ecarts (0 compris), on_the_books et pickup ({écart: liste par nuit}),
+              totaux, ainsi que la matrice complète (dates_reference × jours)
+    """
+    from .models import Reservation
+
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    ecarts = sorted({0, *ecarts})
+    nombre_jours = max((date_fin - date_debut).days, 0)
+    origine = aujourd_hui - timedelta(days=ecarts[-1])
+    nombre_lignes = ecarts[-1] + 1
+
+    # Matrice de différences : lignes = jours de référence, colonnes = nuits (+1)
+    matrice = [[0] * (nombre_jours + 1) for _ in range(nombre_lignes)]
+
+    def ajouter(ligne, premier, dernier, signe):
+        matrice[ligne][premier] += signe
+        matrice[ligne][dernier] -= signe
+
+    sejours = Reservation.objects.filter(
+        date_entree__lt=date_fin,
+        date_sortie__gt=date_debut,
+        date_creation__date__lte=aujourd_hui,
+    ).filter(
+        # Annulées avant la première date de référence, ou sans date d'annulation
+        # (queryset.update) : jamais en portefeuille
+        ~Q(statut='annulee') | Q(date_annulation__date__gte=origine)
+    ).annotate(
+        jour_creation=TruncDate('date_creation'),
+        jour_annulation=TruncDate('date_annulation'),
+    ).values_list('date_entree', 'date_sortie', 'statut', 'jour_creation', 'jour_annulation')
+
+    for date_entree, date_sortie, statut, jour_creation, jour_annulation in sejours:
+        premier = max((date_entree - date_debut).days, 0)
+        dernier = min((date_sortie - date_debut).days, nombre_jours)
+        ligne_creation = max((jour_creation - origine).days, 0)
+        ajouter(ligne_creation, premier, dernier, 1)
+        if statut == 'annulee':
+            ligne_annulation = (jour_annulation - origine).days
+            if ligne_annulation < nombre_lignes:
+                ajouter(max(ligne_annulation, ligne_creation), premier, dernier, -1)
+
+    # Somme cumulée sur les nuits, puis sur les jours de référence
+    portefeuille = []
+    precedente = [0] * nombre_jours
+    for ligne in matrice:
+        cumul = 0
+        courante = []
+        for colonne in range(nombre_jours):
+            cumul += ligne[colonne]
+            courante.append(precedente[colonne] + cumul)
+        portefeuille.append(courante)
+        precedente = courante
+
+    actuel = portefeuille[-1]
+    on_the_books = {ecart: portefeuille[nombre_lignes - 1 - ecart] for ecart in ecarts}
+    pickup = {
+        ecart: [maintenant - avant for maintenant, avant in zip(actuel, on_the_books[ecart])]
+        for ecart in ecarts if ecart
+    }
+    return {
+        'aujourd_hui': aujourd_hui,
+        'jours': [date_debut + timedelta(days=decalage) for decalage in range(nombre_jours)],
+        'ecarts': ecarts,
+        'on_the_books': on_the_books,
+        'pickup': pickup,
+        'totaux': {
+            'on_the_books': {ecart: sum(valeurs) for ecart, valeurs in on_the_books.items()},
+            'pickup': {ecart: sum(valeurs) for ecart, valeurs in pickup.items()},
+        },
+        'dates_reference': [origine + timedelta(days=decalage) for decalage in range(nombre_lignes)],
+        'matrice': portefeuille,
+    }
+
+
+def lignes_pace(pace):
+    """Une ligne par nuit pour le tableau HTML : date, portefeuille par écart, pickup par écart"""
+    return [
+        {
+            'jour': jour,
+            'on_the_books': [pace['on_the_books'][ecart][index] for ecart in pace['ecarts']],
+            'pickup': [pace['pickup'][ecart][index] for ecart in pace['ecarts'] if ecart],
+        }
+        for index, jour in enumerate(pace['jours'])
+    ]
+
+
+def pace_en_json(pace, inclure_matrice=False):
+    """Convertit un rapport de pace pour JSON (clés d'écart en chaînes, dates ISO)"""
+    reponse = {
+        'aujourd_hui': pace['aujourd_hui'].isoformat(),
+        'jours': [jour.isoformat() for jour in pace['jours']],
+        'ecarts': pace['ecarts'],
+        'on_the_books': {str(ecart): valeurs for ecart, valeurs in pace['on_the_books'].items()},
+        'pickup': {str(ecart): valeurs for ecart, valeurs in pace['pickup'].items()},
+        'totaux': {
+            cle: {str(ecart): total for ecart, total in valeurs.items()}
+            for cle, valeurs in pace['totaux'].items()
+        },
+    }
+    if inclure_matrice:
+        reponse['dates_reference'] = [jour.isoformat() for jour in pace['dates_reference']]
+        reponse['matrice'] = pace['matrice']
+    return reponse
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Calcul et génération des fiches de paie
+calculer_paie() est le seul endroit où sont appliquées les règles de paie
+(prime d'ancienneté de 1 % par année plafonnée à 10 %, cotisations sociales
+22 %, impôt à la source 15 %) : génération mensuelle, fiche créée avec le
+profil, création manuelle et estimation du tableau de bord comptable
+l'utilisent toutes.
+
+generer_fiches_paie() traite tous les employés actifs en une passe : les
+salaires sont lus en une requête, les fiches existantes des mois demandés
+chargées dans un ensemble, et les fiches manquantes insérées par bulk_create
+(un bloc de numéros par mois), sur un ou plusieurs mois. Aucun employé n'est
+payé pour un mois qui se termine avant sa date d'embauche (rattrapage).
+"""
+
+import calendar
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+
+CENTIME = Decimal('0.01')
+
+TAUX_ANCIENNETE_PAR_AN = Decimal('0.01')
+TAUX_ANCIENNETE_MAX = Decimal('0.10')
+TAUX_COTISATIONS = Decimal('0.22')
+TAUX_IMPOT_SOURCE = Decimal('0.15')
+
+# Fiches insérées par requête
+TAILLE_LOT = 1000
+
+# Montants d'une fiche de paie, dans l'ordre des champs de FichePaie
+ElementsPaie = namedtuple(
+    'ElementsPaie',
+    'salaire_brut prime_anciennete cotisations_sociales impot_source total_primes total_retenu salaire_net'
+)
+
+
+def calculer_paie(salaire, date_embauche=None, date_reference=None):
+    """
+    Éléments de paie d'un mois pour un salaire brut
+
+    Args:
+        salaire: Salaire brut mensuel (None : 0)
+        date_embauche: Optionnel, date d'embauche (prime d'ancienneté)
+        date_reference: Date à laquelle l'ancienneté est calculée (défaut : aujourd'hui)
+
+    Returns:
+        ElementsPaie: montants arrondis au centime
+    """
+    salaire = Decimal(str(salaire)) if salaire is not None else Decimal('0.00')
+
+    prime_anciennete = Decimal('0.00')
+    if date_embauche:
+        annees_anciennete = ((date_reference or timezone.now().date()) - date_embauche).days // 365
+        taux = min(Decimal(annees_anciennete) * TAUX_ANCIENNETE_PAR_AN, TAUX_ANCIENNETE_MAX)
+        if taux > 0:
+            prime_anciennete = (taux * salaire).quantize(CENTIME)
+
+    cotisations_sociales = (salaire * TAUX_COTISATIONS).quantize(CENTIME)
+    impot_source = (salaire * TAUX_IMPOT_SOURCE).quantize(CENTIME)
+    total_retenu = cotisations_sociales + impot_source
+    return ElementsPaie(
+        salaire_brut=salaire,
+        prime_anciennete=prime_anciennete,
+        cotisations_sociales=cotisations_sociales,
+        impot_source=impot_source,
+        total_primes=prime_anciennete,
+        total_retenu=total_retenu,
+        salaire_net=(salaire + prime_anciennete - total_retenu).quantize(CENTIME),
+    )
+
+
+def premier_du_mois(jour):
+    return date(jour.year, jour.month, 1)
+
+
+def mois_entre(premier, dernier):
+    """Premiers jours des mois de premier à dernier inclus"""
+    mois = []
+    courant = premier_du_mois(premier)
+    while courant <= dernier:
+        mois.append(courant)
+        courant = date(courant.year + courant.month // 12, courant.month % 12 + 1, 1)
+    return mois
+
+
+def fin_du_mois(mois):
+    return mois.replace(day=calendar.monthrange(mois.year, mois.month)[1])
+
+
+def date_reference(mois, aujourd_hui=None):
+    """Ancienneté calculée à la fin du mois, ou aujourd'hui pour le mois en cours"""
+    aujourd_hui = aujourd_hui or timezone.now().date()
+    return min(aujourd_hui, fin_du_mois(mois))
+
+
+def employes_a_payer():
+    """Employés actifs (staff avec un profil employé actif)"""
+    from django.contrib.auth.models import User
+
+    return User.objects.filter(
+        is_staff=True,
+        is_active=True,
+        profile__statut_employe='actif'
+    )
+
+
+def generer_fiches_paie(mois, employes=None, simulation=False, cree_par=None, taille_lot=TAILLE_LOT):
+    """
+    Crée les fiches de paie manquantes des employés actifs pour un ou plusieurs mois
+
+    Args:
+        mois: Liste de premiers jours de mois
+        employes: Optionnel, QuerySet d'utilisateurs (défaut : employes_a_payer())
+        simulation: Ne rien enregistrer ; retourne les fiches à créer et les écarts
+                    entre les fiches existantes et le calcul actuel
+        cree_par: Optionnel, utilisateur à l'origine de la génération
+        taille_lot: Fiches insérées par requête
+
+    Returns:
+        dict: {mois: bilan} avec creees (ou a_creer en simulation), existantes,
+              masse_brute et masse_nette des fiches créées, non_embauches
+              (employés embauchés après la fin du mois, ignorés), et en
+              simulation les listes fiches (à créer) et ecarts (fiches
+              existantes différentes)
+    """
+    from .models import FichePaie
+
+    mois = sorted({premier_du_mois(jour) for jour in mois})
+    employes = employes if employes is not None else employes_a_payer()
+    salaries = list(employes.order_by('pk').values_list(
+        'pk', 'username', 'profile__salaire', 'profile__date_embauche'
+    ))
+
+    fiches_existantes = FichePaie.objects.filter(mois__in=mois, employe__in=employes)
+    if simulation:
+        existantes = {
+            (employe_id, mois_fiche): montants
+            for employe_id, mois_fiche, *montants in fiches_existantes.values_list(
+                'employe_id', 'mois', *ElementsPaie._fields
+            )
+        }
+    else:
+        existantes = set(fiches_existantes.values_list('employe_id', 'mois'))
+
+    bilans = {}
+    for mois_paie in mois:
+        reference = date_reference(mois_paie)
+        dernier_jour = fin_du_mois(mois_paie)
+        bilan = {
+            'creees': 0, 'existantes': 0, 'masse_brute': Decimal('0.00'), 'masse_nette': Decimal('0.00'),
+            'non_embauches': [],
+        }
+        if simulation:
+            bilan.update(fiches=[], ecarts=[])
+        a_creer = []
+        for employe_id, username, salaire, date_embauche in salaries:
+            if date_embauche and date_embauche > dernier_jour:
+                bilan['non_embauches'].append(username)
+                continue
+            elements = calculer_paie(salaire, date_embauche, reference)
+            if (employe_id, mois_paie) in existantes:
+                bilan['existantes'] += 1
+                if simulation:
+                    enregistres = ElementsPaie(*existantes[(employe_id, mois_paie)])
+                    if enregistres != elements:
+                        bilan['ecarts'].append((username, enregistres, elements))
+                continue
+            a_creer.append((employe_id, username, elements))
+            bilan['masse_brute'] += elements.salaire_brut
+            bilan['masse_nette'] += elements.salaire_net
+
+        bilan['creees'] = len(a_creer)
+        if simulation:
+            bilan['fiches'] = [(username, elements) for _, username, elements in a_creer]
+        elif a_creer:
+            with transaction.atomic():
+                numeros = FichePaie.prochains_numeros(len(a_creer), mois_paie)
+                FichePaie.objects.bulk_create(
+                    [
+                        FichePaie(
+                            employe_id=employe_id,
+                            mois=mois_paie,
+                            numero_fiche=numero,
+                            cree_par=cree_par,
+                            **elements._asdict()
+                        )
+                        for (employe_id, _, elements), numero in zip(a_creer, numeros)
+                    ],
+                    batch_size=taille_lot,
+                )
+        bilans[mois_paie] = bilan
+    return bilans
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Rendu des factures en PDF (WeasyPrint)
+Le HTML est produit dans le processus Django ; la conversion en PDF, coûteuse
+en CPU, part dans un pool de processus. Chaque PDF est gardé sur disque sous
+un nom qui contient l'identifiant de la facture et une empreinte des champs
+affichés (et du gabarit) : il n'est rendu à nouveau que si l'un d'eux change.
+
+Le lot mensuel (archive ZIP) rend les factures manquantes en parallèle sur
+tous les cœurs et écrit chaque PDF dans l'archive dès qu'il est prêt, pendant
+que l'archive est envoyée au navigateur. Une facture dont le rendu échoue est
+journalisée et ignorée : la réponse est déjà partie, l'archive doit rester
+valide.
+
+Le PDF a son propre gabarit, sans formulaire ni date du jour : tout ce qu'il
+affiche vient des champs de CHAMPS_EMPREINTE.
+"""
+
+import hashlib
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as DelaiDepasse, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import get_template, render_to_string
+
+
+logger = logging.getLogger(__name__)
+
+GABARIT = 'hotel/billing_invoice_pdf.html'
+
+# WeasyPrint est optionnel : sans lui, les vues renvoient la facture en HTML
+PDF_DISPONIBLE = importlib.util.find_spec('weasyprint') is not None
+
+# Délai maximal de rendu d'une facture (secondes)
+DELAI_RENDU = 60
+
+# Champs affichés sur la facture : toute modification change l'empreinte
+CHAMPS_EMPREINTE = (
+    'numero_facture', 'date_emission', 'date_echeance', 'date_paiement',
+    'montant_ht', 'taux_tva', 'montant_tva', 'montant_ttc',
+    'statut', 'moyen_paiement', 'reference_paiement',
+    'reservation__id', 'reservation__statut', 'reservation__date_creation',
+    'reservation__date_entree', 'reservation__date_sortie',
+    'reservation__nombre_personnes', 'reservation__remarques', 'reservation__prix_total',
+    'reservation__client__nom', 'reservation__client__prenom',
+    'reservation__client__email', 'reservation__client__telephone',
+    'reservation__chambre__numero', 'reservation__chambre__type_chambre',
+    'reservation__chambre__prix_par_nuit',
+)
+
+_pool = None
+_verrou_pool = threading.Lock()
+
+
+def _html_vers_pdf(html, base_url):
+    """Exécuté dans un processus du pool : conversion HTML -> PDF"""
+    from weasyprint import HTML
+    return HTML(string=html, base_url=base_url).write_pdf()
+
+
+def _pool_rendu():
+    """Pool de processus partagé, créé au premier rendu"""
+    global _pool
+    with _verrou_pool:
+        if _pool is None:
+            # spawn : pas de fork d'un serveur qui a déjà des threads et des connexions
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'PDF_RENDER_WORKERS', None) or os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reinitialiser_pool():
+    """Abandonne un pool dont un processus est mort (il sera recréé au prochain rendu)"""
+    global _pool
+    with _verrou_pool:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _dossier_cache():
+    return Path(getattr(settings, 'INVOICE_PDF_CACHE_DIR', Path(settings.BASE_DIR) / 'cache' / 'factures'))
+
+
+def _empreinte_gabarit():
+    source = getattr(get_template(GABARIT).template, 'source', '')
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def empreintes(factures):
+    """
+    Empreinte du contenu de chaque facture, en une requête
+
+    Args:
+        factures: QuerySet de Facture
+
+    Returns:
+        dict: {id de facture: empreinte hexadécimale}
+    """
+    gabarit = _empreinte_gabarit()
+    resultat = {}
+    for pk, *valeurs in factures.order_by().values_list('pk', *CHAMPS_EMPREINTE):
+        contenu = json.dumps([gabarit, *valeurs], default=str)
+        resultat[pk] = hashlib.sha256(contenu.encode('utf-8')).hexdigest()[:24]
+    return resultat
+
+
+def chemin_cache(facture_id, empreinte):
+    return _dossier_cache() / f'{facture_id}-{empreinte}.pdf'
+
+
+def _stocker(facture_id, empreinte, pdf):
+    """Écrit le PDF dans le cache (écriture atomique) et supprime ses anciennes versions"""
+    dossier = _dossier_cache()
+    dossier.mkdir(parents=True, exist_ok=True)
+    chemin = chemin_cache(facture_id, empreinte)
+    descripteur, temporaire = tempfile.mkstemp(dir=dossier, suffix='.tmp')
+    with os.fdopen(descripteur, 'wb') as fichier:
+        fichier.write(pdf)
+    os.replace(temporaire, chemin)
+    for ancien in dossier.glob(f'{facture_id}-*.pdf'):
+        if ancien != chemin:
+            ancien.unlink(missing_ok=True)
+    return chemin
+
+
+def html_facture(facture):
+    """HTML de la facture, sans contexte de requête (identique pour tous les utilisateurs)"""
+    return render_to_string(GABARIT, {
+        'facture': facture,
+        'reservation': facture.reservation,
+        'client': facture.client,
+    })
+
+
+def pdf_facture(facture, base_url):
+    """
+    Chemin du PDF d'une facture, rendu par le pool s'il n'est pas en cache
+
+    Args:
+        facture: Instance de Facture
+        base_url: URL de base pour les ressources (CSS, images) du HTML
+
+    Returns:
+        Path: fichier PDF
+    """
+    from .models import Facture
+
+    empreinte = empreintes(Facture.objects.filter(pk=facture.pk))[facture.pk]
+    chemin = chemin_cache(facture.pk, empreinte)
+    if chemin.exists():
+        return chemin
+    try:
+        pdf = _pool_rendu().submit(_html_vers_pdf, html_facture(facture), base_url).result(DELAI_RENDU)
+    except BrokenProcessPool:
+        _reinitialiser_pool()
+        raise
+    return _stocker(facture.pk, empreinte, pdf)
+
+
+def _echec(erreurs, facture, erreur):
+    """Journalise l'échec du rendu d'une facture du lot et le note dans erreurs"""
+    logger.error('Rendu PDF de la facture %s impossible : %s', facture.numero_facture, erreur,
+                 exc_info=isinstance(erreur, BaseException))
+    if erreurs is not None:
+        erreurs.append((facture, str(erreur) or type(erreur).__name__))
+
+
+def pdfs_factures(factures, base_url, erreurs=None):
+    """
+    PDF d'un lot de factures : ceux en cache d'abord, puis les autres au fur et
+    à mesure de leur rendu en parallèle
+
+    Une facture dont le rendu échoue ou dépasse le délai est journalisée et
+    ignorée : le lot continue avec les suivantes.
+
+    Args:
+        factures: QuerySet de Facture
+        base_url: URL de base pour les ressources du HTML
+        erreurs: Optionnel, liste complétée avec les (facture, message) ignorées
+
+    Yields:
+        tuple: (facture, chemin du PDF)
+    """
+    signatures = empreintes(factures)
+    factures = list(factures.select_related('client', 'reservation__client', 'reservation__chambre'))
+
+    a_rendre = []
+    for facture in factures:
+        chemin = chemin_cache(facture.pk, signatures[facture.pk])
+        if chemin.exists():
+            yield facture, chemin
+        else:
+            a_rendre.append(facture)
+    if not a_rendre:
+        return
+
+    pool = _pool_rendu()
+    travaux = {}
+    pool_casse = False
+    for facture in a_rendre:
+        try:
+            travaux[pool.submit(_html_vers_pdf, html_facture(facture), base_url)] = facture
+        except Exception as e:
+            pool_casse = pool_casse or isinstance(e, BrokenProcessPool)
+            _echec(erreurs, facture, e)
+    try:
+        for travail in as_completed(travaux, timeout=DELAI_RENDU * max(len(travaux), 1)):
+            facture = travaux[travail]
+            try:
+                chemin = _stocker(facture.pk, signatures[facture.pk], travail.result())
+            except Exception as e:
+                pool_casse = pool_casse or isinstance(e, BrokenProcessPool)
+                _echec(erreurs, facture, e)
+                continue
+            yield facture, chemin
+    except DelaiDepasse:
+        for travail, facture in travaux.items():
+            if not travail.done():
+                _echec(erreurs, facture, f'délai de rendu dépassé ({DELAI_RENDU} s par facture)')
+    finally:
+        for travail in travaux:
+            travail.cancel()
+        if pool_casse:
+            _reinitialiser_pool()
+
+
+class _TamponZip:
+    """Fichier en écriture seule (non positionnable) dont on récupère le contenu par morceaux"""
+
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, donnees):
+        self.morceaux.append(bytes(donnees))
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        contenu = b''.join(self.morceaux)
+        self.morceaux.clear()
+        return contenu
+
+
+def flux_zip(fichiers):
+    """
+    Archive ZIP produite au fil de l'eau, pour une StreamingHttpResponse
+
+    Args:
+        fichiers: itérable de (nom dans l'archive, chemin sur disque ou contenu en bytes)
+
+    Yields:
+        bytes: morceaux de l'archive (un ou plusieurs par fichier)
+    """
+    tampon = _TamponZip()
+    # Les PDF sont déjà compressés : stockés tels quels
+    with zipfile.ZipFile(tampon, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for nom, source in fichiers:
+            if isinstance(source, bytes):
+                archive.writestr(nom, source)
+            else:
+                with open(source, 'rb') as fichier, archive.open(nom, mode='w', force_zip64=True) as destination:
+                    shutil.copyfileobj(fichier, destination, 256 * 1024)
+            yield tampon.vider()
+    # Répertoire central, écrit à la fermeture de l'archive
+    yield tampon.vider()
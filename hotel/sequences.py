@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Numérotation des documents (factures, fiches de paie)
+Chaque préfixe (F + jour pour les factures, FP + mois pour les fiches de paie)
+a sa ligne dans DocumentSequence. Un numéro, ou un bloc de N numéros pour une
+génération en masse, est réservé par un seul UPDATE ... SET dernier_numero =
+dernier_numero + N : la ligne reste verrouillée jusqu'à la fin de la
+transaction, donc deux enregistrements concurrents obtiennent des numéros
+distincts, sans balayer ni trier la table des documents.
+
+À la première utilisation d'un préfixe, la séquence repart du plus grand numéro
+déjà présent en base (documents créés avant la séquence ou importés).
+"""
+
+from collections import namedtuple
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+# modele / champ : où sont stockés les numéros de ce type de document
+# format_prefixe : préfixe construit à partir d'une date (jour ou mois)
+TypeDocument = namedtuple('TypeDocument', 'nom modele champ format_prefixe')
+
+TYPES_DOCUMENTS = {
+    type_document.nom: type_document
+    for type_document in (
+        TypeDocument('facture', 'Facture', 'numero_facture', 'F{date:%Y%m%d}'),
+        TypeDocument('fiche_paie', 'FichePaie', 'numero_fiche', 'FP{date:%Y%m}'),
+    )
+}
+
+# Nombre minimal de chiffres du numéro après le préfixe
+CHIFFRES = 4
+
+
+def dernier_numero_existant(type_document, prefixe):
+    """Plus grand numéro déjà enregistré pour ce préfixe (0 si aucun)"""
+    modele = apps.get_model('hotel', type_document.modele)
+    champ = type_document.champ
+    dernier = 0
+    numeros = modele.objects.filter(**{f'{champ}__startswith': prefixe}).values_list(champ, flat=True)
+    for numero in numeros.iterator():
+        suffixe = numero[len(prefixe):]
+        if suffixe.isdigit():
+            dernier = max(dernier, int(suffixe))
+    return dernier
+
+
+def allouer(prefixe, nombre=1, dernier_existant=None):
+    """
+    Réserve atomiquement les N numéros suivants d'un préfixe
+
+    Args:
+        prefixe: Préfixe de la séquence
+        nombre: Taille du bloc à réserver
+        dernier_existant: Optionnel, fonction sans argument donnant le numéro
+                          de départ si la séquence n'existe pas encore
+
+    Returns:
+        range: numéros réservés, consécutifs
+    """
+    from .models import DocumentSequence
+
+    if nombre < 1:
+        raise ValueError('Le nombre de numéros à allouer doit être positif')
+
+    sequences = DocumentSequence.objects.filter(prefixe=prefixe)
+    with transaction.atomic():
+        incrementee = sequences.update(
+            dernier_numero=F('dernier_numero') + nombre,
+            date_maj=timezone.now(),
+        )
+        if not incrementee:
+            depart = dernier_existant() if dernier_existant else 0
+            _, creee = DocumentSequence.objects.get_or_create(
+                prefixe=prefixe,
+                defaults={'dernier_numero': depart + nombre},
+            )
+            if creee:
+                return range(depart + 1, depart + nombre + 1)
+            # Créée entre-temps par un autre enregistrement
+            sequences.update(dernier_numero=F('dernier_numero') + nombre, date_maj=timezone.now())
+        # Ligne verrouillée par l'UPDATE jusqu'au commit : la valeur lue est la nôtre
+        dernier = sequences.values_list('dernier_numero', flat=True).get()
+    return range(dernier - nombre + 1, dernier + 1)
+
+
+def prochains_numeros(nom, nombre=1, date=None):
+    """
+    Réserve et formate les N prochains numéros d'un type de document
+
+    Args:
+        nom: Type de document ('facture', 'fiche_paie')
+        nombre: Nombre de numéros (bloc pour une génération en masse)
+        date: Optionnel, date du préfixe (défaut : aujourd'hui)
+
+    Returns:
+        list: numéros formatés, ex. ['F202610160001', 'F202610160002']
+    """
+    type_document = TYPES_DOCUMENTS[nom]
+    prefixe = type_document.format_prefixe.format(date=date or timezone.localdate())
+    numeros = allouer(
+        prefixe,
+        nombre,
+        dernier_existant=lambda: dernier_numero_existant(type_document, prefixe),
+    )
+    return [f'{prefixe}{numero:0{CHIFFRES}d}' for numero in numeros]
+
+
+def verifier_sequences():
+    """
+    Séquences en retard sur les documents existants (numéros déjà utilisés)
+
+    Returns:
+        list: tuples (préfixe, dernier numéro de la séquence, plus grand numéro en base)
+    """
+    from .models import DocumentSequence
+
+    retards = []
+    for sequence in DocumentSequence.objects.all():
+        for type_document in TYPES_DOCUMENTS.values():
+            debut = type_document.format_prefixe.split('{', 1)[0]
+            suffixe = sequence.prefixe[len(debut):]
+            # F et FP partagent leur première lettre : préfixe = lettres + chiffres seuls
+            if not sequence.prefixe.startswith(debut) or not suffixe.isdigit():
+                continue
+            existant = dernier_numero_existant(type_document, sequence.prefixe)
+            if existant > sequence.dernier_numero:
+                retards.append((sequence.prefixe, sequence.dernier_numero, existant))
+    return retards
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Séries temporelles financières (revenus, dépenses, salaires, bénéfice)
+Une requête GROUP BY par table source (Trunc du champ date) pour toute la
+période, quel que soit le nombre de jours, semaines ou mois. Les périodes sans
+mouvement sont complétées par des zéros pour que les graphiques restent continus.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import DateField, Sum
+from django.db.models.functions import Trunc
+
+
+GRANULARITES = ('day', 'week', 'month')
+
+# Nombre maximum de points d'une série (protège l'API des périodes démesurées)
+POINTS_MAX = 1000
+
+FORMATS_LIBELLE = {
+    'day': '%d/%m/%Y',
+    'week': 'S%V %G',
+    'month': '%b %Y',
+}
+
+
+def debut_periode(jour, granularite):
+    """Premier jour de la période (jour, semaine commençant le lundi, mois) contenant `jour`"""
+    if granularite == 'month':
+        return jour.replace(day=1)
+    if granularite == 'week':
+        return jour - timedelta(days=jour.weekday())
+    return jour
+
+
+def periode_suivante(jour, granularite):
+    """Premier jour de la période suivante"""
+    if granularite == 'month':
+        return (jour.replace(day=1) + timedelta(days=32)).replace(day=1)
+    if granularite == 'week':
+        return jour + timedelta(days=7)
+    return jour + timedelta(days=1)
+
+
+def periodes(date_debut, date_fin, granularite):
+    """Premiers jours de toutes les périodes couvrant [date_debut, date_fin]"""
+    jour = debut_periode(date_debut, granularite)
+    resultat = []
+    while jour <= date_fin:
+        resultat.append(jour)
+        jour = periode_suivante(jour, granularite)
+    return resultat
+
+
+def _sommes_par_periode(queryset, champ, champ_montant, granularite):
+    """GROUP BY sur le début de période : {date: somme}"""
+    return dict(
+        queryset.annotate(periode=Trunc(champ, granularite, output_field=DateField()))
+        .values('periode').annotate(total=Sum(champ_montant))
+        .values_list('periode', 'total')
+    )
+
+
+def serie_financiere(date_debut, date_fin, granularite='month'):
+    """
+    Revenus, dépenses, salaires et bénéfice par période sur [date_debut, date_fin]
+
+    Revenus : factures émises (TTC) ; dépenses : charges comptables (TTC) ;
+    salaires : fiches de paie (net) rattachées à leur mois ;
+    bénéfice = revenus - dépenses - salaires.
+
+    Returns:
+        dict: granularite, periodes (ISO), labels, revenus, depenses, salaires, benefice
+              (listes alignées, en Decimal)
+
+    Raises:
+        ValueError: granularité inconnue ou trop de points
+    """
+    from .models import ChargeComptable, Facture, FichePaie
+
+    if granularite not in GRANULARITES:
+        raise ValueError(f'Granularité inconnue : {granularite}')
+    if date_fin < date_debut:
+        raise ValueError('La date de fin doit suivre la date de début')
+    debuts = periodes(date_debut, date_fin, granularite)
+    if len(debuts) > POINTS_MAX:
+        raise ValueError(f'Période trop longue ({len(debuts)} points, maximum {POINTS_MAX})')
+
+    revenus = _sommes_par_periode(
+        Facture.objects.filter(date_emission__date__gte=date_debut, date_emission__date__lte=date_fin),
+        'date_emission', 'montant_ttc', granularite
+    )
+    depenses = _sommes_par_periode(
+        ChargeComptable.objects.filter(date_facture__gte=date_debut, date_facture__lte=date_fin),
+        'date_facture', 'montant_ttc', granularite
+    )
+    salaires = _sommes_par_periode(
+        FichePaie.objects.filter(mois__gte=debut_periode(date_debut, 'month'), mois__lte=date_fin),
+        'mois', 'salaire_net', granularite
+    )
+
+    zero = Decimal('0.00')
+    serie = {
+        'granularite': granularite,
+        'periodes': [debut.isoformat() for debut in debuts],
+        'labels': [debut.strftime(FORMATS_LIBELLE[granularite]) for debut in debuts],
+        'revenus': [revenus.get(debut) or zero for debut in debuts],
+        'depenses': [depenses.get(debut) or zero for debut in debuts],
+        'salaires': [salaires.get(debut) or zero for debut in debuts],
+    }
+    serie['benefice'] = [
+        revenu - depense - salaire
+        for revenu, depense, salaire in zip(serie['revenus'], serie['depenses'], serie['salaires'])
+    ]
+    return serie
+
+
+def serie_en_json(serie):
+    """Convertit les montants d'une série en nombres pour JSON / Chart.js"""
+    return {
+        cle: [float(valeur) for valeur in valeurs] if cle in ('revenus', 'depenses', 'salaires', 'benefice') else valeurs
+        for cle, valeurs in serie.items()
+    }
@@ -5,14 +5,19 @@ Ce fichier contient les signaux qui déclenchent des actions automatiques
 lors de certains événements (création de réservation, etc.)
 """
 
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
 from .models import (
     Reservation, Facture, FichePaie, UserProfile, 
-    ContactMessage, Maintenance, InventoryItem, Notification
+    ContactMessage, Maintenance, InventoryItem, Notification,
+    Chambre, ChambreImage, Client
 )
+from .availability import synchroniser_reservation, marquer_modification
+from .catalogue import invalider_chambre
+from .compteurs import enregistrer_sauvegarde, enregistrer_suppression, memoriser_avant
 
 
 @receiver(post_save, sender=Reservation)
@@ -26,7 +31,7 @@ def creer_facture_et_notification_automatique(sender, instance, created, **kwarg
         facture = Facture.objects.create(
             reservation=instance,
             client=instance.client,
-            montant_ht=instance.prix_total / 1.20,  # TVA 20%
+            montant_ht=Facture.montant_ht_depuis_ttc(instance.prix_total),  # TVA 20%
             cree_par=instance.cree_par,
             statut='payee'  # ✅ PAIEMENT AUTOMATIQUE à la réservation
         )
@@ -59,7 +64,7 @@ def creer_facture_si_confirmee(sender, instance, created, **kwargs):
             facture = Facture.objects.create(
                 reservation=instance,
                 client=instance.client,
-                montant_ht=instance.prix_total / 1.20,  # TVA 20%
+                montant_ht=Facture.montant_ht_depuis_ttc(instance.prix_total),  # TVA 20%
                 cree_par=instance.cree_par,
                 statut='payee'  # ✅ PAIEMENT AUTOMATIQUE
             )
@@ -97,6 +102,86 @@ def mettre_a_jour_statut_facture(sender, instance, **kwargs):
             pass
 
 
+@receiver(post_save, sender=Reservation)
+def mettre_a_jour_index_disponibilite(sender, instance, **kwargs):
+    """
+    Répercute la création ou la modification d'une réservation dans l'index de disponibilité
+    """
+    synchroniser_reservation(instance)
+
+
+@receiver(post_delete, sender=Reservation)
+def retirer_de_index_disponibilite(sender, instance, **kwargs):
+    """
+    Retire une réservation supprimée de l'index de disponibilité
+    """
+    synchroniser_reservation(instance, supprimee=True)
+
+
+@receiver([post_save, post_delete], sender=Chambre)
+def invalider_catalogue_chambre(sender, instance, **kwargs):
+    """
+    Invalide le fragment de catalogue d'une chambre modifiée ou supprimée
+    Après le commit : invalidé avant, il pourrait être remis en cache avec
+    l'ancienne ligne par une requête concurrente.
+    """
+    chambre_id = instance.pk
+    transaction.on_commit(lambda: invalider_chambre(chambre_id))
+
+
+@receiver([post_save, post_delete], sender=Chambre)
+@receiver([post_save, post_delete], sender=ChambreImage)
+def marquer_modification_chambre(sender, instance, **kwargs):
+    """
+    Date la dernière modification des chambres ou de leurs images (en-têtes ETag / Last-Modified)
+    """
+    transaction.on_commit(marquer_modification)
+
+
+@receiver([post_save, post_delete], sender=ChambreImage)
+def invalider_catalogue_image(sender, instance, **kwargs):
+    """
+    Invalide le fragment de catalogue lorsqu'une image de chambre change (après le commit)
+    """
+    chambre_id = instance.chambre_id
+    transaction.on_commit(lambda: invalider_chambre(chambre_id))
+
+
+@receiver(pre_save, sender=Client)
+@receiver(pre_save, sender=Chambre)
+@receiver(pre_save, sender=Reservation)
+@receiver(pre_save, sender=Notification)
+def memoriser_compteurs(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Mémorise l'état enregistré d'un objet compté avant sa modification
+    """
+    if not raw:
+        memoriser_avant(instance, update_fields)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Chambre)
+@receiver(post_save, sender=Reservation)
+@receiver(post_save, sender=Notification)
+def mettre_a_jour_compteurs(sender, instance, raw=False, **kwargs):
+    """
+    Répercute la création ou la modification dans les compteurs des dashboards (F())
+    """
+    if not raw:
+        enregistrer_sauvegarde(instance)
+
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Chambre)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_delete, sender=Notification)
+def decrementer_compteurs(sender, instance, **kwargs):
+    """
+    Retire un objet supprimé des compteurs des dashboards
+    """
+    enregistrer_suppression(instance)
+
+
 @receiver(post_save, sender=ContactMessage)
 def notifier_nouveau_message_contact(sender, instance, created, **kwargs):
     """
@@ -160,52 +245,13 @@ def notifier_alerte_stock(sender, instance, created, **kwargs):
 def generer_fiches_paie_mensuelles():
     """
     Fonction utilitaire pour générer les fiches de paie mensuelles
-    À appeler via une tâche cron ou management command
+    À appeler via une tâche cron ou management command (generate_payroll)
     """
-    from datetime import date
+    from .paie import generer_fiches_paie, premier_du_mois
     
     # Premier jour du mois courant
-    mois_courant = date(date.today().year, date.today().month, 1)
-    
-    # Récupérer tous les employés actifs
-    employes_actifs = User.objects.filter(
-        is_staff=True,
-        is_active=True,
-        profile__statut_employe='actif'
-    )
-    
-    from decimal import Decimal
-
-    for employe in employes_actifs:
-        # Vérifier si la fiche de paie existe déjà
-        if not FichePaie.objects.filter(employe=employe, mois=mois_courant).exists():
-            profile = getattr(employe, 'profile', None)
-
-            # Salaire sécurisé en Decimal
-            salaire = Decimal(str(profile.salaire)) if profile and profile.salaire is not None else Decimal('0')
-
-            # Calculer la prime d'ancienneté (1% par année, max 10%) en Decimal
-            if profile and profile.date_embauche:
-                annees_anciennete = (date.today() - profile.date_embauche).days // 365
-                taux = (Decimal(annees_anciennete) * Decimal('0.01'))
-                if taux > Decimal('0.10'):
-                    taux = Decimal('0.10')
-                prime_anciennete = (taux * salaire).quantize(Decimal('0.01'))
-            else:
-                prime_anciennete = Decimal('0.00')
-
-            cotisations_sociales = (salaire * Decimal('0.22')).quantize(Decimal('0.01'))
-            impot_source = (salaire * Decimal('0.15')).quantize(Decimal('0.01'))
-
-            # Créer la fiche de paie
-            FichePaie.objects.create(
-                employe=employe,
-                mois=mois_courant,
-                salaire_brut=salaire,
-                prime_anciennete=prime_anciennete,
-                cotisations_sociales=cotisations_sociales,  # 22% de cotisations
-                impot_source=impot_source,  # 15% d'impôt à la source
-            )
+    mois_courant = premier_du_mois(timezone.now().date())
+    return generer_fiches_paie([mois_courant])[mois_courant]
 
 
 def creer_charge_maintenance_automatique(maintenance):
@@ -262,35 +308,11 @@ def creer_fiche_paie_automatique(sender, instance, created, **kwargs):
     if getattr(instance, 'statut_employe', '') != 'actif':
         return
     try:
-        from decimal import Decimal
-        from datetime import date
-        mois_courant = date(timezone.now().year, timezone.now().month, 1)
-        # Si une fiche existe déjà, ne pas en créer
-        if FichePaie.objects.filter(employe=user, mois=mois_courant).exists():
-            return
-        salaire = Decimal(str(instance.salaire)) if instance.salaire is not None else Decimal('0.00')
-        # Calcul de la prime d'ancienneté
-        if instance.date_embauche:
-            annees_anciennete = (timezone.now().date() - instance.date_embauche).days // 365
-            taux = Decimal(annees_anciennete) * Decimal('0.01')
-            if taux > Decimal('0.10'):
-                taux = Decimal('0.10')
-            prime_anciennete = (taux * salaire).quantize(Decimal('0.01'))
-        else:
-            prime_anciennete = Decimal('0.00')
-
-        cotisations_sociales = (salaire * Decimal('0.22')).quantize(Decimal('0.01'))
-        impot_source = (salaire * Decimal('0.15')).quantize(Decimal('0.01'))
-
-        FichePaie.objects.create(
-            employe=user,
-            mois=mois_courant,
-            salaire_brut=salaire,
-            prime_anciennete=prime_anciennete,
-            cotisations_sociales=cotisations_sociales,
-            impot_source=impot_source,
-            cree_par=None
-        )
+        from .paie import employes_a_payer, generer_fiches_paie, premier_du_mois
+        mois_courant = premier_du_mois(timezone.now().date())
+        # Même chemin que la paie mensuelle : fiche déjà existante ou embauche
+        # postérieure au mois ignorées, numéro pris dans la séquence du mois
+        generer_fiches_paie([mois_courant], employes=employes_a_payer().filter(pk=user.pk))
     except Exception:
         # Tolérer les erreurs ici pour ne pas bloquer la création du profil
         pass
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Instantanés quotidiens des KPIs (table DailyKPISnapshot)
+Chaque journée est calculée une fois, par des requêtes GROUP BY par jour sur les
+nuitées, factures, charges, fiches de paie et clients, puis enregistrée. Les
+rapports sur une période additionnent ensuite les lignes déjà agrégées ; seuls
+les jours pas encore enregistrés (typiquement aujourd'hui) sont calculés à la volée.
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+# Statuts dont les nuits comptent comme vendues
+STATUTS_VENDUS = ('confirmee', 'en_cours', 'terminee')
+
+# Champs additionnés lors d'un cumul de journées
+CHAMPS_CUMULES = (
+    'nuits_vendues', 'chambres_disponibles', 'chiffre_affaires',
+    'encaissements', 'charges', 'salaires', 'nouveaux_clients',
+)
+
+CENTIME = Decimal('0.01')
+
+
+def revenu_reconnu(date_debut=None, date_fin=None):
+    """
+    Chiffre d'affaires hébergement reconnu nuit par nuit sur [date_debut, date_fin[
+
+    Somme des nuitées (RoomNight, index date + statut) vendues dans la période :
+    un séjour à cheval sur deux mois est réparti entre eux. Sans bornes, tout
+    l'historique.
+    """
+    from .models import RoomNight
+
+    nuitees = RoomNight.objects.filter(statut__in=STATUTS_VENDUS)
+    if date_debut:
+        nuitees = nuitees.filter(date__gte=date_debut)
+    if date_fin:
+        nuitees = nuitees.filter(date__lt=date_fin)
+    return nuitees.aggregate(total=Sum('prix_nuit'))['total'] or Decimal('0.00')
+
+
+def revenu_du_mois(jour=None):
+    """Chiffre d'affaires reconnu des nuits du mois contenant `jour` (défaut : aujourd'hui)"""
+    from django.utils import timezone
+
+    debut = (jour or timezone.localdate()).replace(day=1)
+    fin = (debut + timedelta(days=32)).replace(day=1)
+    return revenu_reconnu(debut, fin)
+
+
+def _par_jour(queryset, champ_date, agregat):
+    """Exécute un GROUP BY par jour et retourne {date: valeur}"""
+    return dict(
+        queryset.annotate(jour=champ_date).values('jour')
+        .annotate(valeur=agregat).values_list('jour', 'valeur')
+    )
+
+
+def _ratio(numerateur, denominateur):
+    if not denominateur:
+        return Decimal('0.00')
+    return (Decimal(numerateur) / denominateur).quantize(CENTIME)
+
+
+def calculer_journees(date_debut, date_fin):
+    """
+    Calcule (sans les enregistrer) les instantanés des jours [date_debut, date_fin[
+
+    Une requête GROUP BY par table source, quel que soit le nombre de jours.
+
+    Returns:
+        list: instances de DailyKPISnapshot non enregistrées, une par jour
+    """
+    from .models import Chambre, ChargeComptable, Client, DailyKPISnapshot, Facture, FichePaie, RoomNight
+
+    nuitees = dict(
+        (jour, (nuits, montant))
+        for jour, nuits, montant in RoomNight.objects.filter(
+            date__gte=date_debut, date__lt=date_fin, statut__in=STATUTS_VENDUS
+        ).values('date').annotate(nuits=Count('id'), montant=Sum('prix_nuit')).values_list('date', 'nuits', 'montant')
+    )
+    # Inventaire actuel : l'historique du parc de chambres n'est pas conservé
+    chambres = Chambre.objects.count()
+    encaissements = _par_jour(
+        Facture.objects.filter(
+            statut='payee',
+            date_paiement__date__gte=date_debut,
+            date_paiement__date__lt=date_fin
+        ),
+        TruncDate('date_paiement'), Sum('montant_ttc')
+    )
+    charges = dict(
+        ChargeComptable.objects.filter(date_facture__gte=date_debut, date_facture__lt=date_fin)
+        .values('date_facture').annotate(total=Sum('montant_ttc')).values_list('date_facture', 'total')
+    )
+    # Salaire rattaché au jour du paiement, à défaut au mois de paie
+    jour_salaire = Coalesce(TruncDate('date_paiement'), 'mois')
+    salaires = _par_jour(
+        FichePaie.objects.filter(statut='paye').annotate(jour_paie=jour_salaire).filter(
+            jour_paie__gte=date_debut, jour_paie__lt=date_fin
+        ),
+        jour_salaire, Sum('salaire_net')
+    )
+    nouveaux_clients = _par_jour(
+        Client.objects.filter(
+            date_inscription__date__gte=date_debut,
+            date_inscription__date__lt=date_fin
+        ),
+        TruncDate('date_inscription'), Count('id')
+    )
+
+    journees = []
+    for decalage in range((date_fin - date_debut).days):
+        jour = date_debut + timedelta(days=decalage)
+        nuits, chiffre_affaires = nuitees.get(jour, (0, None))
+        chiffre_affaires = chiffre_affaires or Decimal('0.00')
+        journees.append(DailyKPISnapshot(
+            date=jour,
+            nuits_vendues=nuits,
+            chambres_disponibles=chambres,
+            chiffre_affaires=chiffre_affaires,
+            adr=_ratio(chiffre_affaires, nuits),
+            revpar=_ratio(chiffre_affaires, chambres),
+            encaissements=encaissements.get(jour) or Decimal('0.00'),
+            charges=charges.get(jour) or Decimal('0.00'),
+            salaires=salaires.get(jour) or Decimal('0.00'),
+            nouveaux_clients=nouveaux_clients.get(jour, 0),
+        ))
+    return journees
+
+
+def enregistrer_snapshots(date_debut, date_fin):
+    """
+    Calcule et enregistre les instantanés des jours [date_debut, date_fin[
+    Idempotent : les lignes existantes de la période sont remplacées.
+
+    Returns:
+        int: nombre de jours enregistrés
+    """
+    from .models import DailyKPISnapshot
+
+    journees = calculer_journees(date_debut, date_fin)
+    with transaction.atomic():
+        DailyKPISnapshot.objects.filter(date__gte=date_debut, date__lt=date_fin).delete()
+        DailyKPISnapshot.objects.bulk_create(journees)
+    return len(journees)
+
+
+def lire_journees(date_debut, date_fin):
+    """
+    Instantanés des jours [date_debut, date_fin[, dans l'ordre
+
+    Les jours enregistrés sont lus en une requête ; les jours manquants
+    (aujourd'hui, ou période pas encore calculée) sont calculés à la volée,
+    sans être enregistrés.
+    """
+    from .models import DailyKPISnapshot
+
+    enregistres = {
+        snapshot.date: snapshot
+        for snapshot in DailyKPISnapshot.objects.filter(date__gte=date_debut, date__lt=date_fin)
+    }
+    manquants = [
+        date_debut + timedelta(days=decalage)
+        for decalage in range((date_fin - date_debut).days)
+        if date_debut + timedelta(days=decalage) not in enregistres
+    ]
+    if manquants:
+        for snapshot in calculer_journees(manquants[0], manquants[-1] + timedelta(days=1)):
+            enregistres.setdefault(snapshot.date, snapshot)
+    return [enregistres[jour] for jour in sorted(enregistres)]
+
+
+def totaliser(journees):
+    """
+    Cumule des journées en indicateurs de période
+
+    Returns:
+        dict: cumuls, plus ADR, RevPAR, taux d'occupation, dépenses et résultat
+    """
+    totaux = {champ: sum((getattr(journee, champ) for journee in journees), 0) for champ in CHAMPS_CUMULES}
+    totaux['jours'] = len(journees)
+    totaux['adr'] = _ratio(totaux['chiffre_affaires'], totaux['nuits_vendues'])
+    totaux['revpar'] = _ratio(totaux['chiffre_affaires'], totaux['chambres_disponibles'])
+    totaux['taux_occupation'] = (
+        round(totaux['nuits_vendues'] / totaux['chambres_disponibles'] * 100, 1)
+        if totaux['chambres_disponibles'] else 0
+    )
+    totaux['depenses'] = totaux['charges'] + totaux['salaires']
+    totaux['resultat'] = totaux['encaissements'] - totaux['depenses']
+    return totaux
+
+
+def serie_mensuelle(journees):
+    """Cumuls mois par mois : OrderedDict {date du 1er du mois: totaux}"""
+    mois = OrderedDict()
+    for journee in journees:
+        mois.setdefault(journee.date.replace(day=1), []).append(journee)
+    return OrderedDict((premier, totaliser(jours)) for premier, jours in mois.items())
+
+
+def _meme_jour_annee_precedente(jour):
+    try:
+        return jour.replace(year=jour.year - 1)
+    except ValueError:
+        # 29 février
+        return jour.replace(year=jour.year - 1, day=28)
+
+
+def rapport_periode(date_debut, date_fin):
+    """
+    Rapport d'une période [date_debut, date_fin] (bornes incluses) avec comparaison N-1
+
+    Returns:
+        dict: totaux et série mensuelle de la période et de la même période l'an passé
+    """
+    fin = date_fin + timedelta(days=1)
+    debut_precedent = _meme_jour_annee_precedente(date_debut)
+    fin_precedente = _meme_jour_annee_precedente(date_fin) + timedelta(days=1)
+
+    journees = lire_journees(date_debut, fin)
+    journees_precedentes = lire_journees(debut_precedent, fin_precedente)
+    return {
+        'debut': date_debut,
+        'fin': date_fin,
+        'totaux': totaliser(journees),
+        'totaux_precedents': totaliser(journees_precedentes),
+        'mensuel': serie_mensuelle(journees),
+        'mensuel_precedent': serie_mensuelle(journees_precedentes),
+    }
+
+
+def graphique_comparaison(rapport, indicateur):
+    """
+    Données de graphique mois par mois N / N-1 pour un indicateur
+
+    Returns:
+        dict: labels, actuel, precedent (listes de nombres)
+    """
+    actuel = list(rapport['mensuel'].items())
+    precedent = list(rapport['mensuel_precedent'].values())
+    return {
+        'labels': [premier.strftime('%m/%Y') for premier, _ in actuel],
+        'actuel': [float(totaux[indicateur]) for _, totaux in actuel],
+        'precedent': [float(totaux[indicateur]) for totaux in precedent[:len(actuel)]],
+    }
+
@@ -1,3 +1,1082 @@
-from django.test import TestCase
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from unittest import mock
+
+from .allocation import optimiser_affectations
+from .availability import (
+    IndexDisponibilite, _version_courante, construire_matrice_disponibilite, derniere_modification, encoder_rle,
+    index_disponibilite, verifier_cache_partage,
+)
+from . import booking
+from .booking import ChambreIndisponible, reserver_chambre, reserver_groupe
+from .cache_dashboard import CLE_CACHE as CLE_CACHE_DASHBOARD, contexte_dashboard
+from .calendrier import construire_grille_calendrier, filtrer_reservations, parser_mois, reservations_visibles
+from .catalogue import fragments_chambres
+from .compteurs import lire_compteur, lire_compteurs
+from .dashboard_stats import calculer_stats, stats_poste
+from .facturation import facturer_en_masse, reservations_a_facturer
+from .idempotence import _empreinte, _portee, delai_traitement, idempotent
+from .kpi import BUDGET_REQUETES, PERIODES, calculer_kpis
+from .occupation import JOURS_MAX, calculer_occupation
+from .pace import calculer_pace
+from .paie import calculer_paie, generer_fiches_paie
+from . import pdf_factures
+from .models import (
+    ChargeComptable, Chambre, ChambreImage, Client, Facture, FichePaie, IdempotencyKey, Notification, Reservation, RoomNight,
+    UserProfile,
+)
+from .series import serie_financiere
+from .snapshots import revenu_du_mois, revenu_reconnu
+from .throttling import limiter_debit
+from .utils import check_chambre_disponibilite, rechercher_fenetres_libres
+
+
+# Cache propre aux tests (le cache du projet est partagé sur disque)
+CACHE_TESTS = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hotel-tests',
+    }
+}
+
+
+def creer_client(numero=0):
+    return Client.objects.create(
+        nom=f'Nom{numero}', prenom=f'Prenom{numero}', email=f'client{numero}@exemple.fr',
+        telephone='0600000000', numero_piece_identite=f'ID{numero}',
+        adresse='1 rue du Port', ville='Nice', pays='France',
+    )
+
+
+def creer_chambre(numero='101', prix=Decimal('80.00'), capacite=2):
+    return Chambre.objects.create(
+        numero=numero, type_chambre='double', prix_par_nuit=prix, capacite=capacite
+    )
+
+
+def creer_reservation(client, chambre, date_entree, date_sortie, statut='confirmee'):
+    return Reservation.objects.create(
+        client=client, chambre=chambre, date_entree=date_entree, date_sortie=date_sortie,
+        nombre_personnes=1, statut=statut,
+    )
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class DisponibiliteTests(TestCase):
+    """Index de disponibilité en mémoire (user-001)"""
+
+    def setUp(self):
+        self.client_hotel = creer_client()
+        self.chambre = creer_chambre()
+        self.admin = User.objects.create_superuser('admin', 'admin@exemple.fr', 'admin123')
+        self.entree = timezone.now().date() + timedelta(days=10)
+
+    def reserver(self, statut='confirmee'):
+        return Reservation.objects.create(
+            client=self.client_hotel, chambre=self.chambre, date_entree=self.entree,
+            date_sortie=self.entree + timedelta(days=3), nombre_personnes=1,
+            statut=statut, cree_par=self.admin,
+        )
+
+    def test_la_base_fait_foi_quand_l_index_est_en_retard(self):
+        reservation = self.reserver(statut='annulee')
+        index_disponibilite.reconstruire()
+        # queryset.update n'émet pas de signal : sans invalider_index(), l'index
+        # ne voit pas la réservation, comme un processus qui a manqué la modification
+        Reservation.objects.filter(pk=reservation.pk).update(statut='confirmee')
+        self.assertTrue(index_disponibilite.est_libre(
+            self.chambre.id, self.entree, self.entree + timedelta(days=1)
+        ))
+
+        disponible, _ = check_chambre_disponibilite(
+            self.chambre, self.entree, self.entree + timedelta(days=1)
+        )
+        self.assertFalse(disponible)
+
+    def test_version_partagee_par_la_base(self):
+        # Deux index, comme dans deux processus : chacun voit les réservations de l'autre
+        autre_processus = IndexDisponibilite()
+        autre_processus.reconstruire()
+        index_disponibilite.reconstruire()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reserver()
+        self.assertFalse(index_disponibilite.est_libre(self.chambre.id, self.entree, self.entree + timedelta(days=1)))
+        self.assertFalse(autre_processus.est_libre(self.chambre.id, self.entree, self.entree + timedelta(days=1)))
+
+    def test_chaque_modification_a_sa_version(self):
+        index_disponibilite.reconstruire()
+        version = index_disponibilite._version
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.reserver()
+            Reservation.objects.create(
+                client=self.client_hotel, chambre=creer_chambre('102'), date_entree=self.entree,
+                date_sortie=self.entree + timedelta(days=1), nombre_personnes=1, statut='confirmee',
+            )
+        # Deux incréments distincts, même si les mises à jour arrivent dans le désordre
+        self.assertEqual(_version_courante(), version + 2)
+        for callback in reversed(callbacks):
+            callback()
+        self.assertEqual(index_disponibilite.chambres_occupees(self.entree, self.entree + timedelta(days=1)),
+                         set(Chambre.objects.values_list('pk', flat=True)))
+
+    def test_cache_par_processus_refuse(self):
+        erreurs = verifier_cache_partage(None)
+        self.assertEqual([erreur.id for erreur in erreurs], ['hotel.E001'])
+
+        with override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}
+        }):
+            self.assertEqual(verifier_cache_partage(None), [])
+
+
+class MatriceDisponibiliteTests(TestCase):
+    """Matrice chambres × jours encodée en plages (user-002)"""
+
+    def test_plages_par_chambre(self):
+        client_hotel = creer_client()
+        chambre_101, chambre_102 = creer_chambre('101'), creer_chambre('102')
+        debut = date(2030, 6, 1)
+
+        def jour(n):
+            return debut + timedelta(days=n)
+
+        creer_reservation(client_hotel, chambre_101, jour(1), jour(3))
+        # Une nuit confirmée prime sur une demande en attente qui la chevauche
+        creer_reservation(client_hotel, chambre_101, jour(2), jour(5), statut='en_attente')
+        creer_reservation(client_hotel, chambre_102, jour(-2), jour(1), statut='en_attente')
+        creer_reservation(client_hotel, chambre_102, jour(3), jour(4), statut='annulee')
+
+        with self.assertNumQueries(2):
+            matrice = construire_matrice_disponibilite(debut, 7)
+
+        self.assertEqual([(ligne['numero'], ligne['jours']) for ligne in matrice['chambres']],
+                         [('101', 'L1C2A2L2'), ('102', 'A1L6')])
+        self.assertEqual(matrice['libres_par_jour'], [1, 1, 1, 1, 1, 2, 2])
+        self.assertEqual(encoder_rle([]), '')
+
+
+class FenetresLibresTests(TestCase):
+    """Premières fenêtres libres d'une durée donnée (user-003)"""
+
+    def setUp(self):
+        client_hotel = creer_client()
+        self.debut = date(2030, 6, 1)
+        chambres = {numero: creer_chambre(numero) for numero in ('101', '102', '103', '104')}
+        Chambre.objects.filter(numero='103').update(statut='maintenance')
+        for numero, entree, sortie in (('101', 0, 2), ('101', 4, 6), ('102', 1, 9), ('104', 5, 7)):
+            creer_reservation(client_hotel, chambres[numero], self.jour(entree), self.jour(sortie))
+
+    def jour(self, n):
+        return self.debut + timedelta(days=n)
+
+    def fenetres(self, **filtres):
+        return [
+            (fenetre['chambre'].numero, fenetre['date_entree'], fenetre['libre_jusqu_au'])
+            for fenetre in rechercher_fenetres_libres(3, self.debut, self.jour(10), **filtres)
+        ]
+
+    def test_trous_tries_par_arrivee_puis_chambre(self):
+        # 101 : trou de 2 nuits trop court, puis libre du 6 au 10 ; 102 : aucun trou
+        # de 3 nuits ; 103 en maintenance ; 104 : libre du 0 au 5 et du 7 au 10
+        self.assertEqual(self.fenetres(), [
+            ('104', self.jour(0), self.jour(5)),
+            ('101', self.jour(6), self.jour(10)),
+            ('104', self.jour(7), self.jour(10)),
+        ])
+        self.assertEqual(self.fenetres(limite=2), self.fenetres()[:2])
+
+    def test_filtres_et_periode_trop_courte(self):
+        self.assertEqual(self.fenetres(type_chambre='suite'), [])
+        self.assertEqual(rechercher_fenetres_libres(3, self.debut, self.jour(2)), [])
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class RechercheEtReservationTests(TestCase):
+    """La recherche n'annonce que des chambres que reserver_chambre accepte (user-004)"""
+
+    def setUp(self):
+        cache.clear()
+        self.client_hotel = creer_client()
+        self.chambre = creer_chambre()
+        self.entree = timezone.now().date() + timedelta(days=10)
+        self.sortie = self.entree + timedelta(days=2)
+        reserver_chambre(self.client_hotel, self.chambre.id, self.entree, self.sortie, 1, statut='en_attente')
+        index_disponibilite.reconstruire()
+
+    def test_demande_en_attente_bloque_recherche_et_reservation(self):
+        reponse = self.client.get(reverse('check_disponibilite_api'), {
+            'chambre_id': self.chambre.id,
+            'date_entree': self.entree.isoformat(),
+            'date_sortie': self.sortie.isoformat(),
+        })
+        self.assertFalse(reponse.json()['disponible'])
+        self.assertEqual(len(reponse.json()['reservations_en_cours']), 1)
+
+        reponse = self.client.post(
+            reverse('chambres_disponibles_api'),
+            json.dumps({
+                'check_in': self.entree.strftime('%d/%m/%Y'),
+                'check_out': self.sortie.strftime('%d/%m/%Y'),
+            }),
+            content_type='application/json',
+        )
+        self.assertNotIn(self.chambre.id, [chambre['id'] for chambre in reponse.json()])
+
+        with self.assertRaises(ChambreIndisponible):
+            reserver_chambre(self.client_hotel, self.chambre.id, self.entree, self.sortie, 1)
+
+
+class NuiteesTests(TestCase):
+    """Table RoomNight maintenue depuis les réservations (user-005)"""
+
+    def setUp(self):
+        self.chambre = creer_chambre()
+        self.entree = date(2030, 6, 1)
+        self.reservation = creer_reservation(
+            creer_client(), self.chambre, self.entree, self.entree + timedelta(days=3), statut='en_attente'
+        )
+
+    def nuits(self):
+        return list(RoomNight.objects.filter(reservation=self.reservation).order_by('date').values_list('date', 'statut'))
+
+    def assertNuits(self, nuits, statut):
+        self.assertEqual(self.nuits(), [(self.entree + timedelta(days=i), statut) for i in range(nuits)])
+        total = RoomNight.objects.filter(reservation=self.reservation).aggregate(total=Sum('prix_nuit'))['total']
+        self.assertEqual(total, self.reservation.prix_total)
+
+    def test_nuits_reecrites_a_chaque_modification(self):
+        self.assertNuits(3, 'en_attente')
+
+        self.reservation.statut = 'confirmee'
+        self.reservation.save()
+        self.assertNuits(3, 'confirmee')
+
+        self.reservation.date_sortie += timedelta(days=1)
+        self.reservation.save()
+        self.assertNuits(4, 'confirmee')
+
+        self.reservation.statut = 'annulee'
+        self.reservation.save()
+        self.assertEqual(self.nuits(), [])
+
+    def test_suppression_en_cascade(self):
+        self.reservation.delete()
+        self.assertFalse(RoomNight.objects.exists())
+
+
+class RevenuReconnuTests(TestCase):
+    """Chiffre d'affaires reconnu nuit par nuit (user-019)"""
+
+    def test_sejour_a_cheval_sur_deux_mois(self):
+        client_hotel = creer_client()
+        chambre = creer_chambre(prix=Decimal('80.00'))
+        creer_reservation(client_hotel, chambre, date(2030, 1, 30), date(2030, 2, 2))
+        # Ni les demandes en attente ni les séjours annulés ne sont du chiffre d'affaires
+        creer_reservation(client_hotel, chambre, date(2030, 1, 10), date(2030, 1, 12), statut='en_attente')
+        creer_reservation(client_hotel, chambre, date(2030, 1, 20), date(2030, 1, 22), statut='annulee')
+
+        self.assertEqual(revenu_du_mois(date(2030, 1, 15)), Decimal('160.00'))
+        self.assertEqual(revenu_du_mois(date(2030, 2, 1)), Decimal('80.00'))
+        self.assertEqual(revenu_du_mois(date(2030, 3, 1)), Decimal('0.00'))
+
+    def test_reste_de_l_arrondi_sur_la_derniere_nuit(self):
+        reservation = Reservation(
+            pk=1, chambre=creer_chambre(), statut='confirmee', date_entree=date(2030, 1, 1),
+            date_sortie=date(2030, 1, 4), prix_total=Decimal('100.00'),
+        )
+        self.assertEqual([nuit.prix_nuit for nuit in RoomNight.nuits_de(reservation)],
+                         [Decimal('33.33'), Decimal('33.33'), Decimal('33.34')])
+
+
+class OptimisationAffectationTests(TestCase):
+    """Réaffectation des séjours futurs pour réduire les trous invendables (user-009)"""
+
+    def setUp(self):
+        self.client_hotel = creer_client()
+        self.debut = timezone.now().date() + timedelta(days=10)
+
+    def jour(self, n):
+        return self.debut + timedelta(days=n)
+
+    def test_trou_invendable_comble(self):
+        chambre_a, chambre_b = creer_chambre('101'), creer_chambre('102')
+        creer_reservation(self.client_hotel, chambre_a, self.jour(0), self.jour(3))
+        deplacee = creer_reservation(self.client_hotel, chambre_b, self.jour(3), self.jour(5))
+        creer_reservation(self.client_hotel, chambre_a, self.jour(5), self.jour(8))
+
+        plan, = optimiser_affectations(date_debut=self.debut, jours=30)
+        self.assertEqual([(d['reservation_id'], d['de'], d['vers']) for d in plan['deplacements']],
+                         [(deplacee.pk, '102', '101')])
+        self.assertEqual((plan['avant']['nuits_perdues'], plan['apres']['nuits_perdues']), (2, 0))
+        # Simulation : rien n'a changé
+        self.assertEqual(Reservation.objects.get(pk=deplacee.pk).chambre_id, chambre_b.pk)
+
+        optimiser_affectations(date_debut=self.debut, jours=30, appliquer=True)
+        self.assertEqual(Reservation.objects.get(pk=deplacee.pk).chambre_id, chambre_a.pk)
+        self.assertEqual(set(RoomNight.objects.filter(reservation=deplacee).values_list('chambre_id', flat=True)),
+                         {chambre_a.pk})
+
+    def test_affectation_compacte_inchangee(self):
+        chambre_a, chambre_b = creer_chambre('101'), creer_chambre('102')
+        creer_reservation(self.client_hotel, chambre_a, self.jour(0), self.jour(3))
+        creer_reservation(self.client_hotel, chambre_a, self.jour(3), self.jour(6))
+        creer_reservation(self.client_hotel, chambre_b, self.jour(0), self.jour(2))
+
+        plan, = optimiser_affectations(date_debut=self.debut, jours=30)
+        self.assertEqual(plan['deplacements'], [])
+        self.assertEqual(plan['apres'], plan['avant'])
+
+    def test_jamais_plus_fragmente(self):
+        hasard = random.Random(25)
+        chambres = [creer_chambre(f'10{i}') for i in range(4)]
+        for chambre in chambres:
+            jour = hasard.randint(0, 3)
+            while jour < 50:
+                duree = hasard.randint(1, 4)
+                creer_reservation(self.client_hotel, chambre, self.jour(jour), self.jour(jour + duree))
+                jour += duree + hasard.randint(0, 3)
+
+        plan, = optimiser_affectations(date_debut=self.debut, jours=60, appliquer=True)
+        self.assertTrue(plan['deplacements'])
+        self.assertLess(plan['apres']['nuits_perdues'], plan['avant']['nuits_perdues'])
+
+        # Le plan appliqué est celui mesuré, sans double réservation
+        relu, = optimiser_affectations(date_debut=self.debut, jours=60)
+        self.assertEqual(relu['avant'], plan['apres'])
+        nuits = RoomNight.objects.values_list('chambre_id', 'date')
+        self.assertEqual(len(set(nuits)), nuits.count())
+
+
+class IdempotenceTests(TestCase):
+    """Reprise d'une clé d'idempotence abandonnée en cours de traitement (user-007)"""
+
+    def setUp(self):
+        self.appels = 0
+
+        @idempotent
+        def vue(request):
+            self.appels += 1
+            return JsonResponse({'reservation': self.appels}, status=201)
+
+        self.vue = vue
+
+    def requete(self):
+        request = RequestFactory().post(
+            '/api/creer-reservation/', data='{"chambre_id": 1}',
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-1',
+        )
+        request.user = AnonymousUser()
+        return request
+
+    def cle_en_cours(self, depuis):
+        request = self.requete()
+        enregistrement = IdempotencyKey.objects.create(
+            portee=_portee(request), cle='cle-1', empreinte=_empreinte(request),
+            date_expiration=timezone.now() + timedelta(days=1),
+        )
+        IdempotencyKey.objects.filter(pk=enregistrement.pk).update(date_creation=timezone.now() - depuis)
+
+    def test_cle_en_cours_recente_repond_409(self):
+        self.cle_en_cours(timedelta(seconds=1))
+        self.assertEqual(self.vue(self.requete()).status_code, 409)
+        self.assertEqual(self.appels, 0)
+
+    def test_cle_abandonnee_est_reprise(self):
+        self.cle_en_cours(delai_traitement() + timedelta(seconds=1))
+        self.assertEqual(self.vue(self.requete()).status_code, 201)
+        self.assertEqual(self.appels, 1)
+
+        # La réponse est enregistrée puis rejouée
+        response = self.vue(self.requete())
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.appels, 1)
+
+
+@override_settings(CACHES=CACHE_TESTS, API_RATE_LIMITS={'disponibilite': (3, 6)})
+class LimitationDebitTests(TestCase):
+    """Limitation de débit partagée par tous les processus (user-010)"""
+
+    def setUp(self):
+        cache.clear()
+        self.vue = limiter_debit('disponibilite')(lambda request: JsonResponse({}))
+        self.factory = RequestFactory()
+
+    def appeler(self, ip='10.0.0.1'):
+        request = self.factory.get('/', REMOTE_ADDR=ip)
+        request.user = AnonymousUser()
+        return self.vue(request)
+
+    def test_limite_par_client_et_par_fenetre(self):
+        # 3 requêtes par fenêtre de 30 s (6 par minute)
+        with mock.patch('hotel.throttling.time.time', return_value=3000.0):
+            self.assertEqual([self.appeler().status_code for _ in range(4)], [200, 200, 200, 429])
+            self.assertEqual(self.appeler().get('Retry-After'), '30')
+            self.assertEqual(self.appeler('10.0.0.2').status_code, 200)
+        with mock.patch('hotel.throttling.time.time', return_value=3030.0):
+            self.assertEqual(self.appeler().status_code, 200)
+
+    def test_compteurs_dans_le_cache_partage(self):
+        with mock.patch('hotel.throttling.time.time', return_value=3000.0):
+            for _ in range(3):
+                self.appeler()
+            # Vu par tout processus qui partage le cache
+            self.assertEqual(cache.get('hotel:debit:disponibilite:ip:10.0.0.1:100'), 3)
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class CacheHttpTests(TestCase):
+    """ETag / Last-Modified des API de disponibilité (user-010)"""
+
+    def setUp(self):
+        cache.clear()
+        self.chambre = creer_chambre()
+
+    def test_modification_d_image_change_l_etag(self):
+        url = reverse('chambres_disponibles_api')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        avant = derniere_modification()
+        with self.captureOnCommitCallbacks(execute=True):
+            ChambreImage.objects.create(chambre=self.chambre, image='chambres/101.jpg')
+        self.assertGreater(derniere_modification(), avant)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES=CACHE_TESTS)
+@override_settings(CACHES=CACHE_TESTS)
+class CatalogueTests(TestCase):
+    """Fragments de catalogue des chambres en cache (user-006)"""
+
+    def setUp(self):
+        cache.clear()
+        self.chambres = [creer_chambre(f'10{i}', prix=Decimal('80.00')) for i in range(3)]
+        self.ids = [chambre.pk for chambre in reversed(self.chambres)]
+
+    def test_fragments_en_cache_dans_l_ordre_demande(self):
+        # Chambres puis images préchargées : deux requêtes pour toutes les chambres
+        with self.assertNumQueries(2):
+            fragments = fragments_chambres(self.ids)
+        self.assertEqual([fragment['id'] for fragment in fragments], self.ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(fragments_chambres(self.ids), fragments)
+
+    def test_invalidation_apres_le_commit(self):
+        fragments_chambres(self.ids)
+        chambre = self.chambres[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            chambre.prix_par_nuit = Decimal('95.00')
+            chambre.save()
+            # Pas encore validé : le fragment en cache reste celui de l'ancienne ligne
+            self.assertEqual(fragments_chambres([chambre.pk])[0]['prix_par_nuit'], 80.0)
+        self.assertEqual(fragments_chambres([chambre.pk])[0]['prix_par_nuit'], 95.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ChambreImage.objects.create(chambre=chambre, image='chambres/101.jpg')
+        self.assertEqual(fragments_chambres([chambre.pk])[0]['images'], ['chambres/101.jpg'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            chambre.delete()
+        self.assertEqual([fragment['id'] for fragment in fragments_chambres(self.ids)], self.ids[:-1])
+
+
+class BudgetRequetesKpiTests(TestCase):
+    """Les KPIs du rapport tiennent dans leur budget de requêtes (user-012)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        aujourd_hui = timezone.now().date()
+        chambres = [creer_chambre(numero=str(100 + i)) for i in range(4)]
+        clients = [creer_client(i) for i in range(3)]
+        for i, statut in enumerate(('en_attente', 'confirmee', 'en_cours', 'terminee', 'annulee')):
+            Reservation.objects.create(
+                client=clients[i % 3], chambre=chambres[i % 4],
+                date_entree=aujourd_hui - timedelta(days=i), date_sortie=aujourd_hui + timedelta(days=2),
+                nombre_personnes=1, statut=statut,
+            )
+        User.objects.create_user('employe', is_staff=True)
+
+    def test_budget_respecte_pour_chaque_periode(self):
+        for period in PERIODES:
+            with self.subTest(period=period), self.assertNumQueries(BUDGET_REQUETES):
+                kpis = calculer_kpis(period)
+            self.assertEqual(kpis['performance_commerciale']['total_reservations']['total'], 5)
+            self.assertEqual(kpis['performance_commerciale']['total_reservations']['annulee'], 1)
+            self.assertEqual(kpis['performance_operationnelle']['total_clients'], 3)
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class RapportsTests(TestCase):
+    """Plage historique du rapport de performance (user-013)"""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_superuser('admin', 'admin@exemple.fr', 'admin123')
+        self.client.login(username='admin', password='admin123')
+
+    def test_plage_trop_longue_refusee(self):
+        debut = timezone.localdate().replace(day=1)
+        reponse = self.client.get(reverse('reports'), {
+            'debut': debut.isoformat(),
+            'fin': (debut + timedelta(days=JOURS_MAX)).isoformat(),
+        })
+        self.assertEqual(reponse.status_code, 400)
+
+        reponse = self.client.get(reverse('reports'), {
+            'debut': debut.isoformat(),
+            'fin': (debut + timedelta(days=30)).isoformat(),
+        })
+        self.assertEqual(reponse.status_code, 200)
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class StatistiquesPosteTests(TestCase):
+    """Registre des statistiques du dashboard employé (user-014)"""
+
+    NOMS = ['reservations_today', 'arrivals_today', 'departures_today', 'pending_checkins',
+            'rooms_available', 'occupancy_rate', 'inconnue']
+
+    def setUp(self):
+        cache.clear()
+        self.today = date(2030, 6, 10)
+        client_hotel = creer_client()
+        chambres = [creer_chambre(f'10{i}') for i in range(4)]
+        Chambre.objects.filter(pk=chambres[0].pk).update(statut='occupee')
+        creer_reservation(client_hotel, chambres[0], self.today, self.today + timedelta(days=2))
+        creer_reservation(client_hotel, chambres[1], self.today, self.today + timedelta(days=1), statut='en_attente')
+        creer_reservation(client_hotel, chambres[2], self.today - timedelta(days=3), self.today)
+
+    def test_une_requete_par_modele(self):
+        with self.assertNumQueries(2):
+            stats = calculer_stats(self.NOMS, self.today)
+        self.assertEqual(stats, {
+            'reservations_today': 2, 'arrivals_today': 2, 'departures_today': 1, 'pending_checkins': 1,
+            'rooms_available': 3, 'occupancy_rate': 25.0, 'inconnue': 0,
+        })
+
+    def test_cache_partage_par_poste(self):
+        config = [{'name': nom} for nom in self.NOMS]
+        premier = stats_poste('receptionniste', config)
+        with self.assertNumQueries(0):
+            self.assertEqual(stats_poste('receptionniste', config), premier)
+
+
+class SerieFinanciereTests(TestCase):
+    """Séries revenus / dépenses / salaires par période (user-015)"""
+
+    def setUp(self):
+        creer_reservation(creer_client(), creer_chambre(prix=Decimal('80.00')), date(2030, 1, 14), date(2030, 1, 15))
+        Facture.objects.update(date_emission=timezone.make_aware(datetime(2030, 1, 14, 12)))
+        ChargeComptable.objects.create(
+            libelle='Linge', type_charge='maintenance', montant_ht=Decimal('50.00'),
+            date_facture=date(2030, 2, 3), date_echeance=date(2030, 3, 3),
+        )
+        FichePaie.objects.create(
+            employe=User.objects.create_user('employe'), mois=date(2030, 2, 1),
+            **calculer_paie(Decimal('2000.00'))._asdict()
+        )
+
+    def test_une_requete_par_table_et_periodes_vides_a_zero(self):
+        with self.assertNumQueries(3):
+            serie = serie_financiere(date(2030, 1, 1), date(2030, 3, 31))
+        self.assertEqual(serie['periodes'], ['2030-01-01', '2030-02-01', '2030-03-01'])
+        self.assertEqual(serie['revenus'], [Decimal('80.00'), 0, 0])
+        self.assertEqual(serie['depenses'], [0, Decimal('60.00'), 0])
+        self.assertEqual(serie['salaires'], [0, Decimal('1260.00'), 0])
+        self.assertEqual(serie['benefice'], [Decimal('80.00'), Decimal('-1320.00'), 0])
+
+    def test_semaines_commencant_le_lundi(self):
+        serie = serie_financiere(date(2030, 1, 10), date(2030, 1, 20), 'week')
+        self.assertEqual(serie['periodes'], ['2030-01-07', '2030-01-14'])
+        self.assertEqual(serie['revenus'], [0, Decimal('80.00')])
+
+    def test_parametres_invalides(self):
+        with self.assertRaises(ValueError):
+            serie_financiere(date(2030, 1, 1), date(2030, 3, 31), 'year')
+        with self.assertRaises(ValueError):
+            serie_financiere(date(2000, 1, 1), date(2030, 1, 1), 'day')
+
+
+@override_settings(CACHES=CACHE_TESTS, DASHBOARD_CACHE_SOFT_TTL=60, DASHBOARD_CACHE_HARD_TTL=900)
+class CacheDashboardTests(TestCase):
+    """Cache stale-while-revalidate des tableaux de bord (user-020)"""
+
+    def setUp(self):
+        cache.clear()
+        self.calculs = 0
+        self.threads = []
+        self.liberer = threading.Event()
+        demarrer = threading.Thread.start
+
+        def suivre(thread):
+            self.threads.append(thread)
+            demarrer(thread)
+
+        patch = mock.patch.object(threading.Thread, 'start', suivre)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def calculer(self):
+        if threading.current_thread() in self.threads:
+            # Recalcul en arrière-plan retenu jusqu'à ce que le test le libère
+            self.liberer.wait(5)
+        self.calculs += 1
+        return {'version': self.calculs}
+
+    def lire(self):
+        return contexte_dashboard('test', ('admin', 'month'), self.calculer)[0]['version']
+
+    def vieillir(self, secondes):
+        cle = CLE_CACHE_DASHBOARD.format(nom='test', variante='admin:month')
+        entree = cache.get(cle)
+        entree['calcule_le'] -= timedelta(seconds=secondes)
+        cache.set(cle, entree)
+
+    def test_frais_servi_sans_recalcul(self):
+        self.assertEqual(self.lire(), 1)
+        self.assertEqual(self.lire(), 1)
+        self.assertEqual((self.calculs, self.threads), (1, []))
+
+    def test_perime_servi_puis_recalcule_en_arriere_plan(self):
+        self.lire()
+        self.vieillir(120)
+        # L'ancienne version est servie tout de suite, un seul recalcul est lancé
+        self.assertEqual(self.lire(), 1)
+        self.assertEqual(self.lire(), 1)
+        self.assertEqual(len(self.threads), 1)
+        self.liberer.set()
+        self.threads[0].join()
+        self.assertEqual(self.lire(), 2)
+
+    def test_trop_vieux_recalcule_pendant_la_requete(self):
+        self.lire()
+        self.vieillir(1000)
+        self.assertEqual(self.lire(), 2)
+        self.assertEqual(self.threads, [])
+
+    def test_periode_inconnue_ramenee_au_mois(self):
+        User.objects.create_superuser('admin', 'admin@exemple.fr', 'admin123')
+        self.client.login(username='admin', password='admin123')
+        with mock.patch('hotel.views_billing.contexte_dashboard', side_effect=RuntimeError) as contexte:
+            with self.assertRaises(RuntimeError):
+                self.client.get(reverse('billing_list'), {'period': 'zzz'})
+        self.assertEqual(contexte.call_args.args[1][1], 'month')
+
+
+class CompteursTests(TestCase):
+    """Compteurs dénormalisés des dashboards (user-016)"""
+
+    def setUp(self):
+        self.clients = [creer_client(i) for i in range(3)]
+        self.chambre = creer_chambre()
+        self.entree = timezone.now().date() + timedelta(days=5)
+
+    def reserver(self, client):
+        return Reservation.objects.create(
+            client=client, chambre=self.chambre, date_entree=self.entree,
+            date_sortie=self.entree + timedelta(days=1), nombre_personnes=1, statut='confirmee',
+        )
+
+    def test_dimension_vide_calculee_une_seule_fois(self):
+        self.assertEqual(lire_compteur('reservation.client', self.clients[0].pk), 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(lire_compteur('reservation.client', self.clients[0].pk), 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(lire_compteurs('reservation.client'), {'reservation.client': {}})
+
+    def test_variations_appliquees_apres_validation(self):
+        lire_compteurs('reservation.statut', 'reservation.client')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reserver(self.clients[0])
+            # Rien n'est écrit dans les compteurs pendant la transaction de réservation
+            self.assertEqual(lire_compteurs('reservation.statut')['reservation.statut']['confirmee'], 0)
+        self.assertEqual(lire_compteurs('reservation.statut')['reservation.statut']['confirmee'], 1)
+        self.assertEqual(lire_compteur('reservation.client', self.clients[0].pk), 1)
+        self.assertEqual(lire_compteur('reservation.client', self.clients[1].pk), 0)
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class ReservationGroupeTests(TestCase):
+    """Réservations de groupe en tout ou rien (user-008)"""
+
+    def setUp(self):
+        self.client_hotel = creer_client()
+        self.chambres = [creer_chambre(f'20{i}') for i in range(3)]
+        self.entree = timezone.now().date() + timedelta(days=5)
+        self.sortie = self.entree + timedelta(days=2)
+        User.objects.create_superuser('admin', 'admin@exemple.fr', 'admin123')
+
+    def etat(self):
+        return (
+            Reservation.objects.count(), RoomNight.objects.count(), Facture.objects.count(),
+            Notification.objects.count(),
+            lire_compteurs('reservation.statut', 'reservation.client', 'chambre.statut', 'notification'),
+        )
+
+    def test_groupe_trop_grand_ne_cree_rien(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reserver_chambre(self.client_hotel, self.chambres[0].pk, self.entree, self.sortie, 1, statut='confirmee')
+        avant = self.etat()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ChambreIndisponible):
+                reserver_groupe(self.client_hotel, 'double', 3, self.entree, self.sortie, statut='confirmee')
+        self.assertEqual(self.etat(), avant)
+
+    def test_groupe_relance_si_la_base_est_verrouillee(self):
+        creer_groupe = booking._creer_groupe_verrouille
+        appels = []
+
+        def verrouillee_une_fois(*args):
+            appels.append(args)
+            if len(appels) == 1:
+                raise OperationalError('database is locked')
+            return creer_groupe(*args)
+
+        with mock.patch.object(booking, '_creer_groupe_verrouille', verrouillee_une_fois), \
+                mock.patch.object(booking, 'PAUSE_TENTATIVE', 0):
+            reservations = reserver_groupe(self.client_hotel, 'double', 3, self.entree, self.sortie, statut='confirmee')
+        self.assertEqual(len(appels), 2)
+        self.assertEqual(len(reservations), 3)
+        self.assertEqual(Facture.objects.filter(reservation__in=reservations).count(), 3)
+        self.assertEqual(RoomNight.objects.filter(reservation__in=reservations).count(), 6)
+
+
+class GrilleCalendrierTests(TestCase):
+    """Grille chambres × jours du calendrier (user-011)"""
+
+    def test_segments_du_mois(self):
+        client_hotel = creer_client()
+        chambre_101, chambre_102 = creer_chambre('101'), creer_chambre('102')
+        a_cheval = creer_reservation(client_hotel, chambre_101, date(2030, 1, 30), date(2030, 2, 3))
+        milieu = creer_reservation(client_hotel, chambre_101, date(2030, 2, 10), date(2030, 2, 12))
+        creer_reservation(client_hotel, chambre_101, date(2030, 2, 20), date(2030, 2, 22), statut='annulee')
+        fin_de_mois = creer_reservation(client_hotel, chambre_102, date(2030, 2, 27), date(2030, 3, 2))
+
+        reservations = filtrer_reservations(reservations_visibles(User(is_staff=True)))
+        with self.assertNumQueries(2):
+            grille = construire_grille_calendrier(reservations, date(2030, 2, 14))
+
+        self.assertEqual((grille['precedent'], grille['mois'], grille['suivant']), ('2030-01', '2030-02', '2030-03'))
+        self.assertEqual(len(grille['jours']), 28)
+        segments = {
+            ligne['numero']: [(segment['jours'], segment.get('reservation', {}).get('id')) for segment in ligne['segments']]
+            for ligne in grille['lignes']
+        }
+        self.assertEqual(segments, {
+            '101': [(2, a_cheval.pk), (7, None), (2, milieu.pk), (17, None)],
+            '102': [(26, None), (2, fin_de_mois.pk)],
+        })
+
+    def test_mois_invalide(self):
+        self.assertEqual(parser_mois('2030-13', date(2031, 5, 20)), date(2031, 5, 1))
+        self.assertEqual(parser_mois('2030-02-14', date(2031, 5, 20)), date(2030, 2, 1))
+
+
+class OccupationTests(TestCase):
+    """Occupation, ADR et RevPAR sur les nuits comprises dans la période (user-017)"""
+
+    def test_sejours_decoupes_a_la_periode(self):
+        client_hotel = creer_client()
+        chambre = creer_chambre('101', prix=Decimal('80.00'))
+        creer_chambre('102')
+        creer_reservation(client_hotel, chambre, date(2030, 5, 30), date(2030, 6, 2))
+        creer_reservation(client_hotel, chambre, date(2030, 6, 4), date(2030, 6, 8))
+        creer_reservation(client_hotel, chambre, date(2030, 6, 2), date(2030, 6, 4), statut='en_attente')
+
+        occupation = calculer_occupation(date(2030, 6, 1), date(2030, 6, 5))
+        self.assertEqual(occupation['nuits_vendues'], [1, 0, 0, 1])
+        self.assertEqual(occupation['taux_occupation'], [50.0, 0, 0, 50.0])
+        self.assertEqual(occupation['totaux'], {
+            'jours': 4, 'nuits_vendues': 2, 'nuits_disponibles': 8, 'chiffre_affaires': Decimal('160.00'),
+            'taux_occupation': 25.0, 'adr': Decimal('80.00'), 'revpar': Decimal('20.00'),
+        })
+        # Même découpage que les nuitées enregistrées
+        self.assertEqual(occupation['totaux']['chiffre_affaires'], revenu_reconnu(date(2030, 6, 1), date(2030, 6, 5)))
+
+
+class PaceTests(TestCase):
+    """Rapport de pace / pickup (user-018)"""
+
+    def test_annulations_retirees_du_portefeuille(self):
+        client_hotel = creer_client()
+        chambre = creer_chambre()
+        aujourd_hui = timezone.localdate()
+        entree = aujourd_hui + timedelta(days=10)
+        reservations = [
+            Reservation.objects.create(
+                client=client_hotel, chambre=chambre, date_entree=entree,
+                date_sortie=entree + timedelta(days=2), nombre_personnes=1, statut=statut,
+            )
+            for statut in ('confirmee', 'annulee', 'confirmee')
+        ]
+        # Annulation écrite sans passer par save() : pas de date d'annulation
+        Reservation.objects.filter(pk=reservations[2].pk).update(statut='annulee')
+
+        pace = calculer_pace(entree, entree + timedelta(days=2), ecarts=(7,), aujourd_hui=aujourd_hui)
+        self.assertEqual(pace['on_the_books'][0], [1, 1])
+        self.assertEqual(pace['on_the_books'][7], [0, 0])
+
+
+def reessayer(operation):
+    """Exécute une requête en réessayant tant que SQLite en mémoire signale un verrou de table"""
+    for tentative in range(50):
+        try:
+            return operation()
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            time.sleep(0.01 * (tentative + 1))
+    raise AssertionError('Base toujours verrouillée')
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class NumerotationConcurrenteTests(TransactionTestCase):
+    """Numéros de factures et de fiches de paie uniques et sans trou sous concurrence (user-021)"""
+
+    THREADS = 8
+    DEMANDES = 40
+
+    def enregistrer_en_parallele(self, enregistrements):
+        """Exécute les enregistrements depuis plusieurs threads (une connexion chacun)"""
+        def executer(enregistrement):
+            try:
+                enregistrement()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as executeur:
+            list(executeur.map(executer, enregistrements))
+
+    def assertNumerotationContinue(self, numeros, prefixe):
+        suffixes = sorted(int(numero[len(prefixe):]) for numero in numeros)
+        self.assertEqual(suffixes, list(range(1, len(numeros) + 1)))
+
+    def test_factures(self):
+        client_hotel = creer_client()
+        chambre = creer_chambre()
+        entree = timezone.now().date() + timedelta(days=1)
+        reservations = [
+            Reservation.objects.create(
+                client=client_hotel, chambre=chambre, date_entree=entree + timedelta(days=i),
+                date_sortie=entree + timedelta(days=i + 1), nombre_personnes=1,
+            )
+            for i in range(self.DEMANDES)
+        ]
+
+        def facturer(reservation):
+            # Un numéro alloué est conservé sur l'objet si l'INSERT doit être réessayé
+            facture = Facture(reservation=reservation, client=client_hotel, montant_ht=Decimal('100.00'))
+            return lambda: reessayer(facture.save)
+
+        self.enregistrer_en_parallele([facturer(reservation) for reservation in reservations])
+
+        numeros = list(Facture.objects.values_list('numero_facture', flat=True))
+        self.assertEqual(len(numeros), self.DEMANDES)
+        self.assertNumerotationContinue(numeros, f'F{timezone.localdate():%Y%m%d}')
+
+    def test_fiches_de_paie_une_par_une_et_par_blocs(self):
+        mois = date(2099, 1, 1)
+        employes = [User.objects.create_user(f'employe{i}') for i in range(self.DEMANDES * 3)]
+
+        def fiche(employe, numero=''):
+            return FichePaie(
+                employe=employe, mois=mois, numero_fiche=numero,
+                salaire_brut=Decimal('2000.00'), salaire_net=Decimal('1260.00'),
+            )
+
+        def une(employe):
+            return lambda: reessayer(fiche(employe).save)
+
+        def bloc(employes_bloc):
+            def enregistrer():
+                numeros = reessayer(lambda: FichePaie.prochains_numeros(len(employes_bloc), mois))
+                reessayer(lambda: FichePaie.objects.bulk_create([
+                    fiche(employe, numero) for employe, numero in zip(employes_bloc, numeros)
+                ]))
+            return enregistrer
+
+        enregistrements = [une(employe) for employe in employes[:self.DEMANDES]]
+        restants = employes[self.DEMANDES:]
+        enregistrements += [bloc(restants[i:i + 4]) for i in range(0, len(restants), 4)]
+        self.enregistrer_en_parallele(enregistrements)
+
+        numeros = list(FichePaie.objects.filter(mois=mois).values_list('numero_fiche', flat=True))
+        self.assertEqual(len(numeros), len(employes))
+        self.assertNumerotationContinue(numeros, 'FP209901')
+
+
+class FacturationEnMasseTests(TestCase):
+    """Facturation en masse par lots avec reprise (user-024)"""
+
+    def setUp(self):
+        client_hotel = creer_client()
+        chambre = creer_chambre()
+        entree = date(2030, 6, 1)
+        reservations = [
+            creer_reservation(client_hotel, chambre, entree + timedelta(days=i), entree + timedelta(days=i + 1),
+                              statut='en_attente')
+            for i in range(5)
+        ]
+        # Sans signal : aucune facture créée à la confirmation
+        self.ids = [reservation.pk for reservation in reservations]
+        Reservation.objects.filter(pk__in=self.ids).update(statut='confirmee')
+
+    def test_reprise_apres_le_dernier_lot_valide(self):
+        class Interruption(Exception):
+            pass
+
+        lots = []
+
+        def interrompre(bilan):
+            lots.append(dict(bilan))
+            raise Interruption
+
+        with self.assertRaises(Interruption):
+            facturer_en_masse(reservations_a_facturer(), taille_lot=2, progression=interrompre)
+        self.assertEqual(lots[0]['dernier_id'], self.ids[1])
+        self.assertEqual(Facture.objects.count(), 2)
+
+        bilan = facturer_en_masse(reservations_a_facturer(), taille_lot=2, apres_id=lots[0]['dernier_id'])
+        self.assertEqual((bilan['total'], bilan['creees'], bilan['dernier_id']), (3, 3, self.ids[-1]))
+        self.assertEqual(bilan['montant_ttc'], Decimal('240.00'))
+        self.assertFalse(reservations_a_facturer().exists())
+
+        numeros = dict(Facture.objects.values_list('reservation_id', 'numero_facture'))
+        prefixe = f'F{timezone.localdate():%Y%m%d}'
+        self.assertEqual([numeros[pk] for pk in self.ids], [f'{prefixe}{i:04d}' for i in range(1, 6)])
+
+    def test_reprise_ignore_les_reservations_deja_passees(self):
+        bilan = facturer_en_masse(reservations_a_facturer(), apres_id=self.ids[2])
+        self.assertEqual(bilan['creees'], 2)
+        self.assertEqual(sorted(Facture.objects.values_list('reservation_id', flat=True)), self.ids[3:])
+
+
+class ExportComptableTests(TestCase):
+    """Filtres de l'export CSV comptable (user-022)"""
+
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@exemple.fr', 'admin123')
+        self.client.login(username='admin', password='admin123')
+
+    def test_statut_inconnu_refuse(self):
+        self.assertEqual(self.client.get(reverse('billing_export'), {'status': 'zzz'}).status_code, 400)
+        # 'paye' n'existe que pour les fiches de paie
+        reponse = self.client.get(reverse('billing_export'), {'status': 'paye', 'type': 'facture'})
+        self.assertEqual(reponse.status_code, 400)
+
+    def test_statut_d_un_des_types_accepte(self):
+        reponse = self.client.get(reverse('billing_export'), {'status': 'paye', 'type': 'facture,salaire'})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(b''.join(reponse.streaming_content).decode('utf-8-sig').startswith('Type'))
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class ArchiveFacturesTests(TestCase):
+    """Archive ZIP mensuelle des factures en PDF (user-023)"""
+
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@exemple.fr', 'admin123')
+        self.client.login(username='admin', password='admin123')
+        client_hotel = creer_client()
+        chambre = creer_chambre()
+        entree = timezone.now().date() + timedelta(days=1)
+        for i in range(3):
+            Reservation.objects.create(
+                client=client_hotel, chambre=chambre, date_entree=entree + timedelta(days=i),
+                date_sortie=entree + timedelta(days=i + 1), nombre_personnes=1, statut='confirmee',
+            )
+        self.factures = list(Facture.objects.order_by('numero_facture'))
+        self.en_echec = self.factures[1]
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.enterContext(override_settings(INVOICE_PDF_CACHE_DIR=dossier.name))
+
+    def rendre(self, html, base_url):
+        if self.en_echec.numero_facture in html:
+            raise RuntimeError('rendu impossible')
+        return b'%PDF-1.4 test'
+
+    def test_une_facture_en_echec_n_interrompt_pas_l_archive(self):
+        # Un pool de threads remplace le pool de processus (le rendu factice n'est pas importable par spawn)
+        executeur = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(executeur.shutdown)
+        with mock.patch('hotel.views_billing.PDF_DISPONIBLE', True), \
+                mock.patch.object(pdf_factures, '_pool_rendu', return_value=executeur), \
+                mock.patch.object(pdf_factures, '_html_vers_pdf', self.rendre), \
+                self.assertLogs('hotel.pdf_factures', level='ERROR'):
+            reponse = self.client.get(reverse('billing_invoices_zip'), {'mois': timezone.now().strftime('%Y-%m')})
+            contenu = b''.join(reponse.streaming_content)
+
+        archive = zipfile.ZipFile(io.BytesIO(contenu))
+        self.assertIsNone(archive.testzip())
+        attendus = {f'Facture_{facture.numero_facture}.pdf' for facture in self.factures if facture != self.en_echec}
+        self.assertEqual(set(archive.namelist()), attendus | {'ERREURS.txt'})
+        self.assertIn(self.en_echec.numero_facture, archive.read('ERREURS.txt').decode('utf-8'))
+
+    def test_gabarit_pdf_sans_date_du_jour(self):
+        facture = Facture.objects.select_related('reservation__client', 'reservation__chambre').first()
+        # La date du jour n'est pas dans l'empreinte : elle ne doit pas figurer dans le PDF en cache
+        self.assertNotIn(timezone.localdate().isoformat(), pdf_factures.html_facture(facture))
+
+
+class GenerationPaieTests(TestCase):
+    """Rattrapage de la paie sur plusieurs mois (user-025)"""
+
+    def setUp(self):
+        self.ancien = User.objects.create_user('ancien', is_staff=True)
+        UserProfile.objects.create(user=self.ancien, salaire=Decimal('2000.00'), date_embauche=date(2010, 3, 1))
+        self.nouveau = User.objects.create_user('nouveau', is_staff=True)
+        UserProfile.objects.create(user=self.nouveau, salaire=Decimal('2500.00'), date_embauche=date(2015, 1, 20))
+        # Fiches du mois courant créées à l'enregistrement des profils
+        FichePaie.objects.all().delete()
+
+    def test_aucune_fiche_avant_l_embauche(self):
+        mois = [date(2014, 12, 1), date(2015, 1, 1), date(2015, 2, 1)]
+        bilans = generer_fiches_paie(mois)
+        self.assertEqual(bilans[date(2014, 12, 1)]['non_embauches'], ['nouveau'])
+        # Embauché en cours de mois : payé pour ce mois
+        self.assertEqual(bilans[date(2015, 1, 1)]['non_embauches'], [])
+        self.assertEqual(
+            sorted(FichePaie.objects.filter(employe=self.nouveau).values_list('mois', flat=True)),
+            [date(2015, 1, 1), date(2015, 2, 1)],
+        )
+        self.assertEqual(FichePaie.objects.filter(employe=self.ancien).count(), 3)
+
+    def test_fiche_du_mois_a_la_creation_du_profil(self):
+        mois = timezone.now().date().replace(day=1)
+        embauche = User.objects.create_user('embauche', is_staff=True)
+        UserProfile.objects.create(user=embauche, salaire=Decimal('2000.00'), date_embauche=mois)
+        fiche = FichePaie.objects.get(employe=embauche)
+        self.assertEqual((fiche.mois, fiche.salaire_net), (mois, Decimal('1260.00')))
+        self.assertTrue(fiche.numero_fiche.startswith(f'FP{mois:%Y%m}'))
+
+        # Embauché le mois prochain : rien pour le mois en cours
+        futur = User.objects.create_user('futur', is_staff=True)
+        UserProfile.objects.create(
+            user=futur, salaire=Decimal('2000.00'), date_embauche=(mois + timedelta(days=31)).replace(day=1)
+        )
+        self.assertFalse(FichePaie.objects.filter(employe=futur).exists())
+
+    def test_rattrapage_signale_les_mois_ignores(self):
+        sortie = io.StringIO()
+        call_command('generate_payroll', '--depuis', '2014-11', '--mois', '2015-01', stdout=sortie)
+        self.assertIn('2 couple(s) employé/mois ignoré(s)', sortie.getvalue())
+        self.assertEqual(FichePaie.objects.count(), 4)
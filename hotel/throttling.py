@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Limitation de débit des API publiques
+Compteur par client (utilisateur connecté ou adresse IP) et par fenêtre de
+temps, stocké dans le cache Django partagé : la limite vaut pour l'ensemble
+des processus du serveur, pas pour chacun. Une portée configurée à
+(capacité, requêtes par minute) accepte `capacité` requêtes par fenêtre de
+capacité / débit minutes, soit le même débit moyen.
+Un client qui dépasse la limite reçoit une réponse 429 avec l'en-tête Retry-After.
+
+L'incrément est atomique avec Redis ou Memcached ; avec FileBasedCache (lecture
+puis écriture), des requêtes simultanées peuvent dépasser un peu la limite.
+"""
+
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from .utils import get_adresse_ip
+
+
+# Débits par défaut : portée -> (requêtes par fenêtre, requêtes par minute)
+# Surchargeables avec le réglage API_RATE_LIMITS
+DEBITS_PAR_DEFAUT = {
+    'disponibilite': (30, 60),
+    'reservation': (10, 20),
+}
+
+CLE_COMPTEUR = 'hotel:debit:{portee}:{client}:{fenetre}'
+
+
+def _debit(portee):
+    debits = {**DEBITS_PAR_DEFAUT, **getattr(settings, 'API_RATE_LIMITS', {})}
+    return debits[portee]
+
+
+def consommer(portee, client):
+    """
+    Compte une requête du client dans la fenêtre en cours
+
+    Returns:
+        float: 0 si la requête est acceptée, sinon le nombre de secondes avant la fenêtre suivante
+    """
+    capacite, par_minute = _debit(portee)
+    duree_fenetre = capacite * 60.0 / par_minute
+    maintenant = time.time()
+    fenetre = int(maintenant // duree_fenetre)
+    cle = CLE_COMPTEUR.format(portee=portee, client=client, fenetre=fenetre)
+
+    # Le compteur expire avec sa fenêtre : aucun nettoyage nécessaire
+    expiration = math.ceil(duree_fenetre) + 1
+    cache.add(cle, 0, expiration)
+    try:
+        nombre = cache.incr(cle)
+    except ValueError:
+        # Expiré entre add() et incr()
+        cache.add(cle, 1, expiration)
+        nombre = 1
+    if nombre > capacite:
+        return (fenetre + 1) * duree_fenetre - maintenant
+    return 0
+
+
+def limiter_debit(portee):
+    """
+    Décorateur limitant le nombre de requêtes par client sur une API
+    Usage : @limiter_debit('disponibilite')
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                client = f'user:{request.user.pk}'
+            else:
+                client = f'ip:{get_adresse_ip(request)}'
+
+            attente = consommer(portee, client)
+            if attente:
+                response = JsonResponse(
+                    {'error': 'Trop de requêtes, veuillez réessayer plus tard'},
+                    status=429
+                )
+                response['Retry-After'] = str(max(1, math.ceil(attente)))
+                return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -8,6 +8,7 @@ from django.urls import path
 from . import views
 from . import views_billing
 from . import views_inventory
+from . import views_availability
 
 urlpatterns = [
     # Authentification
@@ -37,8 +38,13 @@ urlpatterns = [
     path('api/check-disponibilite/', views.check_disponibilite_api, name='check_disponibilite_api'),
     # API pour réservation
     path('api/creer-reservation/', views.creer_reservation_api, name='creer_reservation_api'),
+    path('api/creer-reservation-groupe/', views.creer_reservation_groupe_api, name='creer_reservation_groupe_api'),
     # API pour chambres disponibles
     path('api/chambres-disponibles/', views.chambres_disponibles_api, name='chambres_disponibles_api'),
+    # API matrice de disponibilité (planning chambres × jours)
+    path('api/disponibilites/matrice/', views_availability.matrice_disponibilite_api, name='matrice_disponibilite_api'),
+    # API recherche de dates flexibles
+    path('api/disponibilites/fenetres/', views_availability.fenetres_disponibles_api, name='fenetres_disponibles_api'),
     
     # Gestion des clients
     path('clients/', views.client_list, name='client_list'),
@@ -79,6 +85,7 @@ urlpatterns = [
     path('billing/', views_billing.billing_dashboard, name='billing_list'),
     path('billing/invoice/<int:invoice_id>/', views_billing.invoice_detail, name='billing_invoice'),
     path('billing/invoice/<int:invoice_id>/pdf/', views_billing.invoice_pdf, name='billing_invoice_pdf'),
+    path('billing/invoices/zip/', views_billing.invoices_zip, name='billing_invoices_zip'),
     path('billing/payslip/<int:payslip_id>/', views_billing.payslip_detail, name='billing_payslip'),
     path('billing/charge/<int:charge_id>/', views_billing.charge_detail, name='billing_charge'),
     path('billing/mark-paid/', views_billing.mark_as_paid, name='billing_mark_paid'),
@@ -86,6 +93,7 @@ urlpatterns = [
     path('billing/generate-report/', views_billing.generate_monthly_report, name='billing_generate_report'),
     path('billing/create-payslip/', views_billing.create_payslip, name='billing_create_payslip'),
     path('billing/api/stats/', views_billing.dashboard_stats_api, name='billing_stats_api'),
+    path('billing/api/series/', views_billing.series_financieres_api, name='billing_series_api'),
     path('billing/create-inventory-charge/', views_billing.create_inventory_charge, name='billing_create_inventory_charge'),
     
     # Anciennes URLs (compatibilité)
@@ -95,6 +103,8 @@ urlpatterns = [
     
     # Autres pages de gestion
     path('calendar/', views.calendar_view, name='calendar'),
+    path('api/calendrier/mois/', views.calendrier_mois_api, name='calendrier_mois_api'),
+    path('api/clients/autocomplete/', views.clients_autocomplete_api, name='clients_autocomplete_api'),
     
     # Gestion de l'inventaire (nouvelles vues améliorées)
     path('inventory/', views_inventory.InventoryListView.as_view(), name='inventory_list'),
@@ -117,6 +127,10 @@ urlpatterns = [
     path('maintenance/<int:pk>/edit/', views.maintenance_edit, name='maintenance_edit'),
     path('maintenance/<int:pk>/complete/', views.maintenance_complete, name='maintenance_complete'),
     path('reports/', views.reports_view, name='reports'),
+    path('reports/api/kpi/', views.kpi_api, name='kpi_api'),
+    path('reports/api/occupation/', views.occupation_api, name='occupation_api'),
+    path('reports/pace/', views.pace_report, name='pace_report'),
+    path('reports/api/pace/', views.pace_api, name='pace_api'),
     
     # Administration des messages de contact
     path('management/messages/', views.admin_messages_contact, name='admin_messages_contact'),
@@ -53,6 +53,16 @@ def get_user_display_role(user):
     return roles_display.get(role, 'Utilisateur')
 
 
+def get_adresse_ip(request):
+    """
+    Retourne l'adresse IP du client de la requête
+    
+    Returns:
+        str: adresse IP (chaîne vide si inconnue)
+    """
+    return request.META.get('REMOTE_ADDR', '')
+
+
 # ============================================
 # UTILITAIRES POUR LA DISPONIBILITÉ DES CHAMBRES
 # ============================================
@@ -84,7 +94,8 @@ def check_chambre_disponibilite(chambre, date_debut, date_fin):
     if date_debut < timezone.now().date():
         return (False, "La date de début ne peut pas être dans le passé.")
     
-    # Vérifier les réservations existantes qui se chevauchent
+    # Vérifier les réservations existantes qui se chevauchent (la base fait foi :
+    # l'index en mémoire peut être en retard sur un autre processus)
     reservations_conflits = Reservation.objects.filter(
         chambre=chambre,
         statut__in=['confirmee', 'en_cours', 'en_attente']
@@ -114,7 +125,8 @@ def get_chambres_disponibles(date_debut, date_fin, type_chambre=None, prix_max=N
     Returns:
         QuerySet: Chambres disponibles
     """
-    from .models import Chambre, Reservation
+    from .models import Chambre
+    from .availability import index_disponibilite
     
     # Commencer avec toutes les chambres non en maintenance
     chambres = Chambre.objects.exclude(statut='maintenance')
@@ -127,14 +139,8 @@ def get_chambres_disponibles(date_debut, date_fin, type_chambre=None, prix_max=N
     if prix_max:
         chambres = chambres.filter(prix_par_nuit__lte=prix_max)
     
-    # Exclure les chambres avec des réservations qui se chevauchent
-    chambres_indisponibles = Reservation.objects.filter(
-        statut__in=['confirmee', 'en_cours', 'en_attente']
-    ).exclude(
-        date_sortie__lte=date_debut
-    ).exclude(
-        date_entree__gte=date_fin
-    ).values_list('chambre_id', flat=True).distinct()
+    # Exclure les chambres avec des réservations qui se chevauchent (via l'index en mémoire)
+    chambres_indisponibles = index_disponibilite.chambres_occupees(date_debut, date_fin)
     
     chambres = chambres.exclude(id__in=chambres_indisponibles)
     
@@ -152,28 +158,23 @@ def get_statut_reel_chambre(chambre):
         str: 'libre', 'occupee' ou 'maintenance'
     """
     from django.utils import timezone
-    from .models import Reservation
+    from .models import RoomNight
+    from .availability import STATUTS_CONFIRMES
     
     # Si la chambre est en maintenance, c'est son statut réel
     if chambre.statut == 'maintenance':
         return 'maintenance'
     
-    # Vérifier s'il y a des réservations actives aujourd'hui
+    # Vérifier si la nuit de ce soir est vendue (recherche d'égalité sur les nuitées)
     aujourd_hui = timezone.now().date()
     
-    reservations_actives = Reservation.objects.filter(
+    nuit_vendue = RoomNight.objects.filter(
         chambre=chambre,
-        statut__in=['confirmee', 'en_cours'],
-        date_entree__lte=aujourd_hui,
-        date_sortie__gt=aujourd_hui
-    )
+        date=aujourd_hui,
+        statut__in=STATUTS_CONFIRMES
+    ).exists()
     
-    # Si des réservations actives existent, la chambre est occupée
-    if reservations_actives.exists():
-        return 'occupee'
-    
-    # Sinon, la chambre est libre
-    return 'libre'
+    return 'occupee' if nuit_vendue else 'libre'
 
 
 def get_chambres_avec_statut_reel():
@@ -183,13 +184,18 @@ def get_chambres_avec_statut_reel():
     Returns:
         list: Liste de dictionnaires avec les informations de chambre et statut réel
     """
+    from django.utils import timezone
     from .models import Chambre
     
     chambres = Chambre.objects.all().order_by('type_chambre', 'numero')
+    occupees = get_chambres_occupees_le(timezone.now().date())
     
     chambres_info = []
     for chambre in chambres:
-        statut_reel = get_statut_reel_chambre(chambre)
+        if chambre.statut == 'maintenance':
+            statut_reel = 'maintenance'
+        else:
+            statut_reel = 'occupee' if chambre.id in occupees else 'libre'
         
         chambres_info.append({
             'chambre': chambre,
@@ -199,3 +205,121 @@ def get_chambres_avec_statut_reel():
         })
     
     return chambres_info
+
+
+def get_chambres_occupees_le(jour, statuts=None):
+    """
+    Retourne l'ensemble des IDs de chambres occupées la nuit du jour donné
+    
+    Args:
+        jour: Date de la nuit
+        statuts: Optionnel, statuts de réservation pris en compte (défaut : confirmée et en cours)
+    
+    Returns:
+        set: IDs des chambres
+    """
+    from .models import RoomNight
+    from .availability import STATUTS_CONFIRMES
+    
+    return set(RoomNight.objects.filter(
+        date=jour,
+        statut__in=statuts or STATUTS_CONFIRMES
+    ).values_list('chambre_id', flat=True))
+
+
+def get_nuits_vendues_par_jour(date_debut, date_fin, statuts=None):
+    """
+    Compte les nuits vendues pour chaque jour de la période [date_debut, date_fin[
+    
+    Args:
+        date_debut: Premier jour
+        date_fin: Jour suivant le dernier jour
+        statuts: Optionnel, statuts de réservation pris en compte (défaut : confirmée et en cours)
+    
+    Returns:
+        dict: {date: nombre de nuits vendues}, jours sans vente inclus (0)
+    """
+    from datetime import timedelta
+    from django.db.models import Count
+    from .models import RoomNight
+    from .availability import STATUTS_CONFIRMES
+    
+    ventes = dict(RoomNight.objects.filter(
+        date__gte=date_debut,
+        date__lt=date_fin,
+        statut__in=statuts or STATUTS_CONFIRMES
+    ).values('date').annotate(nuits=Count('id')).values_list('date', 'nuits'))
+    
+    return {
+        date_debut + timedelta(days=i): ventes.get(date_debut + timedelta(days=i), 0)
+        for i in range((date_fin - date_debut).days)
+    }
+
+
+def rechercher_fenetres_libres(duree, date_debut, date_fin, type_chambre=None, capacite=None, limite=5):
+    """
+    Recherche les premières fenêtres libres de `duree` nuits dans une période
+    
+    Une seule requête charge les réservations de la période, triées par chambre
+    et par date d'arrivée ; les trous entre séjours sont ensuite trouvés en un
+    seul passage par chambre (aucune requête par date candidate).
+    
+    Args:
+        duree: Nombre de nuits souhaitées
+        date_debut: Première date d'arrivée possible
+        date_fin: Dernière date de départ possible
+        type_chambre: Optionnel, filtrer par type ('simple', 'double', 'suite')
+        capacite: Optionnel, capacité minimale
+        limite: Nombre maximum de fenêtres retournées
+    
+    Returns:
+        list: Dictionnaires {'chambre', 'date_entree', 'date_sortie', 'libre_jusqu_au'}
+              triés par date d'arrivée puis numéro de chambre
+    """
+    import heapq
+    from datetime import timedelta
+    from .models import Chambre, Reservation
+    from .availability import STATUTS_BLOQUANTS
+    
+    if duree < 1 or date_debut + timedelta(days=duree) > date_fin:
+        return []
+    
+    chambres = Chambre.objects.exclude(statut='maintenance')
+    if type_chambre:
+        chambres = chambres.filter(type_chambre=type_chambre)
+    if capacite:
+        chambres = chambres.filter(capacite__gte=capacite)
+    chambres = {chambre.id: chambre for chambre in chambres}
+    
+    # Séjours de la période, triés pour le balayage
+    sejours = {}
+    reservations = Reservation.objects.filter(
+        chambre_id__in=chambres.keys(),
+        statut__in=STATUTS_BLOQUANTS,
+        date_entree__lt=date_fin,
+        date_sortie__gt=date_debut
+    ).order_by('chambre_id', 'date_entree').values_list('chambre_id', 'date_entree', 'date_sortie')
+    for chambre_id, date_entree, date_sortie in reservations:
+        sejours.setdefault(chambre_id, []).append((date_entree, date_sortie))
+    
+    def fenetres():
+        for chambre_id, chambre in chambres.items():
+            curseur = date_debut
+            # Le séjour fictif final ferme le dernier trou à date_fin
+            for date_entree, date_sortie in sejours.get(chambre_id, []) + [(date_fin, date_fin)]:
+                fin_trou = min(date_entree, date_fin)
+                if (fin_trou - curseur).days >= duree:
+                    yield (curseur, chambre.numero, chambre, fin_trou)
+                curseur = max(curseur, date_sortie)
+                if curseur >= date_fin:
+                    break
+    
+    return [
+        {
+            'chambre': chambre,
+            'date_entree': debut,
+            'date_sortie': debut + timedelta(days=duree),
+            'libre_jusqu_au': fin_trou,
+        }
+        for debut, _numero, chambre, fin_trou in heapq.nsmallest(limite, fenetres(), key=lambda f: (f[0], f[1]))
+    ]
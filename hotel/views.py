@@ -11,11 +11,31 @@ from django.contrib import messages
 from django.core.paginator import Paginator
 from django.utils import timezone
 from django.db.models import Q, Count, Sum
-from django.http import JsonResponse
+from django.http import HttpResponseBadRequest, JsonResponse
 from datetime import datetime, date, timedelta
+from decimal import Decimal
+import json
 
 from .models import Client, Chambre, Reservation, UserProfile, ChambreImage
 from .permissions import get_user_permissions
+from .availability import STATUTS_BLOQUANTS, index_disponibilite
+from .booking import reserver_chambre, reserver_groupe, ChambreIndisponible
+from .catalogue import fragments_chambres
+from .idempotence import idempotent
+from .allocation import proposer_reaffectation
+from .http_cache import disponibilite_conditionnelle
+from .throttling import limiter_debit
+from .kpi import PERIODES, bornes_periode, calculer_kpis
+from .cache_dashboard import contexte_dashboard
+from .occupation import JOURS_MAX, calculer_occupation, occupation_en_json
+from . import pace
+from .dashboard_stats import stats_poste
+from .compteurs import lire_compteur, lire_compteurs, reconcilier, total
+from .snapshots import graphique_comparaison, rapport_periode, revenu_du_mois, revenu_reconnu
+from .calendrier import (
+    construire_grille_calendrier, filtrer_reservations, reservations_visibles,
+    parser_mois, rechercher_clients
+)
 # ============================================
 # API Chambres Disponibles
 # ============================================
@@ -24,6 +44,8 @@ from django.views.decorators.http import require_http_methods
 
 @require_http_methods(["GET", "POST"])
 @csrf_exempt
+@limiter_debit('disponibilite')
+@disponibilite_conditionnelle
 def chambres_disponibles_api(request):
     """
     Retourne la liste des chambres disponibles selon les critères de recherche (POST) ou toutes les chambres disponibles (GET)
@@ -45,39 +67,18 @@ def chambres_disponibles_api(request):
                 chambres_query = chambres_query.filter(type_chambre=room_type)
             total_persons = adults + children
             chambres_query = chambres_query.filter(capacite__gte=total_persons)
-            chambres_reservees = Reservation.objects.filter(
-                statut__in=['confirmee', 'en_cours']
-            ).filter(
-                Q(date_entree__lte=check_out, date_sortie__gte=check_in)
-            ).values_list('chambre_id', flat=True)
+            # Mêmes statuts bloquants que reserver_chambre (demandes en attente comprises)
+            chambres_reservees = index_disponibilite.chambres_occupees(check_in, check_out)
             chambres_disponibles = chambres_query.exclude(id__in=chambres_reservees)
         else:
             # GET: retourne toutes les chambres libres et non réservées aujourd'hui
             today = timezone.now().date()
             chambres_libres = Chambre.objects.filter(statut='libre')
-            chambres_reservees = Reservation.objects.filter(
-                date_sortie__gte=today,
-                statut__in=['confirmee', 'en_cours']
-            ).values_list('chambre_id', flat=True)
+            chambres_reservees = index_disponibilite.chambres_occupees(today, today + timedelta(days=1))
             chambres_disponibles = chambres_libres.exclude(id__in=chambres_reservees)
 
-        data = []
-        for chambre in chambres_disponibles:
-            try:
-                images = list(chambre.images.values_list('image', flat=True))
-                data.append({
-                    'id': chambre.id,
-                    'numero': chambre.numero,
-                    'type_chambre': chambre.get_type_chambre_display(),
-                    'prix_par_nuit': float(chambre.prix_par_nuit),
-                    'capacite': chambre.capacite,
-                    'description': chambre.description or '',
-                    'equipements': chambre.get_equipements(),
-                    'images': images,
-                })
-            except Exception as e:
-                print(f'Erreur chambre {chambre.id}: {e}')
-                continue
+        # Fragments statiques en cache : seule la liste des IDs libres est calculée
+        data = fragments_chambres(chambres_disponibles.values_list('id', flat=True))
         return JsonResponse(data, safe=False)
     except Exception as e:
         import traceback
@@ -90,6 +91,8 @@ def chambres_disponibles_api(request):
 # ============================================
 @require_http_methods(["POST"])
 @csrf_exempt
+@limiter_debit('reservation')
+@idempotent
 def creer_reservation_api(request):
     """
     Crée une réservation réelle dans la base de données
@@ -135,36 +138,26 @@ def creer_reservation_api(request):
         except Chambre.DoesNotExist:
             return JsonResponse({'error': 'Chambre non disponible'}, status=400)
         
-        # Vérifier à nouveau la disponibilité (double check)
-        existing_reservation = Reservation.objects.filter(
-            chambre=chambre,
-            statut__in=['confirmee', 'en_cours']
-        ).filter(
-            Q(date_entree__lte=check_out, date_sortie__gte=check_in)
-        ).exists()
-        
-        if existing_reservation:
-            return JsonResponse({'error': 'Chambre plus disponible pour ces dates'}, status=400)
-        
         # Calculer le nombre de nuits et le prix total
-        from datetime import timedelta
         nombre_nuits = (check_out - check_in).days
         if nombre_nuits <= 0:
             return JsonResponse({'error': 'Dates invalides'}, status=400)
         
         prix_total = float(chambre.prix_par_nuit) * nombre_nuits
         
-        # Créer la réservation
-        reservation = Reservation.objects.create(
-            client=client,
-            chambre=chambre,
-            date_entree=check_in,
-            date_sortie=check_out,
-            nombre_nuits=nombre_nuits,
-            prix_total=prix_total,
-            nombre_personnes=adults + children,  # Ajout du champ manquant
-            statut='en_attente'
-        )
+        # Créer la réservation (disponibilité revérifiée sous verrou de la chambre)
+        try:
+            reservation = reserver_chambre(
+                client,
+                chambre.id,
+                check_in,
+                check_out,
+                nombre_personnes=adults + children,
+                statut='en_attente',
+                cree_par=request.user
+            )
+        except ChambreIndisponible:
+            return JsonResponse({'error': 'Chambre plus disponible pour ces dates'}, status=400)
         
         return JsonResponse({
             'success': True,
@@ -183,6 +176,91 @@ def creer_reservation_api(request):
         print('Erreur API creer_reservation:', str(e))
         print(traceback.format_exc())
         return JsonResponse({'error': f"{str(e)} (voir logs serveur)"}, status=400)
+
+
+# ============================================
+# API Réservation de groupe (plusieurs chambres)
+# ============================================
+GROUPE_CHAMBRES_MAX = 50
+
+@require_http_methods(["POST"])
+@csrf_exempt
+@limiter_debit('reservation')
+@idempotent
+def creer_reservation_groupe_api(request):
+    """
+    Réserve plusieurs chambres d'un même type pour un même séjour (tout ou rien)
+    Corps JSON : type_chambre, nombre_chambres, check_in, check_out (JJ/MM/AAAA),
+    personnes_par_chambre, remarques ; pour le personnel : client_id et statut
+    """
+    import json
+    
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Utilisateur non authentifié'}, status=401)
+    
+    try:
+        data = json.loads(request.body)
+        type_chambre = data.get('type_chambre')
+        nombre_chambres = int(data.get('nombre_chambres', 0))
+        personnes_par_chambre = int(data.get('personnes_par_chambre', 1))
+        check_in = datetime.strptime(data.get('check_in', ''), '%d/%m/%Y').date()
+        check_out = datetime.strptime(data.get('check_out', ''), '%d/%m/%Y').date()
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Paramètres invalides'}, status=400)
+    
+    if type_chambre not in dict(Chambre.TYPE_CHOICES):
+        return JsonResponse({'error': 'Type de chambre invalide'}, status=400)
+    if not 1 <= nombre_chambres <= GROUPE_CHAMBRES_MAX:
+        return JsonResponse({'error': f'Le nombre de chambres doit être compris entre 1 et {GROUPE_CHAMBRES_MAX}'}, status=400)
+    if check_in < timezone.now().date() or check_out <= check_in:
+        return JsonResponse({'error': 'Dates invalides'}, status=400)
+    
+    # Le personnel réserve pour un client ; un client réserve pour lui-même
+    if request.user.is_staff or request.user.is_superuser:
+        client = Client.objects.filter(pk=data.get('client_id')).first()
+        statut = data.get('statut', 'en_attente')
+    else:
+        profile = getattr(request.user, 'profile', None)
+        client = getattr(profile, 'client', None) or Client.objects.filter(email=request.user.email).first()
+        statut = 'en_attente'
+    if client is None:
+        return JsonResponse({'error': 'Aucun profil client trouvé'}, status=400)
+    
+    try:
+        reservations = reserver_groupe(
+            client,
+            type_chambre,
+            nombre_chambres,
+            check_in,
+            check_out,
+            personnes_par_chambre=personnes_par_chambre,
+            statut=statut,
+            remarques=data.get('remarques', ''),
+            cree_par=request.user
+        )
+    except ChambreIndisponible as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    total = sum(reservation.prix_total for reservation in reservations)
+    return JsonResponse({
+        'success': True,
+        'statut': statut,
+        'nuits': (check_out - check_in).days,
+        'total': float(total),
+        'reservations': [
+            {
+                'reservation_id': reservation.id,
+                'chambre_id': reservation.chambre.id,
+                'numero': reservation.chambre.numero,
+                'capacite': reservation.chambre.capacite,
+                'prix_total': float(reservation.prix_total),
+                'facture': reservation.facture.numero_facture if statut == 'confirmee' else None,
+            }
+            for reservation in reservations
+        ],
+    })
 from .decorators import admin_required, employe_required, client_required, role_required
 from .utils import get_user_role, get_dashboard_url_for_role
 from .forms import ClientSignUpForm
@@ -295,81 +373,74 @@ def calendar_view(request):
     - Admin/Employé : voit toutes les réservations
     - Client : voit uniquement ses réservations
     Les filtres sont passés en GET : date, chambre, client, statut, search
+    La grille chambres × jours du mois est calculée côté serveur (hotel/calendrier.py) ;
+    les mois voisins sont chargés par calendrier_mois_api.
     """
-    user = request.user
     today = timezone.now().date()
 
     # GET filters
     date_filter = request.GET.get('date') or today.isoformat()
-    chambre_filter = request.GET.get('chambre')
-    client_filter = request.GET.get('client')
-    statut_filter = request.GET.get('statut')
+    chambre_filter = request.GET.get('chambre', '').strip()
+    client_filter = request.GET.get('client', '').strip()
+    statut_filter = request.GET.get('statut', '')
     search = request.GET.get('search', '').strip()
 
-    # Base queryset selon droits
-    if user.is_superuser or user.is_staff:
-        reservations = Reservation.objects.all()
-    else:
-        # client lié via champ `client` with une relation vers User (client.user)
-        reservations = Reservation.objects.filter(client__user=user)
-
-    # Apply simple filters
-    try:
-        if date_filter:
-            dt = datetime.strptime(date_filter, '%Y-%m-%d').date() if isinstance(date_filter, str) else date_filter
-            reservations = reservations.filter(date_entree__lte=dt, date_sortie__gte=dt)
-    except Exception:
-        # ignore invalid date
-        pass
-
-    if chambre_filter:
-        reservations = reservations.filter(chambre__numero__icontains=chambre_filter)
-
-    if client_filter:
-        reservations = reservations.filter(Q(client__nom__icontains=client_filter) | Q(client__prenom__icontains=client_filter))
-
-    if statut_filter:
-        reservations = reservations.filter(statut__iexact=statut_filter)
-
-    if search:
-        reservations = reservations.filter(
-            Q(client__nom__icontains=search) | Q(client__prenom__icontains=search) | Q(chambre__numero__icontains=search)
-        )
-
-    # Prepare month range for calendar display (start -> end of month)
+    # La date ne sert qu'à choisir le mois affiché
     try:
         view_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-    except Exception:
+    except ValueError:
         view_date = today
 
-    start_month = view_date.replace(day=1)
-    # end of month: move to next month's first day then -1 day
-    next_month = (start_month + timedelta(days=32)).replace(day=1)
-    end_month = next_month - timedelta(days=1)
-    days_in_month = []
-    cur = start_month
-    while cur <= end_month:
-        days_in_month.append(cur)
-        cur = cur + timedelta(days=1)
-
-    chambres = Chambre.objects.all().order_by('numero')
-    clients = Client.objects.all().order_by('nom')
+    reservations = filtrer_reservations(
+        reservations_visibles(request.user),
+        chambre=chambre_filter,
+        client=client_filter,
+        statut=statut_filter,
+        search=search,
+    )
+    grille = construire_grille_calendrier(reservations, view_date, chambre=chambre_filter)
 
     context = {
-        'reservations': reservations.order_by('date_entree'),
-        'days_in_month': days_in_month,
-        'chambres': chambres,
-        'clients': clients,
+        'grille': grille,
+        'days_in_month': [date.fromisoformat(jour) for jour in grille['jours']],
+        'statuts': Reservation.STATUT_CHOICES,
         'today': today,
         'date_filter': view_date.isoformat(),
-        'chambre_filter': chambre_filter or '',
-        'client_filter': client_filter or '',
-        'statut_filter': statut_filter or '',
+        'chambre_filter': chambre_filter,
+        'client_filter': client_filter,
+        'statut_filter': statut_filter,
         'search': search,
     }
     return render(request, 'hotel/calendar.html', context)
 
 
+@login_required
+def calendrier_mois_api(request):
+    """
+    Grille du calendrier d'un mois en JSON (chargement des mois voisins)
+    Paramètres GET : mois (AAAA-MM), chambre, client, statut, search
+    """
+    mois = parser_mois(request.GET.get('mois'), timezone.now().date())
+    chambre_filter = request.GET.get('chambre', '').strip()
+    reservations = filtrer_reservations(
+        reservations_visibles(request.user),
+        chambre=chambre_filter,
+        client=request.GET.get('client', '').strip(),
+        statut=request.GET.get('statut', ''),
+        search=request.GET.get('search', '').strip(),
+    )
+    return JsonResponse(construire_grille_calendrier(reservations, mois, chambre=chambre_filter))
+
+
+@role_required('admin', 'employe')
+def clients_autocomplete_api(request):
+    """
+    Autocomplétion des clients (nom, prénom ou email)
+    Paramètre GET : q (2 caractères minimum)
+    """
+    return JsonResponse({'clients': rechercher_clients(request.GET.get('q'))})
+
+
 @role_required('admin', 'employe')
 def billing_list(request):
     """List of invoices derived from reservations (simple billing list)"""
@@ -783,178 +854,63 @@ def maintenance_complete(request, pk):
     return redirect('maintenance_detail', pk=pk)
 
 
+def _contexte_rapport(period, is_admin, histo_debut, histo_fin):
+    """Contexte coûteux du tableau de bord de performance (mis en cache par reports_view)"""
+    # Tous les KPIs en une requête par table (voir hotel/kpi.py)
+    kpis = calculer_kpis(period, inclure_finances=is_admin)  # Finances limitées aux admins
+
+    # Historique lu dans les instantanés quotidiens (période libre via debut/fin, comparaison N-1)
+    today = timezone.localdate()
+    historique = rapport_periode(histo_debut, histo_fin)
+    annee = rapport_periode(today.replace(month=1, day=1), today)
+
+    return {
+        'period': kpis['period'],
+        'performance_commerciale': kpis['performance_commerciale'],
+        'performance_financiere': kpis['performance_financiere'],
+        'performance_operationnelle': kpis['performance_operationnelle'],
+        'period_start': kpis['period_start'],
+        'period_end': kpis['period_end'],
+        'historique': historique,
+        'graphique_ca': json.dumps(graphique_comparaison(annee, 'chiffre_affaires')),
+        'graphique_occupation': json.dumps(graphique_comparaison(annee, 'taux_occupation')),
+    }
+
+
 @role_required('admin', 'employe')
 def reports_view(request):
     """
     Tableau de bord de performance hôtel
     KPIs commerciaux, financiers et opérationnels
+    Le contexte est servi depuis le cache et recalculé en arrière-plan (voir hotel/cache_dashboard.py)
     """
-    from django.db.models import Sum, Count, Q, Avg, F
-    from django.utils import timezone
-    from datetime import datetime, timedelta
-    from decimal import Decimal
-    import calendar
-    
     try:
-        today = timezone.now().date()
-        current_month = today.replace(day=1)
-        last_month = (current_month - timedelta(days=1)).replace(day=1)
-        
-        # Filtres de période
-        period = request.GET.get('period', 'month')  # day, month, year
-        
-        # ============== PERFORMANCE COMMERCIALE ==============
-        
-        # Réservations totales
-        total_reservations = Reservation.objects.count()
-        
-        # Réservations par statut
-        reservations_stats = {
-            'total': total_reservations,
-            'confirmee': Reservation.objects.filter(statut='confirmee').count(),
-            'en_cours': Reservation.objects.filter(statut='en_cours').count(),
-            'terminee': Reservation.objects.filter(statut='terminee').count(),
-            'annulee': Reservation.objects.filter(statut='annulee').count(),
-        }
-        
-        # Taux d'occupation (période actuelle)
-        if period == 'month':
-            period_start = current_month
-            period_end = today
-        elif period == 'year':
-            period_start = today.replace(month=1, day=1)
-            period_end = today
-        else:  # day
-            period_start = today
-            period_end = today
-        
-        # Chambres occupées vs total
-        chambres_total = Chambre.objects.count()
-        chambres_occupees = Reservation.objects.filter(
-            statut__in=['confirmee', 'en_cours'],
-            date_entree__lte=period_end,
-            date_sortie__gte=period_start
-        ).values('chambre').distinct().count()
-        
-        taux_occupation = (chambres_occupees / chambres_total * 100) if chambres_total > 0 else 0
-        
-        # RevPAR (Revenue Per Available Room)
-        total_revenue_period = Reservation.objects.filter(
-            statut__in=['confirmee', 'en_cours', 'terminee'],
-            date_entree__lte=period_end,
-            date_sortie__gte=period_start
-        ).aggregate(total=Sum('prix_total'))['total'] or 0
-        
-        days_in_period = (period_end - period_start).days + 1
-        revpar = (total_revenue_period / (chambres_total * days_in_period)) if chambres_total > 0 and days_in_period > 0 else 0
-        
-        # ============== PERFORMANCE FINANCIÈRE ==============
-        
-        # Revenus réels (basés sur les paiements enregistrés dans les factures)
-        paiements_confirms = Facture.objects.filter(
-            statut='payee',
-            date_paiement__date__gte=period_start,
-            date_paiement__date__lte=period_end
-        ).aggregate(total=Sum('montant_ttc'))['total'] or 0
-        
-        # Revenus estimés (basés sur les réservations)
-        revenue_estimee = Reservation.objects.filter(
-            statut__in=['confirmee', 'en_cours', 'terminee'],
-            date_entree__lte=period_end,
-            date_sortie__gte=period_start
-        ).aggregate(total=Sum('prix_total'))['total'] or 0
-        
-        # Charges du mois (salaires + maintenance + autres)
-        from .models import FichePaie, ChargeComptable
-        
-        salaires_mois = FichePaie.objects.filter(
-            mois__year=today.year,
-            mois__month=today.month,
-            statut='paye'
-        ).aggregate(total=Sum('salaire_net'))['total'] or 0
-        
-        maintenance_mois = ChargeComptable.objects.filter(
-            type_charge='maintenance',
-            date_facture__year=today.year,
-            date_facture__month=today.month
-        ).aggregate(total=Sum('montant_ttc'))['total'] or 0
-        
-        autres_charges_mois = ChargeComptable.objects.filter(
-            type_charge__in=['inventaire', 'autre'],
-            date_facture__year=today.year,
-            date_facture__month=today.month
-        ).aggregate(total=Sum('montant_ttc'))['total'] or 0
-        
-        total_charges_mois = salaires_mois + maintenance_mois + autres_charges_mois
-        
-        # Bénéfice estimé
-        benefice_estime = revenue_estimee - total_charges_mois
-        
-        # ============== PERFORMANCE OPÉRATIONNELLE ==============
-        
-        # Clients
-        total_clients = Client.objects.count()
-        nouveaux_clients_mois = Client.objects.filter(
-            date_creation__year=today.year,
-            date_creation__month=today.month
-        ).count()
-        
-        # Maintenance
-        maintenance_stats = {
-            'total': Maintenance.objects.count(),
-            'en_attente': Maintenance.objects.filter(statut='en_attente').count(),
-            'en_cours': Maintenance.objects.filter(statut='en_cours').count(),
-            'terminee': Maintenance.objects.filter(statut='terminee').count(),
-            'cout_mois': maintenance_mois,
-        }
-        
-        # Employés
-        total_employes = User.objects.filter(is_staff=True, is_active=True).count()
-        
-        # ============== INDICATEURS CLÉS ==============
-        
-        # Performance commerciale
-        performance_commerciale = {
-            'total_reservations': reservations_stats,
-            'taux_occupation': round(taux_occupation, 1),
-            'revpar': round(revpar, 2),
-            'revenue_period': round(total_revenue_period, 2),
-            'chambres_total': chambres_total,
-            'chambres_occupees': chambres_occupees,
-        }
-        
-        # Performance financière
-        performance_financiere = {
-            'revenus_reels': round(paiements_confirms, 2),
-            'revenus_estimes': round(revenue_estimee, 2),
-            'charges_totales': round(total_charges_mois, 2),
-            'salaires': round(salaires_mois, 2),
-            'maintenance': round(maintenance_mois, 2),
-            'autres_charges': round(autres_charges_mois, 2),
-            'benefice_estime': round(benefice_estime, 2),
-        }
-        
-        # Performance opérationnelle
-        performance_operationnelle = {
-            'total_clients': total_clients,
-            'nouveaux_clients_mois': nouveaux_clients_mois,
-            'maintenance': maintenance_stats,
-            'total_employes': total_employes,
-        }
-        
         # Droits d'accès
         is_admin = request.user.is_superuser or request.user.is_staff
-        
-        context = {
-            'period': period,
-            'performance_commerciale': performance_commerciale,
-            'performance_financiere': performance_financiere if is_admin else None,  # Limité aux admins
-            'performance_operationnelle': performance_operationnelle,
-            'is_admin': is_admin,
-            'today': today,
-            'period_start': period_start,
-            'period_end': period_end,
-        }
+
+        today = timezone.localdate()
+        period = request.GET.get('period', 'month')  # day, month, year
+        if period not in PERIODES:
+            period = 'month'
+        period_start, period_end = bornes_periode(period, today)
+        try:
+            histo_debut = parse_date(request.GET.get('debut') or '') or period_start
+            histo_fin = parse_date(request.GET.get('fin') or '') or period_end
+        except ValueError:
+            histo_debut, histo_fin = period_start, period_end
+        if histo_debut > histo_fin:
+            histo_debut, histo_fin = histo_fin, histo_debut
+        # Les journées manquantes sont calculées jour par jour, et chaque plage a sa clé de cache
+        if (histo_fin - histo_debut).days + 1 > JOURS_MAX:
+            return HttpResponseBadRequest(f'Période trop longue (maximum {JOURS_MAX} jours)')
+
+        context, calcule_le = contexte_dashboard(
+            'rapports',
+            ('admin' if is_admin else 'employe', period, today, histo_debut, histo_fin),
+            lambda: _contexte_rapport(period, is_admin, histo_debut, histo_fin),
+            forcer=bool(request.GET.get('rafraichir')),
+        )
+        context = {**context, 'is_admin': is_admin, 'today': today, 'calcule_le': calcule_le}
     except Exception as e:
         import logging
         logging.getLogger(__name__).exception('Erreur lors du calcul des metrics pour reports_view')
@@ -975,6 +931,129 @@ def reports_view(request):
     return render(request, 'hotel/reports.html', context)
 
 
+@role_required('admin', 'employe')
+def kpi_api(request):
+    """
+    KPIs du rapport de performance en JSON
+    Paramètre GET : period (day, month, year). Les finances sont réservées aux admins.
+    """
+    is_admin = request.user.is_superuser or request.user.is_staff
+    kpis = calculer_kpis(request.GET.get('period', 'month'), inclure_finances=is_admin)
+    return JsonResponse(kpis, json_dumps_params={'default': _kpi_json})
+
+
+@role_required('admin', 'employe')
+def occupation_api(request):
+    """
+    Occupation jour par jour (nuits vendues, CA réparti par nuit, taux, ADR, RevPAR) en JSON
+    Paramètres GET : debut, fin (AAAA-MM-JJ, bornes incluses). Par défaut : le mois en cours.
+    """
+    today = timezone.localdate()
+    try:
+        debut = parse_date(request.GET['debut']) if request.GET.get('debut') else today.replace(day=1)
+        fin = parse_date(request.GET['fin']) if request.GET.get('fin') else today
+    except ValueError:
+        debut = fin = None
+    if debut is None or fin is None:
+        return JsonResponse({'error': 'Dates invalides (format AAAA-MM-JJ)'}, status=400)
+    if fin < debut:
+        return JsonResponse({'error': 'La date de fin doit suivre la date de début'}, status=400)
+    if (fin - debut).days + 1 > JOURS_MAX:
+        return JsonResponse({'error': f'Période trop longue (maximum {JOURS_MAX} jours)'}, status=400)
+
+    reponse = occupation_en_json(calculer_occupation(debut, fin + timedelta(days=1)))
+    reponse.update({'debut': debut.isoformat(), 'fin': fin.isoformat()})
+    return JsonResponse(reponse)
+
+
+def _parametres_pace(request):
+    """
+    Lit debut, fin (AAAA-MM-JJ, bornes incluses) et ecarts (ex. 7,14,30) du rapport de pace
+
+    Raises:
+        ValueError: paramètre invalide (message affichable)
+    """
+    today = timezone.localdate()
+    try:
+        debut = parse_date(request.GET['debut']) if request.GET.get('debut') else today
+        fin = (
+            parse_date(request.GET['fin']) if request.GET.get('fin')
+            else today + timedelta(days=pace.HORIZON_DEFAUT - 1)
+        )
+        ecarts = (
+            [int(ecart) for ecart in request.GET['ecarts'].split(',') if ecart.strip()]
+            if request.GET.get('ecarts') else list(pace.ECARTS_DEFAUT)
+        )
+    except ValueError:
+        debut = None
+    if debut is None or fin is None:
+        raise ValueError('Paramètres invalides (dates AAAA-MM-JJ, écarts en jours séparés par des virgules)')
+    if fin < debut:
+        raise ValueError('La date de fin doit suivre la date de début')
+    if (fin - debut).days + 1 > pace.JOURS_MAX:
+        raise ValueError(f'Période trop longue (maximum {pace.JOURS_MAX} jours)')
+    if any(ecart < 0 or ecart > pace.ECART_MAX for ecart in ecarts):
+        raise ValueError(f'Les écarts doivent être compris entre 0 et {pace.ECART_MAX} jours')
+    return debut, fin, ecarts
+
+
+@role_required('admin', 'employe')
+def pace_report(request):
+    """
+    Rapport de pace / pickup : nuits en portefeuille par date de séjour,
+    aujourd'hui et 7 / 14 / 30 jours plus tôt (écarts paramétrables)
+    """
+    try:
+        debut, fin, ecarts = _parametres_pace(request)
+    except ValueError as e:
+        messages.error(request, str(e))
+        debut = timezone.localdate()
+        fin = debut + timedelta(days=pace.HORIZON_DEFAUT - 1)
+        ecarts = list(pace.ECARTS_DEFAUT)
+
+    rapport = pace.calculer_pace(debut, fin + timedelta(days=1), ecarts)
+    context = {
+        'debut': debut,
+        'fin': fin,
+        'ecarts': rapport['ecarts'],
+        'ecarts_pickup': [ecart for ecart in rapport['ecarts'] if ecart],
+        'ecarts_saisis': ','.join(str(ecart) for ecart in rapport['ecarts'] if ecart),
+        'colonnes': 2 * len(rapport['ecarts']),
+        'lignes': pace.lignes_pace(rapport),
+        'totaux_on_the_books': [rapport['totaux']['on_the_books'][ecart] for ecart in rapport['ecarts']],
+        'totaux_pickup': [rapport['totaux']['pickup'][ecart] for ecart in rapport['ecarts'] if ecart],
+        'graphique': json.dumps(pace.pace_en_json(rapport)),
+    }
+    return render(request, 'hotel/pace.html', context)
+
+
+@role_required('admin', 'employe')
+def pace_api(request):
+    """
+    Rapport de pace / pickup en JSON
+    Paramètres GET : debut, fin (AAAA-MM-JJ), ecarts (ex. 7,14,30), matrice=1 pour la
+    matrice complète date de référence × date de séjour
+    """
+    try:
+        debut, fin, ecarts = _parametres_pace(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    rapport = pace.calculer_pace(debut, fin + timedelta(days=1), ecarts)
+    reponse = pace.pace_en_json(rapport, inclure_matrice=request.GET.get('matrice') == '1')
+    reponse.update({'debut': debut.isoformat(), 'fin': fin.isoformat()})
+    return JsonResponse(reponse)
+
+
+def _kpi_json(valeur):
+    """Sérialise les Decimal en nombres et les dates en ISO pour les graphiques"""
+    if isinstance(valeur, Decimal):
+        return float(valeur)
+    if isinstance(valeur, date):
+        return valeur.isoformat()
+    raise TypeError(f'{type(valeur).__name__} non sérialisable')
+
+
 @admin_required
 def create_employee(request):
     """Formulaire simple accessible uniquement aux admins pour créer un employé (is_staff=True)"""
@@ -1244,31 +1323,24 @@ def dashboard(request):
     Vue du tableau de bord principal
     Affiche les statistiques et informations importantes
     """
-    # Compter les statistiques
-    total_clients = Client.objects.count()
-    total_chambres = Chambre.objects.count()
-    total_reservations = Reservation.objects.count()
+    # Compter les statistiques (compteurs tenus à jour par les signaux)
+    compteurs = lire_compteurs('client', 'chambre.statut', 'reservation.statut')
+    total_clients = total(compteurs['client'])
+    total_chambres = total(compteurs['chambre.statut'])
+    total_reservations = total(compteurs['reservation.statut'])
     
     # Chambres par statut
-    chambres_libres = Chambre.objects.filter(statut='libre').count()
-    chambres_occupees = Chambre.objects.filter(statut='occupee').count()
+    chambres_libres = total(compteurs['chambre.statut'], 'libre')
+    chambres_occupees = total(compteurs['chambre.statut'], 'occupee')
     
     # Réservations récentes (les 5 dernières)
     reservations_recentes = Reservation.objects.select_related('client', 'chambre').order_by('-date_creation')[:5]
     
     # Réservations actives (confirmées ou en cours)
-    reservations_actives = Reservation.objects.filter(
-        statut__in=['confirmee', 'en_cours']
-    ).count()
+    reservations_actives = total(compteurs['reservation.statut'], 'confirmee', 'en_cours')
     
-    # Revenus du mois en cours
-    from django.db.models import Sum
-    today = timezone.now().date()
-    revenus_mois = Reservation.objects.filter(
-        date_entree__year=today.year,
-        date_entree__month=today.month,
-        statut__in=['confirmee', 'en_cours', 'terminee']
-    ).aggregate(total=Sum('prix_total'))['total'] or 0
+    # Revenus du mois en cours (nuits du mois, séjours à cheval répartis)
+    revenus_mois = revenu_du_mois()
     
     context = {
         'total_clients': total_clients,
@@ -1294,37 +1366,30 @@ def dashboard_admin(request):
     Dashboard réservé aux ADMINISTRATEURS
     Accès complet à toutes les statistiques et données
     """
-    from django.db.models import Sum
-    today = timezone.now().date()
+    today = timezone.localdate()
     
-    # Statistiques complètes
-    total_clients = Client.objects.count()
-    total_chambres = Chambre.objects.count()
-    total_reservations = Reservation.objects.count()
+    # Statistiques complètes (compteurs tenus à jour par les signaux)
+    compteurs = lire_compteurs('client', 'chambre.statut', 'reservation.statut')
+    total_clients = total(compteurs['client'])
+    total_chambres = total(compteurs['chambre.statut'])
+    total_reservations = total(compteurs['reservation.statut'])
     
     # Chambres par statut
-    chambres_libres = Chambre.objects.filter(statut='libre').count()
-    chambres_occupees = Chambre.objects.filter(statut='occupee').count()
-    chambres_maintenance = Chambre.objects.filter(statut='maintenance').count()
+    chambres_libres = total(compteurs['chambre.statut'], 'libre')
+    chambres_occupees = total(compteurs['chambre.statut'], 'occupee')
+    chambres_maintenance = total(compteurs['chambre.statut'], 'maintenance')
     
     # Réservations par statut
-    reservations_confirmees = Reservation.objects.filter(statut='confirmee').count()
-    reservations_en_cours = Reservation.objects.filter(statut='en_cours').count()
-    reservations_en_attente = Reservation.objects.filter(statut='en_attente').count()
+    reservations_confirmees = total(compteurs['reservation.statut'], 'confirmee')
+    reservations_en_cours = total(compteurs['reservation.statut'], 'en_cours')
+    reservations_en_attente = total(compteurs['reservation.statut'], 'en_attente')
     
     # Réservations récentes (les 10 dernières pour l'admin)
     reservations_recentes = Reservation.objects.select_related('client', 'chambre').order_by('-date_creation')[:10]
     
-    # Revenus
-    revenus_mois = Reservation.objects.filter(
-        date_entree__year=today.year,
-        date_entree__month=today.month,
-        statut__in=['confirmee', 'en_cours', 'terminee']
-    ).aggregate(total=Sum('prix_total'))['total'] or 0
-    
-    revenus_total = Reservation.objects.filter(
-        statut__in=['confirmee', 'en_cours', 'terminee']
-    ).aggregate(total=Sum('prix_total'))['total'] or 0
+    # Revenus reconnus nuit par nuit (table RoomNight)
+    revenus_mois = revenu_du_mois(today)
+    revenus_total = revenu_reconnu()
     
     context = {
         'total_clients': total_clients,
@@ -1360,96 +1425,12 @@ def dashboard_employe(request):
         
         print(f'Debug: User {request.user.username}, Poste: {poste}')  # Debug
         
-        # Statistiques personnalisées selon le poste
+        # Statistiques personnalisées selon le poste (requêtes regroupées, cache par poste)
         stats_config = user_profile.get_dashboard_stats_config()
-        stats_data = {}
         
         print(f'Debug: Stats config: {len(stats_config)} stats')  # Debug
         
-        # Calculer les statistiques selon la configuration
-        for stat in stats_config:
-            stat_name = stat['name']
-            
-            if stat_name == 'reservations_today':
-                stats_data[stat_name] = Reservation.objects.filter(
-                    date_entree=today
-                ).count()
-                
-            elif stat_name == 'arrivals_today':
-                stats_data[stat_name] = Reservation.objects.filter(
-                    date_entree=today
-                ).count()
-                
-            elif stat_name == 'departures_today':
-                stats_data[stat_name] = Reservation.objects.filter(
-                    date_sortie=today
-                ).count()
-                
-            elif stat_name == 'rooms_available':
-                stats_data[stat_name] = Chambre.objects.filter(statut='libre').count()
-                
-            elif stat_name == 'pending_checkins':
-                stats_data[stat_name] = Reservation.objects.filter(
-                    date_entree=today,
-                    statut='confirmee'
-                ).count()
-                
-            elif stat_name == 'new_clients_today':
-                stats_data[stat_name] = Client.objects.filter(
-                    date_inscription__date=today
-                ).count()
-                
-            elif stat_name == 'active_reservations':
-                stats_data[stat_name] = Reservation.objects.filter(
-                    statut__in=['confirmee', 'en_cours']
-                ).count()
-                
-            elif stat_name == 'services_requested':
-                # À implémenter avec les services
-                stats_data[stat_name] = 0
-                
-            elif stat_name == 'guest_messages':
-                # À implémenter avec les messages
-                stats_data[stat_name] = 0
-                
-            elif stat_name == 'rooms_to_clean':
-                stats_data[stat_name] = Chambre.objects.filter(
-                    statut='nettoyage_requis'
-                ).count()
-                
-            elif stat_name == 'rooms_cleaned_today':
-                stats_data[stat_name] = Chambre.objects.filter(
-                    statut='libre',
-                    derniere_modification__date=today
-                ).count()
-                
-            elif stat_name == 'maintenance_requests':
-                # À implémenter avec les demandes de maintenance
-                stats_data[stat_name] = 0
-                
-            elif stat_name == 'orders_today':
-                # À implémenter avec les commandes restaurant
-                stats_data[stat_name] = 0
-                
-            elif stat_name == 'occupancy_rate':
-                total_rooms = Chambre.objects.count()
-                occupied_rooms = Chambre.objects.filter(statut='occupee').count()
-                stats_data[stat_name] = round((occupied_rooms / total_rooms * 100), 1) if total_rooms > 0 else 0
-                
-            elif stat_name == 'revenue_month':
-                stats_data[stat_name] = Reservation.objects.filter(
-                    date_entree__year=today.year,
-                    date_entree__month=today.month,
-                    statut__in=['confirmee', 'en_cours', 'terminee']
-                ).aggregate(total=Sum('prix_total'))['total'] or 0
-                
-            elif stat_name == 'staff_count':
-                stats_data[stat_name] = UserProfile.objects.filter(
-                    statut_employe='actif'
-                ).count()
-                
-            else:
-                stats_data[stat_name] = 0  # Valeur par défaut
+        stats_data = stats_poste(poste, stats_config)
         
         # Modules accessibles pour cet employé
         accessible_modules = user_profile.get_accessible_modules()
@@ -1546,7 +1527,9 @@ def dashboard_client(request):
     
     # Calculer les totaux de manière sécurisée
     try:
-        total_reservations = mes_reservations.count()
+        total_reservations = (
+            lire_compteur('reservation.client', client.pk) if client else 0
+        )
         total_depenses = sum(r.prix_total for r in reservations_actives if r.prix_total)
         prochaine_arrivee = reservations_actives.first().date_entree if reservations_actives.exists() else None
     except Exception as e:
@@ -2035,15 +2018,19 @@ def reservation_create(request):
             date_entree_obj = datetime.strptime(date_entree, '%Y-%m-%d').date()
             date_sortie_obj = datetime.strptime(date_sortie, '%Y-%m-%d').date()
             
-            # Vérifier s'il y a des réservations qui se chevauchent
-            reservations_chevauchees = Reservation.objects.filter(
-                chambre=chambre,
-                statut__in=['confirmee', 'en_cours'],
-                date_entree__lt=date_sortie_obj,
-                date_sortie__gt=date_entree_obj
-            )
-            
-            if reservations_chevauchees.exists():
+            # Créer la réservation (disponibilité vérifiée sous verrou de la chambre)
+            try:
+                reservation = reserver_chambre(
+                    client,
+                    chambre.id,
+                    date_entree_obj,
+                    date_sortie_obj,
+                    nombre_personnes=nombre_personnes,
+                    statut=statut,
+                    remarques=remarques,
+                    cree_par=request.user
+                )
+            except ChambreIndisponible:
                 messages.error(request, 'Cette chambre n\'est pas disponible pour ces dates.')
                 # Rediriger vers le formulaire avec les données
                 context = {
@@ -2054,26 +2041,6 @@ def reservation_create(request):
                 }
                 return render(request, 'hotel/reservation_form.html', context)
             
-            # Créer la réservation
-            reservation = Reservation(
-                client=client,
-                chambre=chambre,
-                date_entree=date_entree_obj,
-                date_sortie=date_sortie_obj,
-                nombre_personnes=nombre_personnes,
-                statut=statut,
-                remarques=remarques,
-                cree_par=request.user
-            )
-            
-            # La validation et le calcul automatique se font dans le save()
-            reservation.save()
-            
-            # Mettre à jour le statut de la chambre si nécessaire
-            if statut in ['confirmee', 'en_cours']:
-                chambre.statut = 'occupee'
-                chambre.save()
-            
             messages.success(request, f'Réservation créée avec succès ! Prix total : {reservation.prix_total}€')
             return redirect('reservation_list')
             
@@ -2348,32 +2315,22 @@ def reservation_client(request):
                 messages.error(request, 'La date d\'arrivée ne peut pas être dans le passé.')
                 return redirect('client_reservation')
             
-            # Vérifier les réservations qui se chevauchent
-            reservations_chevauchees = Reservation.objects.filter(
-                chambre=chambre,
-                statut__in=['confirmee', 'en_cours'],
-                date_entree__lt=date_sortie_obj,
-                date_sortie__gt=date_entree_obj
-            )
-            
-            if reservations_chevauchees.exists():
+            # Créer la réservation (disponibilité vérifiée sous verrou de la chambre)
+            try:
+                reservation = reserver_chambre(
+                    client,
+                    chambre.id,
+                    date_entree_obj,
+                    date_sortie_obj,
+                    nombre_personnes=nombre_personnes,
+                    statut='en_attente',  # Les réservations client commencent en attente
+                    remarques=remarques,
+                    cree_par=request.user
+                )
+            except ChambreIndisponible:
                 messages.error(request, 'Cette chambre n\'est pas disponible pour les dates sélectionnées.')
                 return redirect('client_reservation')
             
-            # Créer la réservation
-            reservation = Reservation(
-                client=client,
-                chambre=chambre,
-                date_entree=date_entree_obj,
-                date_sortie=date_sortie_obj,
-                nombre_personnes=nombre_personnes,
-                statut='en_attente',  # Les réservations client commencent en attente
-                remarques=remarques,
-                cree_par=request.user
-            )
-            
-            reservation.save()
-                
             messages.success(request, f'Votre demande de réservation a été envoyée avec succès ! Prix estimé : {reservation.prix_total}€. Vous recevrez une confirmation par email.')
             return redirect('client_reservation')
             
@@ -2402,6 +2359,8 @@ from django.http import JsonResponse
 from django.core.serializers.json import DjangoJSONEncoder
 import json
 
+@limiter_debit('disponibilite')
+@disponibilite_conditionnelle
 def check_disponibilite_api(request):
     """
     API pour vérifier la disponibilité d'une chambre
@@ -2422,15 +2381,9 @@ def check_disponibilite_api(request):
         date_entree_obj = datetime.strptime(date_entree, '%Y-%m-%d').date()
         date_sortie_obj = datetime.strptime(date_sortie, '%Y-%m-%d').date()
         
-        # Vérifier les réservations qui se chevauchent
-        reservations_chevauchees = Reservation.objects.filter(
-            chambre=chambre,
-            statut__in=['confirmee', 'en_cours'],
-            date_entree__lt=date_sortie_obj,
-            date_sortie__gt=date_entree_obj
-        )
-        
-        disponible = not reservations_chevauchees.exists()
+        # Vérifier les réservations qui se chevauchent (index en mémoire, mêmes
+        # statuts bloquants que reserver_chambre : demandes en attente comprises)
+        disponible = index_disponibilite.est_libre(chambre.id, date_entree_obj, date_sortie_obj)
         
         response_data = {
             'disponible': disponible,
@@ -2444,6 +2397,12 @@ def check_disponibilite_api(request):
         
         if not disponible:
             # Ajouter les réservations existantes
+            reservations_chevauchees = Reservation.objects.filter(
+                chambre=chambre,
+                statut__in=STATUTS_BLOQUANTS,
+                date_entree__lt=date_sortie_obj,
+                date_sortie__gt=date_entree_obj
+            ).select_related('client')
             response_data['reservations_en_cours'] = []
             for res in reservations_chevauchees:
                 response_data['reservations_en_cours'].append({
@@ -2452,29 +2411,33 @@ def check_disponibilite_api(request):
                     'client': res.client.nom_complet if res.client else 'Client'
                 })
             
-            # Suggérer des chambres alternatives
+            # Suggérer des chambres alternatives réellement disponibles
+            chambres_occupees = index_disponibilite.chambres_occupees(date_entree_obj, date_sortie_obj)
             chambres_alternatives = Chambre.objects.filter(
                 statut='libre',
                 type_chambre=chambre.type_chambre
-            ).exclude(pk=chambre.id)
+            ).exclude(pk=chambre.id).exclude(id__in=chambres_occupees)
             
             response_data['suggestions'] = []
             for alt_chambre in chambres_alternatives[:3]:  # Limiter à 3 suggestions
-                # Vérifier si l'alternative est disponible
-                alt_reservations = Reservation.objects.filter(
-                    chambre=alt_chambre,
-                    statut__in=['confirmee', 'en_cours'],
-                    date_entree__lt=date_sortie_obj,
-                    date_sortie__gt=date_entree_obj
+                response_data['suggestions'].append({
+                    'id': alt_chambre.id,
+                    'numero': alt_chambre.numero,
+                    'type': alt_chambre.get_type_chambre_display(),
+                    'prix': str(alt_chambre.prix_par_nuit)
+                })
+            
+            # Aucune alternative : vérifier si déplacer des séjours futurs libérerait une chambre
+            if not response_data['suggestions']:
+                plan = proposer_reaffectation(
+                    chambre.type_chambre, chambre.prix_par_nuit, date_entree_obj, date_sortie_obj
                 )
-                
-                if not alt_reservations.exists():
-                    response_data['suggestions'].append({
-                        'id': alt_chambre.id,
-                        'numero': alt_chambre.numero,
-                        'type': alt_chambre.get_type_chambre_display(),
-                        'prix': str(alt_chambre.prix_par_nuit)
-                    })
+                response_data['reaffectation_possible'] = plan is not None
+                if plan is not None:
+                    response_data['reaffectation'] = {
+                        'chambre_id': plan['chambre_demande'],
+                        'deplacements': len(plan['deplacements']),
+                    }
         
         return JsonResponse(response_data)
         
@@ -2972,11 +2935,14 @@ def admin_notifications(request):
         notifications = notifications.filter(priorite=priorite_filter)
     
     # Statistiques
+    compteurs = lire_compteurs(
+        'notification', 'notification.non_lue', 'notification.non_traitee', 'notification.critique_non_lue'
+    )
     stats = {
-        'total': Notification.objects.count(),
-        'non_lues': Notification.objects.filter(lue=False).count(),
-        'non_traitees': Notification.objects.filter(traitee=False).count(),
-        'critiques': Notification.objects.filter(priorite='critique', lue=False).count(),
+        'total': total(compteurs['notification']),
+        'non_lues': total(compteurs['notification.non_lue']),
+        'non_traitees': total(compteurs['notification.non_traitee']),
+        'critiques': total(compteurs['notification.critique_non_lue']),
     }
     
     # Pagination
@@ -3037,6 +3003,8 @@ def notification_marquer_toutes_lues(request):
         lue=True,
         date_lecture=timezone.now()
     )
+    # update() n'émet pas de signaux : compteurs recalculés
+    reconcilier(['notification.non_lue', 'notification.critique_non_lue'])
     
     return JsonResponse({'success': True})
 
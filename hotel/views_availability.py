@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Vues API de disponibilité des chambres
+Matrices chambres × jours et recherches de disponibilité pour le planning
+"""
+
+from datetime import datetime, timedelta
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .availability import construire_matrice_disponibilite
+from .decorators import role_required
+from .http_cache import disponibilite_conditionnelle
+from .throttling import limiter_debit
+from .utils import rechercher_fenetres_libres
+
+
+# Nombre maximum de jours pour une matrice
+MATRICE_JOURS_MAX = 366
+
+# Limites de la recherche de dates flexibles
+FENETRES_PERIODE_DEFAUT = 60
+FENETRES_PERIODE_MAX = 366
+FENETRES_LIMITE_MAX = 50
+
+
+@role_required('admin', 'employe')
+def matrice_disponibilite_api(request):
+    """
+    Retourne la matrice de disponibilité (chambres × jours) encodée en plages
+    Paramètres GET : debut (AAAA-MM-JJ), jours, type_chambre, capacite, statut
+    """
+    try:
+        debut_str = request.GET.get('debut')
+        date_debut = datetime.strptime(debut_str, '%Y-%m-%d').date() if debut_str else timezone.now().date()
+        jours = int(request.GET.get('jours', 30))
+        capacite = int(request.GET['capacite']) if request.GET.get('capacite') else None
+    except ValueError:
+        return JsonResponse({'error': 'Paramètres invalides'}, status=400)
+
+    if not 1 <= jours <= MATRICE_JOURS_MAX:
+        return JsonResponse({'error': f'Le nombre de jours doit être compris entre 1 et {MATRICE_JOURS_MAX}'}, status=400)
+
+    matrice = construire_matrice_disponibilite(
+        date_debut,
+        jours,
+        type_chambre=request.GET.get('type_chambre') or None,
+        capacite=capacite,
+        statut=request.GET.get('statut') or None,
+    )
+    return JsonResponse(matrice)
+
+
+@require_GET
+@limiter_debit('disponibilite')
+@disponibilite_conditionnelle
+def fenetres_disponibles_api(request):
+    """
+    Recherche de dates flexibles : premières fenêtres libres de N nuits
+    Paramètres GET : nuits (obligatoire), type_chambre, capacite, debut, fin (AAAA-MM-JJ), limite
+    """
+    today = timezone.now().date()
+    try:
+        nuits = int(request.GET['nuits'])
+        debut_str = request.GET.get('debut')
+        fin_str = request.GET.get('fin')
+        date_debut = datetime.strptime(debut_str, '%Y-%m-%d').date() if debut_str else today
+        date_fin = (datetime.strptime(fin_str, '%Y-%m-%d').date() if fin_str
+                    else date_debut + timedelta(days=FENETRES_PERIODE_DEFAUT))
+        limite = int(request.GET.get('limite', 5))
+        capacite = int(request.GET['capacite']) if request.GET.get('capacite') else None
+    except KeyError:
+        return JsonResponse({'error': 'Paramètre "nuits" manquant'}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'Paramètres invalides'}, status=400)
+
+    date_debut = max(date_debut, today)
+    if nuits < 1 or (date_fin - date_debut).days > FENETRES_PERIODE_MAX:
+        return JsonResponse({'error': 'Période ou durée invalide'}, status=400)
+    limite = max(1, min(limite, FENETRES_LIMITE_MAX))
+
+    fenetres = rechercher_fenetres_libres(
+        nuits,
+        date_debut,
+        date_fin,
+        type_chambre=request.GET.get('type_chambre') or None,
+        capacite=capacite,
+        limite=limite,
+    )
+
+    return JsonResponse({
+        'nuits': nuits,
+        'debut': date_debut.isoformat(),
+        'fin': date_fin.isoformat(),
+        'fenetres': [
+            {
+                'chambre_id': fenetre['chambre'].id,
+                'numero': fenetre['chambre'].numero,
+                'type': fenetre['chambre'].get_type_chambre_display(),
+                'prix_par_nuit': float(fenetre['chambre'].prix_par_nuit),
+                'prix_total': float(fenetre['chambre'].prix_par_nuit * nuits),
+                'date_entree': fenetre['date_entree'].isoformat(),
+                'date_sortie': fenetre['date_sortie'].isoformat(),
+                'libre_jusqu_au': fenetre['libre_jusqu_au'].isoformat(),
+            }
+            for fenetre in fenetres
+        ],
+    })
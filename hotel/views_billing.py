@@ -8,25 +8,31 @@ la paie et la comptabilité générale
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.db.models import Sum, Q, Count, Avg, F
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from datetime import date, timedelta, datetime
 import json
-import csv
-from django.template.loader import render_to_string
 
 # Imports des modèles
 from .models import (
     Facture, FichePaie, ChargeComptable, Client, UserProfile, 
     Notification, ContactMessage
 )
+from .snapshots import graphique_comparaison, rapport_periode
+from .series import GRANULARITES, serie_en_json, serie_financiere
+from .cache_dashboard import contexte_dashboard
+from .exports import TYPES_EXPORT, flux_csv, lignes_comptables, statuts_valides
+from .pdf_factures import PDF_DISPONIBLE, flux_zip, pdf_facture, pdfs_factures
+from .paie import calculer_paie
 
-# WeasyPrint est optionnel pour la génération PDF
-# Décommentez la ligne suivante après installation: pip install weasyprint
-# from weasyprint import HTML
+# WeasyPrint est optionnel pour la génération PDF (voir pdf_factures.py)
+
+# Périodes d'analyse du tableau de bord comptable (une entrée de cache chacune)
+PERIODES_COMPTABLES = ('month', 'quarter', 'year')
 
 # Fonctions utilitaires
 
@@ -36,16 +42,12 @@ def is_comptable(user):
     return user.is_staff or user.is_superuser
 
 
-@login_required
-@user_passes_test(is_comptable)
-def billing_dashboard(request):
+def _statistiques_comptables(period, today):
     """
-    Tableau de bord comptable principal
+    Statistiques, tendances et graphiques du tableau de bord comptable
+    Ne dépend que de la période et du jour : mis en cache par billing_dashboard.
     """
     # Période d'analyse
-    period = request.GET.get('period', 'month')
-    today = timezone.now().date()
-    
     if period == 'month':
         start_date = today.replace(day=1)
         end_date = today
@@ -184,27 +186,99 @@ def billing_dashboard(request):
     inventory_percentage = (monthly_inventory / total_expenses_for_percentage * 100) if total_expenses_for_percentage > 0 else 0
     other_percentage = (monthly_other_expenses / total_expenses_for_percentage * 100) if total_expenses_for_percentage > 0 else 0
     
-    # Données pour les graphiques mensuels
-    monthly_labels = []
-    monthly_revenues = []
-    monthly_expenses_list = []
+    # Données pour les graphiques mensuels : 6 derniers mois, une requête GROUP BY par table
+    debut_graphique = today.replace(day=1)
+    for _ in range(5):
+        debut_graphique = (debut_graphique - timedelta(days=1)).replace(day=1)
+    serie_mensuelle = serie_en_json(serie_financiere(debut_graphique, today, 'month'))
+    monthly_labels = serie_mensuelle['labels']
+    monthly_revenues = serie_mensuelle['revenus']
+    monthly_expenses_list = serie_mensuelle['depenses']
     
-    for i in range(6):
-        month_date = (today.replace(day=1) - timedelta(days=30*i))
-        month_revenue = Facture.objects.filter(
-            date_emission__month=month_date.month,
-            date_emission__year=month_date.year
-        ).aggregate(total=Sum('montant_ttc'))['total'] or 0
+    # Comparaison annuelle (N / N-1) lue dans les instantanés quotidiens
+    annee = rapport_periode(date(today.year, 1, 1), today)
+    comparaison_encaissements = graphique_comparaison(annee, 'encaissements')
+    comparaison_depenses = graphique_comparaison(annee, 'depenses')
+
+    # Comptages sécurisés pour éviter NameError dans le template
+    try:
+        pending_invoices_count = Facture.objects.filter(statut='en_attente').count()
+        paid_invoices_count = Facture.objects.filter(statut='payee').count()
+    except Exception:
+        pending_invoices_count = 0
+        paid_invoices_count = 0
+
+    return {
+        # Période
+        'current_month': start_date,
         
-        month_expenses = ChargeComptable.objects.filter(
-            date_facture__month=month_date.month,
-            date_facture__year=month_date.year
-        ).aggregate(total=Sum('montant_ttc'))['total'] or 0
+        # Statistiques principales
+        'monthly_revenue': monthly_revenue,
+        'monthly_expenses': monthly_expenses,
+        'monthly_profit': monthly_profit,
+        'cash_flow': cash_flow,
         
-        monthly_labels.insert(0, month_date.strftime('%b %Y'))
-        monthly_revenues.insert(0, float(month_revenue))
-        monthly_expenses_list.insert(0, float(month_expenses))
-    
+        # Tendances
+        'revenue_trend': revenue_trend,
+        'expense_trend': 0,  # À calculer
+        'profit_margin': profit_margin,
+        'cash_flow_trend': cash_flow_trend,
+        
+        # Décomptes
+        'pending_invoices_count': pending_invoices_count,
+        'paid_invoices_count': paid_invoices_count,
+        'pending_invoices': pending_invoices,
+        
+        # Pourcentages
+        'salaries_percentage': salaries_percentage,
+        'maintenance_percentage': maintenance_percentage,
+        'inventory_percentage': inventory_percentage,
+        'other_percentage': other_percentage,
+        
+        # Données pour graphiques
+        'monthly_labels': json.dumps(monthly_labels),
+        'monthly_revenues': json.dumps(monthly_revenues),
+        'monthly_expenses_chart': json.dumps(monthly_expenses_list),
+        'monthly_salaries': json.dumps(serie_mensuelle['salaires']),
+        'comparaison_encaissements': json.dumps(comparaison_encaissements),
+        'comparaison_depenses': json.dumps(comparaison_depenses),
+        'totaux_annee': annee['totaux'],
+        'totaux_annee_precedente': annee['totaux_precedents'],
+        
+        # Revenus détaillés
+        'reservation_revenue': monthly_revenue,  # Simplifié
+        'other_revenue': 0,
+        
+        # Charges détaillées
+        'total_salaries': monthly_salaries,
+        'total_maintenance': monthly_maintenance,
+        'total_inventory': monthly_inventory,
+        'total_other_expenses': monthly_other_expenses,
+        
+        # Progression (simplifié)
+        'revenue_progress': min(100, (monthly_revenue / 50000) * 100),  # Objectif de 50k€
+    }
+
+
+@login_required
+@user_passes_test(is_comptable)
+def billing_dashboard(request):
+    """
+    Tableau de bord comptable principal
+    """
+    # Statistiques servies depuis le cache, recalculées en arrière-plan (voir hotel/cache_dashboard.py)
+    period = request.GET.get('period', 'month')
+    if period not in PERIODES_COMPTABLES:
+        period = 'month'
+    today = timezone.now().date()
+    role = 'admin' if request.user.is_superuser else 'staff'
+    statistiques, calcule_le = contexte_dashboard(
+        'comptabilite', (role, period, today),
+        lambda: _statistiques_comptables(period, today),
+        forcer=bool(request.GET.get('rafraichir')),
+    )
+    start_date = statistiques['current_month']
+
     # Filtrage des factures
     try:
         status_filter = request.GET.get('status', '')
@@ -230,7 +304,6 @@ def billing_dashboard(request):
         fiches_paie = FichePaie.objects.select_related('employe').order_by('-mois')
         
         # Construire un listing d'employés actifs avec statut de paie (même s'il n'y a pas encore de fiche)
-        from decimal import Decimal
         current_month = start_date  # premier jour du mois courant
         from django.db.models import Q
         # Inclure les utilisateurs actifs qui sont marqués comme staff OU qui ont un profil employé (pour diagnostiquer les cas où le profil existe mais le statut n'est pas 'actif')
@@ -240,8 +313,12 @@ def billing_dashboard(request):
             Q(is_staff=True) | Q(profile__statut_employe__isnull=False)
         ).select_related('profile').distinct()
         employes_paie = []
+        fiches_du_mois = {
+            fiche.employe_id: fiche
+            for fiche in FichePaie.objects.filter(mois=current_month, employe__in=employes_actifs)
+        }
         for employe in employes_actifs:
-            fiche = FichePaie.objects.filter(employe=employe, mois=current_month).first()
+            fiche = fiches_du_mois.get(employe.id)
             if fiche:
                 status = fiche.statut
                 salaire_brut = fiche.salaire_brut
@@ -254,20 +331,17 @@ def billing_dashboard(request):
                 total_retenu = fiche.total_retenu
             else:
                 profile = getattr(employe, 'profile', None)
-                salaire_brut = Decimal(str(profile.salaire)) if profile and profile.salaire is not None else Decimal('0.00')
-                # Estimation rapide des éléments de paie
-                prime_anciennete = Decimal('0.00')
-                if profile and profile.date_embauche:
-                    annees_anciennete = (today - profile.date_embauche).days // 365
-                    taux = Decimal(annees_anciennete) * Decimal('0.01')
-                    if taux > Decimal('0.10'):
-                        taux = Decimal('0.10')
-                    prime_anciennete = (taux * salaire_brut).quantize(Decimal('0.01'))
-                cotisations_sociales = (salaire_brut * Decimal('0.22')).quantize(Decimal('0.01'))
-                impot_source = (salaire_brut * Decimal('0.15')).quantize(Decimal('0.01'))
-                total_retenu = (cotisations_sociales + impot_source).quantize(Decimal('0.01'))
-                total_primes = prime_anciennete
-                salaire_net = (salaire_brut + prime_anciennete - total_retenu).quantize(Decimal('0.01'))
+                # Estimation des éléments de paie (même calcul que la génération)
+                elements = calculer_paie(
+                    profile.salaire if profile else None,
+                    profile.date_embauche if profile else None,
+                    today
+                )
+                salaire_brut = elements.salaire_brut
+                prime_anciennete = elements.prime_anciennete
+                total_primes = elements.total_primes
+                total_retenu = elements.total_retenu
+                salaire_net = elements.salaire_net
                 status = 'no_fiche'
                 fiche_id = None
 
@@ -291,14 +365,6 @@ def billing_dashboard(request):
         charges = []
         employes_paie = []
     
-    # Comptages sécurisés pour éviter NameError dans le template
-    try:
-        pending_invoices_count = Facture.objects.filter(statut='en_attente').count()
-        paid_invoices_count = Facture.objects.filter(statut='payee').count()
-    except Exception:
-        pending_invoices_count = 0
-        paid_invoices_count = 0
-
     if hasattr(factures, 'count'):
         total_invoices_count = factures.count()
     else:
@@ -315,58 +381,19 @@ def billing_dashboard(request):
         total_charges_count = len(charges) if charges is not None else 0
 
     context = {
-        # Période
-        'current_month': start_date,
-        
-        # Statistiques principales
-        'monthly_revenue': monthly_revenue,
-        'monthly_expenses': monthly_expenses,
-        'monthly_profit': monthly_profit,
-        'cash_flow': cash_flow,
-        
-        # Tendances
-        'revenue_trend': revenue_trend,
-        'expense_trend': 0,  # À calculer
-        'profit_margin': profit_margin,
-        'cash_flow_trend': cash_flow_trend,
+        **statistiques,
+        'calcule_le': calcule_le,
         
         # Décomptes
-        'pending_invoices_count': pending_invoices_count,
-        'paid_invoices_count': paid_invoices_count,
-        'pending_invoices': pending_invoices,
         'total_invoices_count': total_invoices_count,
         'total_salaries_count': total_salaries_count,
         'total_charges_count': total_charges_count,
         
-        # Pourcentages
-        'salaries_percentage': salaries_percentage,
-        'maintenance_percentage': maintenance_percentage,
-        'inventory_percentage': inventory_percentage,
-        'other_percentage': other_percentage,
-        
-        # Données pour graphiques
-        'monthly_labels': json.dumps(monthly_labels),
-        'monthly_revenues': json.dumps(monthly_revenues),
-        'monthly_expenses': json.dumps(monthly_expenses_list),
-        
         # Données détaillées
         'factures': factures[:20],  # Limiter à 20 pour la performance
         'fiches_paie': fiches_paie[:20],
         'employes_paie': employes_paie[:20],
         'charges': charges[:20],
-        
-        # Revenus détaillés
-        'reservation_revenue': monthly_revenue,  # Simplifié
-        'other_revenue': 0,
-        
-        # Charges détaillées
-        'total_salaries': monthly_salaries,
-        'total_maintenance': monthly_maintenance,
-        'total_inventory': monthly_inventory,
-        'total_other_expenses': monthly_other_expenses,
-        
-        # Progression (simplifié)
-        'revenue_progress': min(100, (monthly_revenue / 50000) * 100),  # Objectif de 50k€
     }
     
     return render(request, 'hotel/billing_list_new.html', context)
@@ -390,33 +417,81 @@ def invoice_detail(request, invoice_id):
 @login_required
 @user_passes_test(is_comptable)
 def invoice_pdf(request, invoice_id):
-    """Génère un PDF pour une facture (si WeasyPrint est installé), sinon renvoie le HTML"""
-    facture = get_object_or_404(Facture, id=invoice_id)
+    """
+    PDF d'une facture (si WeasyPrint est installé), sinon renvoie le HTML
+    Le PDF est rendu hors du processus web puis servi depuis le cache disque
+    tant que la facture n'a pas changé.
+    """
+    facture = get_object_or_404(
+        Facture.objects.select_related('client', 'reservation__client', 'reservation__chambre'),
+        id=invoice_id
+    )
     context = {
         'facture': facture,
         'reservation': facture.reservation,
         'client': facture.client,
     }
 
-    try:
-        from weasyprint import HTML
-    except Exception:
+    if not PDF_DISPONIBLE:
         # WeasyPrint non disponible : renvoyer la page HTML comme fallback
         return render(request, 'hotel/billing_invoice.html', context)
 
     try:
-        html_string = render_to_string('hotel/billing_invoice.html', context, request=request)
-        html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
-        pdf = html.write_pdf()
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename=Facture_{facture.numero_facture}.pdf'
-        return response
-    except Exception as e:
+        chemin = pdf_facture(facture, request.build_absolute_uri('/'))
+    except Exception:
         # En cas d'erreur PDF, renvoyer HTML avec message d'erreur discret
         import logging
         logging.getLogger(__name__).exception('Erreur génération PDF facture')
         return render(request, 'hotel/billing_invoice.html', context)
 
+    return FileResponse(
+        open(chemin, 'rb'),
+        content_type='application/pdf',
+        filename=f'Facture_{facture.numero_facture}.pdf',
+    )
+
+
+@login_required
+@user_passes_test(is_comptable)
+def invoices_zip(request):
+    """
+    Toutes les factures d'un mois en PDF dans une archive ZIP (?mois=AAAA-MM)
+    Les PDF absents du cache sont rendus en parallèle et ajoutés à l'archive,
+    envoyée en flux, dès qu'ils sont prêts.
+    """
+    if not PDF_DISPONIBLE:
+        return HttpResponseBadRequest('Export PDF indisponible : WeasyPrint n\'est pas installé')
+
+    try:
+        mois = datetime.strptime(request.GET.get('mois', ''), '%Y-%m').date()
+    except ValueError:
+        return HttpResponseBadRequest('Paramètre mois invalide (format attendu : AAAA-MM)')
+    mois_suivant = (mois + timedelta(days=32)).replace(day=1)
+
+    factures = Facture.objects.filter(
+        date_emission__date__gte=mois,
+        date_emission__date__lt=mois_suivant
+    ).order_by('numero_facture')
+    if not factures.exists():
+        return HttpResponseBadRequest(f'Aucune facture émise en {mois.strftime("%m/%Y")}')
+
+    base_url = request.build_absolute_uri('/')
+
+    def fichiers():
+        # L'archive est déjà en cours d'envoi : les factures en échec sont
+        # ignorées et listées dans ERREURS.txt plutôt que d'interrompre le flux
+        erreurs = []
+        for facture, chemin in pdfs_factures(factures, base_url, erreurs):
+            yield f'Facture_{facture.numero_facture}.pdf', chemin
+        if erreurs:
+            yield 'ERREURS.txt', '\n'.join(
+                f'Facture {facture.numero_facture} non générée : {message}' for facture, message in erreurs
+            ).encode('utf-8')
+
+    response = StreamingHttpResponse(flux_zip(fichiers()), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="factures_{mois.strftime("%Y%m")}.zip"'
+    return response
+
 
 @login_required
 @user_passes_test(is_comptable)
@@ -606,53 +681,45 @@ def mark_as_paid(request):
 @login_required
 @user_passes_test(is_comptable)
 def export_csv(request):
-    """Exporter les données comptables en CSV"""
-    response = HttpResponse(content_type='text/csv')
+    """
+    Exporter les données comptables en CSV (envoyé en flux)
+
+    Filtres GET optionnels : type (facture, salaire, charge ; répétable ou
+    séparés par des virgules), status, start_date et end_date (AAAA-MM-JJ, inclus)
+    """
+    types = [
+        valeur.strip()
+        for parametre in request.GET.getlist('type')
+        for valeur in parametre.split(',') if valeur.strip()
+    ] or list(TYPES_EXPORT)
+    if any(type_export not in TYPES_EXPORT for type_export in types):
+        return HttpResponseBadRequest(f"Type inconnu (valeurs possibles : {', '.join(TYPES_EXPORT)})")
+
+    dates = {}
+    for parametre in ('start_date', 'end_date'):
+        valeur = request.GET.get(parametre)
+        try:
+            dates[parametre] = parse_date(valeur) if valeur else None
+        except ValueError:
+            dates[parametre] = None
+        if valeur and dates[parametre] is None:
+            return HttpResponseBadRequest(f'Date {parametre} invalide (format attendu : AAAA-MM-JJ)')
+
+    statut = request.GET.get('status', '').strip()
+    statuts = set().union(*(statuts_valides(type_export) for type_export in types))
+    if statut and statut not in statuts:
+        return HttpResponseBadRequest(f"Statut inconnu (valeurs possibles : {', '.join(sorted(statuts))})")
+
+    lignes = lignes_comptables(
+        types=types,
+        date_debut=dates['start_date'],
+        date_fin=dates['end_date'],
+        statut=statut,
+    )
+    response = StreamingHttpResponse(flux_csv(lignes), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="comptabilite_{}.csv"'.format(
         timezone.now().strftime('%Y%m%d')
     )
-    
-    writer = csv.writer(response)
-    
-    # En-tête
-    writer.writerow(['Type', 'Numéro', 'Date', 'Libellé', 'Montant TTC', 'Statut'])
-    
-    # Factures
-    factures = Facture.objects.all().order_by('-date_emission')
-    for facture in factures:
-        writer.writerow([
-            'Facture',
-            facture.numero_facture,
-            facture.date_emission.strftime('%d/%m/%Y'),
-            f'Client: {facture.client.nom_complet}',
-            facture.montant_ttc,
-            facture.get_statut_display()
-        ])
-    
-    # Salaires
-    fiches = FichePaie.objects.all().order_by('-mois')
-    for fiche in fiches:
-        writer.writerow([
-            'Salaire',
-            fiche.numero_fiche,
-            fiche.mois.strftime('%d/%m/%Y'),
-            f'Employé: {fiche.employe.get_full_name() or fiche.employe.username}',
-            fiche.salaire_net,
-            fiche.get_statut_display()
-        ])
-    
-    # Charges
-    charges = ChargeComptable.objects.all().order_by('-date_facture')
-    for charge in charges:
-        writer.writerow([
-            'Charge',
-            charge.reference_facture or '-',
-            charge.date_facture.strftime('%d/%m/%Y'),
-            charge.libelle,
-            charge.montant_ttc,
-            charge.get_statut_display()
-        ])
-    
     return response
 
 
@@ -664,8 +731,12 @@ def generate_monthly_report(request):
     from .signals import generer_fiches_paie_mensuelles
     
     try:
-        generer_fiches_paie_mensuelles()
-        return JsonResponse({'success': True, 'message': 'Fiches de paie générées avec succès'})
+        bilan = generer_fiches_paie_mensuelles()
+        return JsonResponse({
+            'success': True,
+            'message': f"{bilan['creees']} fiche(s) de paie générée(s) avec succès",
+            'creees': bilan['creees'],
+        })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
@@ -689,32 +760,17 @@ def create_payslip(request):
         if fiche:
             return JsonResponse({'success': True, 'message': 'Fiche déjà existante', 'payslip_id': fiche.id})
 
-        # Construire la fiche en se basant sur la logique utilisée par generer_fiches_paie_mensuelles
-        from decimal import Decimal
+        # Même calcul que la génération mensuelle
         profile = getattr(employee, 'profile', None)
-        salaire = Decimal(str(profile.salaire)) if profile and profile.salaire is not None else Decimal('0.00')
-        prime_anciennete = Decimal('0.00')
-        if profile and profile.date_embauche:
-            annees_anciennete = (timezone.now().date() - profile.date_embauche).days // 365
-            taux = Decimal(annees_anciennete) * Decimal('0.01')
-            if taux > Decimal('0.10'):
-                taux = Decimal('0.10')
-            prime_anciennete = (taux * salaire).quantize(Decimal('0.01'))
-        cotisations_sociales = (salaire * Decimal('0.22')).quantize(Decimal('0.01'))
-        impot_source = (salaire * Decimal('0.15')).quantize(Decimal('0.01'))
-        salaire_net = (salaire + prime_anciennete - (cotisations_sociales + impot_source)).quantize(Decimal('0.01'))
-
+        elements = calculer_paie(
+            profile.salaire if profile else None,
+            profile.date_embauche if profile else None
+        )
         fiche = FichePaie.objects.create(
             employe=employee,
             mois=current_month,
-            salaire_brut=salaire,
-            prime_anciennete=prime_anciennete,
-            cotisations_sociales=cotisations_sociales,
-            impot_source=impot_source,
-            total_primes=(prime_anciennete),
-            total_retenu=(cotisations_sociales + impot_source),
-            salaire_net=salaire_net,
-            cree_par=request.user
+            cree_par=request.user,
+            **elements._asdict()
         )
 
         return JsonResponse({'success': True, 'message': 'Fiche créée', 'payslip_id': fiche.id})
@@ -760,6 +816,39 @@ def dashboard_stats_api(request):
     return JsonResponse(stats)
 
 
+@login_required
+@user_passes_test(is_comptable)
+def series_financieres_api(request):
+    """
+    Séries temporelles revenus / dépenses / salaires / bénéfice (format JSON)
+    Paramètres GET : debut, fin (AAAA-MM-JJ), granularite (day, week, month)
+    Par défaut : les 12 derniers mois, par mois.
+    """
+    today = timezone.now().date()
+    granularite = request.GET.get('granularite', 'month')
+    try:
+        fin = datetime.strptime(request.GET['fin'], '%Y-%m-%d').date() if request.GET.get('fin') else today
+        if request.GET.get('debut'):
+            debut = datetime.strptime(request.GET['debut'], '%Y-%m-%d').date()
+        else:
+            debut = fin.replace(day=1)
+            for _ in range(11):
+                debut = (debut - timedelta(days=1)).replace(day=1)
+    except ValueError:
+        return JsonResponse({'error': 'Dates invalides (format AAAA-MM-JJ)'}, status=400)
+    if granularite not in GRANULARITES:
+        return JsonResponse({'error': f'Granularité invalide (valeurs : {", ".join(GRANULARITES)})'}, status=400)
+
+    try:
+        serie = serie_financiere(debut, fin, granularite)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    reponse = serie_en_json(serie)
+    reponse.update({'debut': debut.isoformat(), 'fin': fin.isoformat()})
+    return JsonResponse(reponse)
+
+
 @login_required
 @user_passes_test(is_comptable)
 @require_POST
@@ -99,6 +99,18 @@ DATABASES = {
 }
 
 
+# Cache partagé par tous les processus (serveurs web et commandes de gestion) :
+# en-têtes ETag / Last-Modified, compteurs de la limitation de débit, fragments du
+# catalogue des chambres, tableaux de bord (les clés d'idempotence sont en base).
+# LocMemCache (un cache par processus) est refusé par le check hotel.E001.
+# Sur plusieurs machines, utiliser Redis ou Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'django',
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -150,6 +162,32 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Durée de conservation des clés d'idempotence des API de réservation (secondes)
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+# Au-delà de ce délai (secondes), une requête restée "en cours" (processus arrêté) est
+# considérée abandonnée : une nouvelle requête avec la même clé la reprend au lieu d'un 409
+IDEMPOTENCY_PROCESSING_TIMEOUT = 60
+
+# Limitation de débit des API publiques, par client et pour tous les processus :
+# portée -> (requêtes acceptées par fenêtre, requêtes par minute)
+API_RATE_LIMITS = {
+    'disponibilite': (30, 60),
+    'reservation': (10, 20),
+}
+
+# Durée du cache des statistiques du dashboard employé, partagé par poste (secondes)
+DASHBOARD_STATS_TTL = 60
+
+# Rapports et tableau de bord comptable : contexte servi depuis le cache puis recalculé
+# en arrière-plan après SOFT_TTL, recalculé pendant la requête après HARD_TTL (secondes)
+DASHBOARD_CACHE_SOFT_TTL = 60
+DASHBOARD_CACHE_HARD_TTL = 15 * 60
+
+# PDF des factures : cache disque (hors MEDIA_ROOT, non servi publiquement) et nombre
+# de processus de rendu WeasyPrint (None : un par cœur)
+INVOICE_PDF_CACHE_DIR = BASE_DIR / 'cache' / 'factures'
+PDF_RENDER_WORKERS = None
+
 # Configuration des messages
 from django.contrib.messages import constants as messages
 MESSAGE_TAGS = {